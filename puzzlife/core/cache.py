@@ -0,0 +1,243 @@
+import pickle
+import threading
+import time
+from collections import Counter, OrderedDict
+from copy import deepcopy
+
+from django.conf import settings
+from django.core.cache import caches
+from django.core.cache.backends.base import DEFAULT_TIMEOUT, BaseCache
+from django.core.cache.backends.filebased import FileBasedCache
+
+from core import timing
+
+# Локальные хранилища и статистика общие для всех потоков процесса,
+# как у LocMemCache: Django создаёт свой экземпляр бэкенда на поток.
+_stores = {}
+_stats = {}
+_locks = {}
+
+
+def in_memory_caches(name):
+    """CACHES проекта, где общий кэш живёт в памяти процесса под именем
+    name: записи не видны серверу и не переживают процесс.
+    """
+    result = deepcopy(settings.CACHES)
+    result['default']['LOCATION'] = name
+    result['shared'] = {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        'LOCATION': name,
+        'OPTIONS': result['shared'].get('OPTIONS', {}),
+    }
+    return result
+
+
+class LocalLRU:
+    """Ограниченный по числу записей LRU-кэш процесса с TTL."""
+
+    def __init__(self, max_entries):
+        self.max_entries = max_entries
+        self.data = OrderedDict()
+
+    def get(self, key):
+        """Возвращает (найдено, значение)."""
+        item = self.data.get(key)
+        if item is None:
+            return False, None
+        expires, value = item
+        if expires < time.monotonic():
+            del self.data[key]
+            return False, None
+        self.data.move_to_end(key)
+        return True, pickle.loads(value)
+
+    def set(self, key, value, timeout):
+        self.data[key] = (time.monotonic() + timeout,
+                          pickle.dumps(value, pickle.HIGHEST_PROTOCOL))
+        self.data.move_to_end(key)
+        while len(self.data) > self.max_entries:
+            self.data.popitem(last=False)
+
+    def delete(self, key):
+        self.data.pop(key, None)
+
+    def clear(self):
+        self.data.clear()
+
+
+class TwoTierCache(BaseCache):
+    """Небольшой LRU-кэш процесса перед общим кэшем.
+
+    OPTIONS:
+        SHARED — алиас общего кэша из CACHES;
+        MAX_ENTRIES — сколько записей держит локальный уровень;
+        LOCAL_TIMEOUT — сколько секунд запись живёт локально: это предел
+            расхождения между процессами после записи в общий кэш;
+        SHARED_ONLY_PREFIXES — ключи с этими префиксами читаются только
+            из общего кэша. Так хранятся версии и поколения: ключи
+            данных содержат версию, и смена версии видна сразу во всех
+            процессах, а устаревшие локальные записи просто не читаются.
+    """
+
+    def __init__(self, location, params):
+        super().__init__(params)
+        options = params.get('OPTIONS', {})
+        self.shared_alias = options.get('SHARED', 'shared')
+        self.local_timeout = options.get('LOCAL_TIMEOUT', 5)
+        self.shared_only = tuple(options.get('SHARED_ONLY_PREFIXES', ()))
+        name = location or self.shared_alias
+        self._local = _stores.setdefault(
+            name, LocalLRU(options.get('MAX_ENTRIES', 1000)))
+        self._stats = _stats.setdefault(name, Counter())
+        self._lock = _locks.setdefault(name, threading.Lock())
+
+    @property
+    def shared(self):
+        return caches[self.shared_alias]
+
+    @property
+    def stats(self):
+        """Попадания и промахи по уровням в этом процессе."""
+        return dict(self._stats)
+
+    def is_local(self, key):
+        return not key.startswith(self.shared_only)
+
+    def local_timeout_for(self, timeout):
+        timeout = self.get_backend_timeout(timeout)
+        if timeout is None:
+            return self.local_timeout
+        return min(timeout, self.local_timeout)
+
+    def _get_local(self, key, version):
+        with self._lock:
+            return self._local.get(self.make_key(key, version))
+
+    def _set_local(self, key, value, timeout, version):
+        if self.is_local(key):
+            with self._lock:
+                self._local.set(self.make_key(key, version), value,
+                                self.local_timeout_for(timeout))
+
+    def _delete_local(self, key, version):
+        with self._lock:
+            self._local.delete(self.make_key(key, version))
+
+    def get(self, key, default=None, version=None):
+        return self.get_many([key], version=version).get(key, default)
+
+    @timing.timed('cache')
+    def get_many(self, keys, version=None):
+        keys = list(keys)
+        found = self._get_many(keys, version)
+        timing.count('cache_hits', len(found))
+        timing.count('cache_misses', len(keys) - len(found))
+        return found
+
+    def _get_many(self, keys, version):
+        found = {}
+        remote = []
+        local_misses = 0
+        for key in keys:
+            self.validate_key(self.make_key(key, version))
+            if not self.is_local(key):
+                remote.append(key)
+                continue
+            hit, value = self._get_local(key, version)
+            if hit:
+                found[key] = value
+            else:
+                remote.append(key)
+                local_misses += 1
+        self._stats['local_hits'] += len(found)
+        self._stats['local_misses'] += local_misses
+        if remote:
+            shared = self.shared.get_many(remote, version=version)
+            self._stats['shared_hits'] += len(shared)
+            self._stats['shared_misses'] += len(remote) - len(shared)
+            for key, value in shared.items():
+                self._set_local(key, value, DEFAULT_TIMEOUT, version)
+            found.update(shared)
+        return found
+
+    @timing.timed('cache')
+    def set(self, key, value, timeout=DEFAULT_TIMEOUT, version=None):
+        self.shared.set(key, value, self.get_backend_timeout(timeout),
+                        version=version)
+        self._set_local(key, value, timeout, version)
+
+    @timing.timed('cache')
+    def set_many(self, data, timeout=DEFAULT_TIMEOUT, version=None):
+        failed = self.shared.set_many(
+            data, self.get_backend_timeout(timeout), version=version)
+        for key, value in data.items():
+            if key not in (failed or ()):
+                self._set_local(key, value, timeout, version)
+        return failed
+
+    @timing.timed('cache')
+    def add(self, key, value, timeout=DEFAULT_TIMEOUT, version=None):
+        added = self.shared.add(key, value, self.get_backend_timeout(timeout),
+                                version=version)
+        if added:
+            self._set_local(key, value, timeout, version)
+        return added
+
+    def touch(self, key, timeout=DEFAULT_TIMEOUT, version=None):
+        return self.shared.touch(key, self.get_backend_timeout(timeout),
+                                 version=version)
+
+    def incr(self, key, delta=1, version=None):
+        self._delete_local(key, version)
+        return self.shared.incr(key, delta, version=version)
+
+    def decr(self, key, delta=1, version=None):
+        self._delete_local(key, version)
+        return self.shared.decr(key, delta, version=version)
+
+    @timing.timed('cache')
+    def delete(self, key, version=None):
+        self._delete_local(key, version)
+        self.shared.delete(key, version=version)
+
+    @timing.timed('cache')
+    def delete_many(self, keys, version=None):
+        for key in keys:
+            self._delete_local(key, version)
+        self.shared.delete_many(keys, version=version)
+
+    def has_key(self, key, version=None):
+        hit, _ = self._get_local(key, version)
+        return hit or self.shared.has_key(key, version=version)
+
+    def clear(self):
+        with self._lock:
+            self._local.clear()
+        self.shared.clear()
+
+    def get_backend_timeout(self, timeout=DEFAULT_TIMEOUT):
+        if timeout is DEFAULT_TIMEOUT:
+            return self.default_timeout
+        return timeout
+
+
+class FileCache(FileBasedCache):
+    """FileBasedCache, который считает файлы раз в CULL_EVERY записей.
+
+    Django перед каждой записью обходит весь каталог кэша, чтобы
+    проверить MAX_ENTRIES, и запись стоит O(числа записей). Здесь
+    обход делается реже, и каталог может превысить MAX_ENTRIES не больше
+    чем на CULL_EVERY записей на поток. Для разработки; в продакшене
+    общий кэш — memcached (SHARED_CACHE_BACKEND).
+    """
+
+    def __init__(self, location, params):
+        super().__init__(location, params)
+        options = params.get('OPTIONS', {})
+        self._cull_every = max(int(options.get('CULL_EVERY', 1000)), 1)
+        self._writes = 0
+
+    def _cull(self):
+        self._writes += 1
+        if self._writes % self._cull_every == 0:
+            super()._cull()
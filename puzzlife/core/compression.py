@@ -0,0 +1,66 @@
+import gzip
+import zlib
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+# Суффиксы заранее сжатых файлов статики.
+SUFFIXES = {'br': '.br', 'gzip': '.gz'}
+
+
+def encodings():
+    """Доступные кодировки в порядке предпочтения: brotli, если
+    установлен пакет brotli, затем gzip.
+    """
+    return ('br', 'gzip') if brotli is not None else ('gzip',)
+
+
+def accepted_encodings(request):
+    """Кодировки из Accept-Encoding, кроме запрещённых через q=0."""
+    accepted = set()
+    for part in request.META.get('HTTP_ACCEPT_ENCODING', '').split(','):
+        name, _, params = part.partition(';')
+        if params.replace(' ', '') not in ('q=0', 'q=0.0', 'q=0.00'):
+            accepted.add(name.strip().lower())
+    return accepted
+
+
+def choose_encoding(request):
+    """Лучшая доступная кодировка, которую принимает клиент."""
+    accepted = accepted_encodings(request)
+    for encoding in encodings():
+        if encoding in accepted:
+            return encoding
+    return None
+
+
+def compress(encoding, content, best=False):
+    """Сжимает content целиком. best — максимальное сжатие для файлов,
+    которые сжимаются один раз при collectstatic.
+    """
+    if encoding == 'br':
+        return brotli.compress(content, quality=11 if best else 5)
+    return gzip.compress(content, 9 if best else 6, mtime=0)
+
+
+def compress_stream(encoding, chunks):
+    """Сжимает поток по частям. Каждая часть сбрасывается сразу,
+    чтобы браузер получил начало страницы, не дожидаясь конца.
+    """
+    if encoding == 'br':
+        compressor = brotli.Compressor(quality=5)
+        for chunk in chunks:
+            data = compressor.process(chunk) + compressor.flush()
+            if data:
+                yield data
+        yield compressor.finish()
+        return
+    compressor = zlib.compressobj(6, zlib.DEFLATED, 16 + zlib.MAX_WBITS)
+    for chunk in chunks:
+        data = compressor.compress(chunk) + compressor.flush(
+            zlib.Z_SYNC_FLUSH)
+        if data:
+            yield data
+    yield compressor.flush()
@@ -0,0 +1,66 @@
+import os
+import re
+
+from django.conf import settings
+from django.core.exceptions import ImproperlyConfigured
+from django.db import DatabaseError, connections
+
+PRAGMA_VALUE = re.compile(r'^-?\w+$')
+
+
+def file_id(connection):
+    """Устройство и inode файла базы или None для базы в памяти."""
+    try:
+        stat = os.stat(connection.settings_dict['NAME'])
+    except (OSError, TypeError):
+        return None
+    return stat.st_dev, stat.st_ino
+
+
+def configure_sqlite(sender, connection, **kwargs):
+    """Обработчик connection_created: PRAGMA из SQLITE_PRAGMAS,
+    если включён SQLITE_TUNING.
+
+    journal_mode=wal хранится в самом файле базы, остальные
+    настройки действуют только на это соединение.
+    """
+    if connection.vendor != 'sqlite':
+        return
+    connection.file_id = file_id(connection)
+    if not settings.SQLITE_TUNING:
+        return
+    with connection.cursor() as cursor:
+        for name, value in settings.SQLITE_PRAGMAS.items():
+            if not (PRAGMA_VALUE.match(name)
+                    and PRAGMA_VALUE.match(str(value))):
+                raise ImproperlyConfigured(
+                    f'Недопустимая настройка SQLite: {name}={value}')
+            cursor.execute(f'PRAGMA {name} = {value}')
+
+
+def is_healthy(connection):
+    """Постоянное соединение ещё отвечает и смотрит в тот же файл:
+    после замены файла базы старое соединение читает удалённую копию.
+    """
+    if (connection.vendor == 'sqlite'
+            and getattr(connection, 'file_id', None) != file_id(connection)):
+        return False
+    try:
+        with connection.cursor() as cursor:
+            cursor.execute('SELECT 1')
+    except DatabaseError:
+        return False
+    return True
+
+
+def check_connections(**kwargs):
+    """Обработчик request_started: закрывает неисправные постоянные
+    соединения, чтобы запрос открыл новые.
+    """
+    for connection in connections.all():
+        if (connection.connection is None
+                or not connection.settings_dict['CONN_MAX_AGE']
+                or connection.in_atomic_block):
+            continue
+        if not is_healthy(connection):
+            connection.close()
@@ -0,0 +1,15 @@
+from django.conf import settings
+from sorl.thumbnail import get_thumbnail
+
+from core import timing
+
+
+@timing.timed('thumbs')
+def thumbnails(image):
+    """Миниатюры картинки во всех размерах из THUMBNAIL_SIZES.
+
+    Уже созданные миниатюры берутся из хранилища sorl, недостающие
+    создаются сразу.
+    """
+    return {name: get_thumbnail(image, geometry)
+            for name, geometry in settings.THUMBNAIL_SIZES.items()}
@@ -0,0 +1,55 @@
+import sqlite3
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import DEFAULT_DB_ALIAS, connections
+
+
+class Command(BaseCommand):
+    help = ('Копирует базу default в файлы реплик из REPLICA_DATABASES '
+            'через backup API SQLite. С --interval повторяет копирование '
+            'каждые столько секунд.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--interval', type=float,
+                            help='Копировать в цикле с этим периодом')
+        parser.add_argument('--pages', type=int, default=1024,
+                            help='Страниц за шаг. Между шагами запись '
+                                 'в default не ждёт копирования, но '
+                                 'перезапускает его; читатели реплики '
+                                 'ждут, пока копирование не закончится')
+
+    def handle(self, *args, **options):
+        source = connections[DEFAULT_DB_ALIAS]
+        if source.vendor != 'sqlite':
+            raise CommandError('Копирование рассчитано на SQLite.')
+        if not settings.REPLICA_DATABASES:
+            raise CommandError('Реплики не настроены: DATABASE_REPLICAS.')
+        while True:
+            started = time.monotonic()
+            for alias in settings.REPLICA_DATABASES:
+                try:
+                    self.copy(source, settings.DATABASES[alias]['NAME'],
+                              options['pages'])
+                except sqlite3.OperationalError as error:
+                    if options['interval'] is None:
+                        raise CommandError(f'{alias}: {error}')
+                    self.stderr.write(f'{alias}: {error}, повтор позже')
+            self.stdout.write(
+                f'Реплики обновлены за {time.monotonic() - started:.2f} с')
+            if options['interval'] is None:
+                return
+            time.sleep(options['interval'])
+
+    def copy(self, source, path, pages):
+        """Копирует базу в файл реплики. Backup API пишет в файл
+        на месте, поэтому открытые соединения реплики остаются рабочими,
+        но до конца копирования файл реплики заблокирован.
+        """
+        source.ensure_connection()
+        target = sqlite3.connect(path)
+        try:
+            source.connection.backup(target, pages=pages)
+        finally:
+            target.close()
@@ -0,0 +1,238 @@
+import logging
+import mimetypes
+import os
+import random
+import re
+import time
+from contextlib import ExitStack, contextmanager
+
+from django.conf import settings
+from django.core.exceptions import SuspiciousFileOperation
+from django.db import connections
+from django.http import FileResponse
+from django.utils._os import safe_join
+from django.utils.cache import patch_vary_headers
+
+from core import compression, timing
+from core.routers import LAST_WRITE_KEY, pop_wrote
+
+logger = logging.getLogger('core.timing')
+
+# Имя файла с хэшем содержимого от ManifestStaticFilesStorage.
+HASHED_NAME = re.compile(r'\.[0-9a-f]{12}\.\w+$')
+COMPRESSIBLE_TYPES = ('text/', 'application/json', 'application/javascript')
+IMMUTABLE_MAX_AGE = 365 * 24 * 60 * 60
+STATIC_MAX_AGE = 60
+
+# Этапы запроса в порядке вывода и их описания для Server-Timing.
+STAGES = (
+    ('db', 'Database'),
+    ('template', 'Templates'),
+    ('context', 'Context processors'),
+    ('cache', 'Cache'),
+    ('thumbs', 'Thumbnails'),
+)
+
+
+class ServerTimingMiddleware:
+    """Замеряет запрос к базе, шаблоны, кэш и всё время ответа.
+
+    Результат уходит в заголовок Server-Timing и строкой в лог
+    core.timing. Замеряется доля SERVER_TIMING_SAMPLE_RATE запросов,
+    остальные проходят без накладных расходов.
+
+    Потоковый ответ рендерится уже после выхода из представления,
+    когда заголовки отправлены: его части замеряются по мере отдачи,
+    а итог пишется только в лог после последней части.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        if random.random() >= settings.SERVER_TIMING_SAMPLE_RATE:
+            return self.get_response(request)
+        timings = timing.RequestTimings()
+        started = time.perf_counter()
+        with self.measuring(timings):
+            response = self.get_response(request)
+        if response.streaming:
+            response.streaming_content = self.stream(
+                response.streaming_content, request, response, timings,
+                started)
+            return response
+        total = time.perf_counter() - started
+        response['Server-Timing'] = self.header(timings, total)
+        self.log(request, response, timings, total)
+        return response
+
+    @contextmanager
+    def measuring(self, timings):
+        with timing.collect(timings), ExitStack() as stack:
+            for connection in connections.all():
+                stack.enter_context(
+                    connection.execute_wrapper(timing.time_query))
+            yield
+
+    def stream(self, content, request, response, timings, started):
+        """Части потокового ответа с замером их рендеринга. total —
+        время до последней части, вместе с ожиданием клиента.
+        """
+        chunks = iter(content)
+        end = object()
+        while True:
+            with self.measuring(timings):
+                chunk = next(chunks, end)
+            if chunk is end:
+                break
+            yield chunk
+        self.log(request, response, timings, time.perf_counter() - started)
+
+    def metrics(self, timings, total):
+        """Пары (этап, мс, описание) для замеренных этапов."""
+        metrics = [('total', total * 1000, 'Total')]
+        for name, description in STAGES:
+            if name == 'db':
+                description = f'{timings.counts["db"]} queries'
+            elif name == 'cache':
+                description = (f'{timings.counts["cache_hits"]} hits, '
+                               f'{timings.counts["cache_misses"]} misses')
+            elif name not in timings.durations:
+                continue
+            metrics.append(
+                (name, timings.durations[name] * 1000, description))
+        return metrics
+
+    def header(self, timings, total):
+        return ', '.join(
+            f'{name};dur={duration:.1f};desc="{description}"'
+            for name, duration, description in self.metrics(timings, total))
+
+    def log(self, request, response, timings, total):
+        match = request.resolver_match
+        fields = {
+            'view': match.view_name if match else '-',
+            'method': request.method,
+            'status': response.status_code,
+            'total_ms': round(total * 1000, 1),
+            'db_queries': timings.counts['db'],
+            'cache_hits': timings.counts['cache_hits'],
+            'cache_misses': timings.counts['cache_misses'],
+        }
+        for name, _ in STAGES:
+            fields[f'{name}_ms'] = round(timings.durations[name] * 1000, 1)
+        logger.info(' '.join(f'{key}={value}'
+                             for key, value in fields.items()),
+                    extra={'timings': fields})
+
+
+class ReplicaMiddleware:
+    """Запоминает в сессии время записи в базу: следующие
+    REPLICA_STICKY_SECONDS запросы пользователя читают с default.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        pop_wrote()
+        try:
+            response = self.get_response(request)
+        finally:
+            wrote = pop_wrote()
+        if wrote and settings.REPLICA_DATABASES:
+            request.session[LAST_WRITE_KEY] = time.time()
+        return response
+
+
+class StaticFilesMiddleware:
+    """Отдаёт собранную collectstatic статику из STATIC_ROOT.
+
+    Файлы с хэшем в имени кэшируются браузером навсегда (immutable),
+    остальные — на STATIC_MAX_AGE секунд. Если клиент принимает br или
+    gzip и рядом лежит сжатая копия, отдаётся она. Файлы, которых нет
+    в STATIC_ROOT, обрабатываются дальше как обычно.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        if (settings.STATIC_ROOT and request.method in ('GET', 'HEAD')
+                and request.path.startswith(settings.STATIC_URL)):
+            response = self.serve(
+                request, request.path[len(settings.STATIC_URL):])
+            if response is not None:
+                return response
+        return self.get_response(request)
+
+    def serve(self, request, name):
+        try:
+            path = safe_join(settings.STATIC_ROOT, name)
+        except SuspiciousFileOperation:
+            return None
+        if not os.path.isfile(path):
+            return None
+        content_type, _ = mimetypes.guess_type(path)
+        accepted = compression.accepted_encodings(request)
+        encoding = None
+        for candidate, suffix in compression.SUFFIXES.items():
+            if candidate in accepted and os.path.isfile(path + suffix):
+                path, encoding = path + suffix, candidate
+                break
+        response = FileResponse(
+            open(path, 'rb'),
+            content_type=content_type or 'application/octet-stream')
+        if encoding:
+            response['Content-Encoding'] = encoding
+        response['Vary'] = 'Accept-Encoding'
+        if HASHED_NAME.search(name):
+            response['Cache-Control'] = (
+                f'public, max-age={IMMUTABLE_MAX_AGE}, immutable')
+        else:
+            response['Cache-Control'] = f'public, max-age={STATIC_MAX_AGE}'
+        return response
+
+
+class CompressionMiddleware:
+    """Сжимает текстовые ответы brotli или gzip по Accept-Encoding,
+    если включён HTML_COMPRESS. Потоковые ответы сжимаются по частям.
+    """
+
+    min_length = 200
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        response = self.get_response(request)
+        if settings.HTML_COMPRESS:
+            self.compress(request, response)
+        return response
+
+    def compress(self, request, response):
+        content_type = response.get('Content-Type', '')
+        if (response.has_header('Content-Encoding')
+                or not content_type.startswith(COMPRESSIBLE_TYPES)):
+            return
+        patch_vary_headers(response, ('Accept-Encoding',))
+        encoding = compression.choose_encoding(request)
+        if encoding is None:
+            return
+        if response.streaming:
+            response.streaming_content = compression.compress_stream(
+                encoding, response.streaming_content)
+            del response['Content-Length']
+        else:
+            if len(response.content) < self.min_length:
+                return
+            compressed = compression.compress(encoding, response.content)
+            if len(compressed) >= len(response.content):
+                return
+            response.content = compressed
+            response['Content-Length'] = str(len(compressed))
+        etag = response.get('ETag', '')
+        if etag.startswith('"'):
+            # Сжатое тело отличается от исходного побайтно.
+            response['ETag'] = 'W/' + etag
+        response['Content-Encoding'] = encoding
@@ -2,11 +2,15 @@ from django.db import models
 
 
 class CreatedModel(models.Model):
-    """Абстрактная модель с датой создания."""
+    """Абстрактная модель с датами создания и изменения."""
     created = models.DateTimeField(
         'Дата создания',
         auto_now_add=True
     )
+    modified = models.DateTimeField(
+        'Дата изменения',
+        auto_now=True
+    )
 
     class Meta:
         abstract = True
@@ -0,0 +1,98 @@
+import random
+import threading
+import time
+from contextlib import contextmanager
+from functools import wraps
+
+from django.conf import settings
+from django.db import DEFAULT_DB_ALIAS, connections
+
+# Ключ сессии со временем последней записи пользователя.
+LAST_WRITE_KEY = '_last_write'
+
+# Состояние текущего запроса: читать ли с реплик и была ли запись.
+_state = threading.local()
+
+
+def reading_from_replica():
+    """Чтения текущего запроса могут идти на отстающую реплику."""
+    return (bool(settings.REPLICA_DATABASES)
+            and getattr(_state, 'replica', False))
+
+
+@contextmanager
+def _reads(replica):
+    previous = getattr(_state, 'replica', False)
+    _state.replica = replica
+    try:
+        yield
+    finally:
+        _state.replica = previous
+
+
+def replica_reads():
+    """Чтения внутри блока уходят на реплики из REPLICA_DATABASES."""
+    return _reads(True)
+
+
+def primary_reads():
+    """Чтения внутри блока идут в default, даже из read_from_replica.
+
+    Нужно там, где прочитанное кэшируется под текущими версиями:
+    данные реплики могут быть старше этих версий.
+    """
+    return _reads(False)
+
+
+def pop_wrote():
+    """Были ли записи в базу с прошлого вызова."""
+    wrote = getattr(_state, 'wrote', False)
+    _state.wrote = False
+    return wrote
+
+
+def wrote_recently(request):
+    """Пользователь писал в базу меньше REPLICA_STICKY_SECONDS назад:
+    реплика может ещё не знать об этой записи.
+    """
+    last_write = request.session.get(LAST_WRITE_KEY)
+    return (last_write is not None
+            and time.time() - last_write < settings.REPLICA_STICKY_SECONDS)
+
+
+def read_from_replica(view_func):
+    """Декоратор представления, которое только читает: его запросы
+    идут на реплику, если пользователь недавно ничего не менял.
+    """
+    @wraps(view_func)
+    def wrapper(request, *args, **kwargs):
+        if wrote_recently(request):
+            return view_func(request, *args, **kwargs)
+        with replica_reads():
+            return view_func(request, *args, **kwargs)
+    return wrapper
+
+
+class ReplicaRouter:
+    """Записи — в default, чтения из read_from_replica — на случайную
+    реплику. Внутри транзакции default чтения остаются на нём.
+    """
+
+    def db_for_read(self, model, **hints):
+        replicas = settings.REPLICA_DATABASES
+        if (replicas and reading_from_replica()
+                and not connections[DEFAULT_DB_ALIAS].in_atomic_block):
+            return random.choice(replicas)
+        return DEFAULT_DB_ALIAS
+
+    def db_for_write(self, model, **hints):
+        # Сохранение сессии не меняет данные, которые читают с реплик.
+        if model._meta.label != 'sessions.Session':
+            _state.wrote = True
+        return DEFAULT_DB_ALIAS
+
+    def allow_relation(self, obj1, obj2, **hints):
+        return True
+
+    def allow_migrate(self, db, app_label, **hints):
+        return db not in settings.REPLICA_DATABASES
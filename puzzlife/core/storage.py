@@ -0,0 +1,101 @@
+import os
+from io import BytesIO
+
+from django.conf import settings
+from django.contrib.staticfiles.storage import ManifestStaticFilesStorage
+from django.core.files.base import ContentFile
+from PIL import Image, features
+
+from core import compression
+
+IMAGE_EXTENSIONS = ('.png', '.jpg', '.jpeg')
+COMPRESS_EXTENSIONS = ('.css', '.js', '.svg', '.ico', '.json', '.txt',
+                       '.map', '.xml', '.html')
+# Сжатая копия сохраняется, только если она меньше этой доли оригинала.
+COMPRESS_RATIO = 0.95
+
+
+class OptimizedStaticFilesStorage(ManifestStaticFilesStorage):
+    """Статика с хэшем содержимого в имени для вечного кэширования.
+
+    При collectstatic большие картинки пережимаются (WebP, если Pillow
+    его поддерживает, иначе JPEG для непрозрачных и PNG для остальных):
+    манифест отдаёт {% static %} пережатый файл под старым именем.
+    Для текстовых файлов рядом кладутся .gz и, если установлен
+    brotli, .br версии.
+    """
+
+    def stored_name(self, name):
+        # До первого collectstatic манифеста нет: отдаём исходные файлы.
+        if not self.hashed_files:
+            return name
+        return super().stored_name(name)
+
+    def post_process(self, paths, dry_run=False, **options):
+        yield from super().post_process(paths, dry_run, **options)
+        if dry_run:
+            return
+        for name in paths:
+            if not name.lower().endswith(IMAGE_EXTENSIONS):
+                continue
+            key = self.hash_key(self.clean_name(name))
+            hashed_name = self.hashed_files.get(key)
+            if hashed_name is None:
+                continue
+            optimized = self.optimize_image(name, hashed_name)
+            if optimized is not None:
+                self.hashed_files[key] = optimized
+                yield name, optimized, True
+        for hashed_name in set(self.hashed_files.values()):
+            if hashed_name.lower().endswith(COMPRESS_EXTENSIONS):
+                for compressed in self.compress(hashed_name):
+                    yield hashed_name, compressed, True
+        self.save_manifest()
+
+    def replace(self, name, content):
+        if self.exists(name):
+            self.delete(name)
+        return self._save(name, ContentFile(content))
+
+    def optimize_image(self, name, hashed_name):
+        """Имя пережатой копии картинки или None, если картинка
+        маленькая или пережатая копия не получилась меньше.
+        """
+        size = self.size(hashed_name)
+        if size < settings.STATIC_IMAGE_MIN_SIZE:
+            return None
+        with self.open(hashed_name) as source:
+            image = Image.open(source)
+            image.load()
+        limit = settings.STATIC_IMAGE_MAX_SIZE
+        image.thumbnail((limit, limit), Image.LANCZOS)
+        if image.mode not in ('RGB', 'RGBA'):
+            image = image.convert('RGBA')
+        opaque = image.mode == 'RGB' or image.getextrema()[3][0] == 255
+        output = BytesIO()
+        if features.check('webp'):
+            extension = '.webp'
+            image.save(output, 'WEBP', quality=85, method=6)
+        elif opaque:
+            extension = '.jpg'
+            image.convert('RGB').save(output, 'JPEG', quality=85,
+                                      optimize=True, progressive=True)
+        else:
+            extension = '.png'
+            image.save(output, 'PNG', optimize=True)
+        content = output.getvalue()
+        if len(content) >= size:
+            return None
+        root, _ = os.path.splitext(name)
+        optimized = self.hashed_name(root + extension, ContentFile(content))
+        return self.replace(optimized, content)
+
+    def compress(self, name):
+        """Сохраняет сжатые копии файла и возвращает их имена."""
+        with self.open(name) as source:
+            content = source.read()
+        for encoding in compression.encodings():
+            compressed = compression.compress(encoding, content, best=True)
+            if len(compressed) < len(content) * COMPRESS_RATIO:
+                yield self.replace(
+                    name + compression.SUFFIXES[encoding], compressed)
@@ -0,0 +1,95 @@
+from contextlib import nullcontext
+
+from django.conf import settings
+from django.http import StreamingHttpResponse
+from django.middleware.csrf import get_token
+from django.shortcuts import render
+from django.template import loader
+from django.template.context import make_context
+from django.template.base import TextNode
+from django.template.loader_tags import (BLOCK_CONTEXT_KEY, BlockContext,
+                                         BlockNode, ExtendsNode)
+
+from core import timing
+from core.routers import reading_from_replica, replica_reads
+
+
+def iter_nodelist(nodelist, context):
+    """Рендерит узлы по одному. Перед каждым блоком накопленный
+    текст отдаётся отдельной частью: так <head> из базового шаблона
+    уходит клиенту раньше, чем отрендерится {% block content %}.
+    """
+    buffer = []
+    for node in nodelist:
+        if isinstance(node, ExtendsNode):
+            yield from iter_extends(node, context)
+            continue
+        if isinstance(node, BlockNode) and buffer:
+            yield ''.join(buffer)
+            buffer = []
+        buffer.append(node.render_annotated(context))
+    if buffer:
+        yield ''.join(buffer)
+
+
+def iter_extends(node, context):
+    """ExtendsNode.render, отдающий родительский шаблон по частям."""
+    parent = node.get_parent(context)
+    if BLOCK_CONTEXT_KEY not in context.render_context:
+        context.render_context[BLOCK_CONTEXT_KEY] = BlockContext()
+    block_context = context.render_context[BLOCK_CONTEXT_KEY]
+    block_context.add_blocks(node.blocks)
+    for parent_node in parent.nodelist:
+        if not isinstance(parent_node, TextNode):
+            if not isinstance(parent_node, ExtendsNode):
+                block_context.add_blocks({
+                    block.name: block for block in
+                    parent.nodelist.get_nodes_by_type(BlockNode)})
+            break
+    with context.render_context.push_state(parent, isolated_context=False):
+        yield from iter_nodelist(parent.nodelist, context)
+
+
+def timed_parts(parts):
+    """Части с замером рендеринга каждой как этапа template, без
+    времени, пока клиент забирает уже отданную часть.
+    """
+    end = object()
+    while True:
+        with timing.measure('template'):
+            part = next(parts, end)
+        if part is end:
+            return
+        yield part
+
+
+def stream_template(template_name, context, request, replica):
+    """Части страницы. Генератор выполняется уже после выхода из
+    представления, поэтому чтение с реплики включается заново.
+    """
+    template = loader.get_template(template_name)
+    context = make_context(context, request,
+                           autoescape=template.backend.engine.autoescape)
+    compiled = template.template
+    with replica_reads() if replica else nullcontext():
+        with context.render_context.push_state(compiled):
+            with context.bind_template(compiled):
+                context.template_name = compiled.name
+                yield from timed_parts(
+                    iter_nodelist(compiled.nodelist, context))
+
+
+def render_streaming(request, template_name, context=None):
+    """render(), который при HTML_STREAM отдаёт страницу по частям.
+
+    Анонимные посетители получают обычный ответ: его целиком
+    кэширует cache_anonymous_page.
+    """
+    if not settings.HTML_STREAM or not request.user.is_authenticated:
+        return render(request, template_name, context)
+    # CSRF-cookie выставляет middleware, то есть до начала рендеринга.
+    get_token(request)
+    return StreamingHttpResponse(
+        stream_template(template_name, context, request,
+                        reading_from_replica()),
+        content_type=f'text/html; charset={settings.DEFAULT_CHARSET}')
@@ -0,0 +1,31 @@
+from django.template.backends.django import DjangoTemplates, Template
+
+from core import timing
+
+
+class TimedTemplate(Template):
+    def render(self, context=None, request=None):
+        with timing.measure('template'):
+            return super().render(context, request)
+
+
+class TimedDjangoTemplates(DjangoTemplates):
+    """Шаблоны Django с замером рендеринга и контекст-процессоров
+    для Server-Timing.
+    """
+
+    def __init__(self, params):
+        super().__init__(params)
+        # Engine кэширует список процессоров в cached_property:
+        # подменяем его обёрнутыми версиями.
+        self.engine.__dict__['template_context_processors'] = tuple(
+            timing.timed('context')(processor)
+            for processor in self.engine.template_context_processors)
+
+    def from_string(self, template_code):
+        return TimedTemplate(
+            super().from_string(template_code).template, self)
+
+    def get_template(self, template_name):
+        return TimedTemplate(
+            super().get_template(template_name).template, self)
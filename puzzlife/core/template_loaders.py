@@ -0,0 +1,49 @@
+import re
+
+from django.template import Origin
+from django.template.loaders.base import Loader as BaseLoader
+
+# Содержимое этих тегов выводится как есть: пробелы в нём значимы.
+PRESERVED = re.compile(r'<(pre|textarea)\b.*?</\1\s*>', re.S | re.I)
+INDENT = re.compile(r'[ \t]*\n\s*')
+
+
+def minify(source):
+    """Убирает отступы и пустые строки шаблона. Перевод строки
+    остаётся, поэтому между строчными элементами сохраняется пробел.
+    """
+    parts = []
+    position = 0
+    for match in PRESERVED.finditer(source):
+        parts.append(INDENT.sub('\n', source[position:match.start()]))
+        parts.append(match.group())
+        position = match.end()
+    parts.append(INDENT.sub('\n', source[position:]))
+    return ''.join(parts)
+
+
+class Loader(BaseLoader):
+    """Загрузчик-обёртка: шаблоны вложенных загрузчиков сжимаются
+    один раз при компиляции, а не при каждом рендеринге.
+    """
+
+    def __init__(self, engine, loaders):
+        super().__init__(engine)
+        self.loaders = engine.get_template_loaders(loaders)
+
+    def get_template_sources(self, template_name):
+        for loader in self.loaders:
+            for origin in loader.get_template_sources(template_name):
+                # Origin указывает на эту обёртку, чтобы кэширующий
+                # загрузчик читал содержимое через minify.
+                wrapped = Origin(origin.name, origin.template_name, self)
+                wrapped.source_loader = loader
+                yield wrapped
+
+    def get_contents(self, origin):
+        return minify(origin.source_loader.get_contents(origin))
+
+    def reset(self):
+        for loader in self.loaders:
+            if hasattr(loader, 'reset'):
+                loader.reset()
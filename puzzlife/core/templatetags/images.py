@@ -0,0 +1,23 @@
+from django import template
+
+from core.images import thumbnails
+
+register = template.Library()
+
+
+@register.inclusion_tag('includes/responsive_image.html')
+def responsive_image(image, size, alt=''):
+    """Картинка нужного размера с размерами и вариантами для srcset."""
+    variants = thumbnails(image)
+    main = variants[size]
+    widths = {}
+    for variant in variants.values():
+        if variant.url:
+            widths.setdefault(variant.width, variant.url)
+    return {
+        'image': main,
+        'srcset': ', '.join(
+            f'{url} {width}w' for width, url in sorted(widths.items())),
+        'sizes': f'(max-width: {main.width}px) 100vw, {main.width}px',
+        'alt': alt,
+    }
@@ -0,0 +1,21 @@
+from django.test.runner import DiscoverRunner
+from django.test.utils import override_settings
+
+from core.cache import in_memory_caches
+
+
+class TestRunner(DiscoverRunner):
+    """Тесты без файлового кэша из исходников: иначе cache.clear()
+    в тестах очищал бы кэш запущенного сервера, а параллельные
+    прогоны мешали бы друг другу.
+    """
+
+    def setup_test_environment(self, **kwargs):
+        super().setup_test_environment(**kwargs)
+        self.caches_override = override_settings(
+            CACHES=in_memory_caches('tests-shared'))
+        self.caches_override.enable()
+
+    def teardown_test_environment(self, **kwargs):
+        self.caches_override.disable()
+        super().teardown_test_environment(**kwargs)
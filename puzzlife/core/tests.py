@@ -0,0 +1,435 @@
+import gzip
+import os
+import sqlite3
+import tempfile
+import time
+from unittest import mock
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.contrib.staticfiles.storage import staticfiles_storage
+from django.core.cache import cache, caches
+from django.core.cache.backends.locmem import LocMemCache
+from django.core.exceptions import ImproperlyConfigured
+from django.core.management import call_command
+from django.db import connection
+from django.db.backends.sqlite3.base import DatabaseWrapper
+from django.template import Context, Engine
+from django.test import (RequestFactory, SimpleTestCase, TestCase,
+                         override_settings)
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from core.cache import FileCache, LocalLRU, TwoTierCache
+from core.db import is_healthy
+from core.management.commands.sync_replica import \
+    Command as SyncReplicaCommand
+from core.routers import LAST_WRITE_KEY, ReplicaRouter, read_from_replica
+from core.template_loaders import minify
+from posts.models import Post
+
+User = get_user_model()
+
+
+class LocalLRUTest(SimpleTestCase):
+    def test_evicts_least_recently_used(self):
+        """При переполнении вытесняется давно не читанная запись."""
+        lru = LocalLRU(max_entries=2)
+        lru.set('a', 1, 60)
+        lru.set('b', 2, 60)
+        lru.get('a')
+        lru.set('c', 3, 60)
+        self.assertEqual(lru.get('a'), (True, 1))
+        self.assertEqual(lru.get('b'), (False, None))
+        self.assertEqual(lru.get('c'), (True, 3))
+
+    def test_expired_entry_is_miss(self):
+        """Запись с истёкшим сроком не возвращается."""
+        lru = LocalLRU(max_entries=2)
+        lru.set('a', 1, -1)
+        self.assertEqual(lru.get('a'), (False, None))
+
+    def test_values_are_copied(self):
+        """Изменение полученного значения не портит кэш."""
+        lru = LocalLRU(max_entries=2)
+        lru.set('a', [1], 60)
+        lru.get('a')[1].append(2)
+        self.assertEqual(lru.get('a'), (True, [1]))
+
+
+class TwoTierCacheTest(SimpleTestCase):
+    def setUp(self):
+        self.cache = TwoTierCache('test', {'OPTIONS': {
+            'SHARED': 'shared',
+            'MAX_ENTRIES': 10,
+            'LOCAL_TIMEOUT': 5,
+            'SHARED_ONLY_PREFIXES': ['version:'],
+        }})
+        self.cache.clear()
+        self.cache._stats.clear()
+        self.shared = caches['shared']
+
+    def test_tests_do_not_touch_file_cache(self):
+        """Тесты пишут в кэш в памяти, а не в файловый кэш проекта."""
+        self.assertIsInstance(self.shared, LocMemCache)
+
+    def test_second_read_is_local(self):
+        """Повторное чтение обслуживает локальный уровень."""
+        self.shared.set('key', 'value')
+        self.assertEqual(self.cache.get('key'), 'value')
+        self.assertEqual(self.cache.get('key'), 'value')
+        self.assertEqual(self.cache.stats, {
+            'local_hits': 1, 'local_misses': 1,
+            'shared_hits': 1, 'shared_misses': 0,
+        })
+
+    def test_write_goes_to_both_tiers(self):
+        """Запись видна в общем кэше и читается без обращения к нему."""
+        self.cache.set('key', 'value')
+        self.assertEqual(self.shared.get('key'), 'value')
+        self.assertEqual(self.cache.get('key'), 'value')
+        self.assertEqual(self.cache.stats['local_hits'], 1)
+        self.assertNotIn('shared_hits', self.cache.stats)
+
+    def test_local_copy_expires(self):
+        """Локальная копия живёт не дольше LOCAL_TIMEOUT."""
+        self.cache.local_timeout = 0.01
+        self.cache.set('key', 'old')
+        self.shared.set('key', 'new')
+        self.assertEqual(self.cache.get('key'), 'old')
+        time.sleep(0.02)
+        self.assertEqual(self.cache.get('key'), 'new')
+
+    def test_version_keys_are_read_from_shared(self):
+        """Ключи версий всегда читаются из общего кэша."""
+        self.cache.set('version:post:1', 1)
+        self.shared.incr('version:post:1')
+        self.assertEqual(self.cache.get('version:post:1'), 2)
+        self.assertEqual(self.cache.stats['local_misses'], 0)
+        self.assertEqual(self.cache.stats['shared_hits'], 1)
+
+    def test_delete_drops_local_copy(self):
+        """Удаление убирает запись с обоих уровней."""
+        self.cache.set('key', 'value')
+        self.cache.delete('key')
+        self.assertIsNone(self.cache.get('key'))
+        self.assertIsNone(self.shared.get('key'))
+
+    def test_get_many_and_set_many(self):
+        """Пакетные операции проходят оба уровня за один вызов."""
+        self.cache.set_many({'a': 1, 'b': 2})
+        self.shared.set('c', 3)
+        self.assertEqual(self.cache.get_many(['a', 'b', 'c', 'd']),
+                         {'a': 1, 'b': 2, 'c': 3})
+        self.assertEqual(self.cache.stats, {
+            'local_hits': 2, 'local_misses': 2,
+            'shared_hits': 1, 'shared_misses': 1,
+        })
+
+    def test_incr_reads_fresh_value(self):
+        """incr не оставляет устаревшую локальную копию."""
+        self.cache.set('counter', 1)
+        self.assertEqual(self.cache.incr('counter'), 2)
+        self.assertEqual(self.cache.get('counter'), 2)
+
+
+class FileCacheTest(SimpleTestCase):
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.cache = FileCache(directory.name, {'OPTIONS': {
+            'MAX_ENTRIES': 4, 'CULL_FREQUENCY': 2, 'CULL_EVERY': 5,
+        }})
+
+    def test_directory_is_listed_every_few_writes(self):
+        """Каталог обходится раз в CULL_EVERY записей, и размер кэша
+        всё равно ограничен.
+        """
+        with mock.patch.object(FileCache, '_list_cache_files',
+                               wraps=self.cache._list_cache_files) as listed:
+            for i in range(10):
+                self.cache.set(f'key{i}', i)
+        self.assertEqual(listed.call_count, 2)
+        self.assertLessEqual(len(self.cache._list_cache_files()),
+                             4 + 5)
+
+
+class ServerTimingMiddlewareTest(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        author = User.objects.create_user(username='author')
+        Post.objects.create(author=author, text='Тестовый пост')
+
+    def setUp(self):
+        cache.clear()
+
+    @override_settings(SERVER_TIMING_SAMPLE_RATE=1)
+    def test_sampled_request_has_timings(self):
+        """Замеренный запрос отдаёт Server-Timing и пишет строку в лог."""
+        with self.assertLogs('core.timing', 'INFO') as logs, \
+                CaptureQueriesContext(connection) as queries:
+            response = self.client.get(reverse('posts:index'))
+        header = response['Server-Timing']
+        for name in ('total', 'db', 'template', 'context', 'cache'):
+            self.assertRegex(header, rf'(^|, ){name};dur=[\d.]+;desc=')
+        self.assertIn(f'desc="{len(queries)} queries"', header)
+        self.assertEqual(len(logs.records), 1)
+        fields = logs.records[0].timings
+        self.assertEqual(fields['view'], 'posts:index')
+        self.assertEqual(fields['db_queries'], len(queries))
+        self.assertGreater(fields['cache_hits'] + fields['cache_misses'], 0)
+
+    @override_settings(SERVER_TIMING_SAMPLE_RATE=1, HTML_STREAM=True)
+    def test_streamed_page_is_measured_to_the_end(self):
+        """Потоковая страница без Server-Timing: запросы и шаблоны
+        при отдаче частей попадают в строку лога после последней.
+        """
+        self.client.force_login(User.objects.get())
+        with self.assertLogs('core.timing', 'INFO') as logs, \
+                CaptureQueriesContext(connection) as queries:
+            response = self.client.get(reverse('posts:index'))
+            self.assertTrue(response.streaming)
+            self.assertFalse(response.has_header('Server-Timing'))
+            self.assertEqual(logs.records, [])
+            b''.join(response.streaming_content)
+        self.assertEqual(len(logs.records), 1)
+        fields = logs.records[0].timings
+        self.assertEqual(fields['db_queries'], len(queries))
+        self.assertGreater(fields['template_ms'], 0)
+
+    @override_settings(SERVER_TIMING_SAMPLE_RATE=0)
+    def test_unsampled_request_is_untouched(self):
+        """Запрос вне выборки проходит без замеров."""
+        with self.assertRaises(AssertionError):
+            with self.assertLogs('core.timing', 'INFO'):
+                response = self.client.get(reverse('posts:index'))
+        self.assertFalse(response.has_header('Server-Timing'))
+
+
+class SqliteTuningTest(SimpleTestCase):
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.path = os.path.join(directory.name, 'db.sqlite3')
+        self.connection = DatabaseWrapper(
+            {**connection.settings_dict, 'NAME': self.path,
+             'CONN_MAX_AGE': 60}, alias='tuning')
+        self.addCleanup(self.connection.close)
+
+    def pragma(self, name):
+        with self.connection.cursor() as cursor:
+            cursor.execute(f'PRAGMA {name}')
+            return cursor.fetchone()[0]
+
+    @override_settings(SQLITE_TUNING=True, SQLITE_PRAGMAS={
+        'journal_mode': 'wal', 'busy_timeout': 1234, 'temp_store': 'memory',
+    })
+    def test_pragmas_are_applied(self):
+        """Новое соединение получает PRAGMA из настроек."""
+        self.assertEqual(self.pragma('journal_mode'), 'wal')
+        self.assertEqual(self.pragma('busy_timeout'), 1234)
+        self.assertEqual(self.pragma('temp_store'), 2)
+
+    @override_settings(SQLITE_TUNING=False)
+    def test_tuning_is_opt_in(self):
+        """Без SQLITE_TUNING журнал остаётся прежним."""
+        self.assertEqual(self.pragma('journal_mode'), 'delete')
+
+    @override_settings(SQLITE_TUNING=True,
+                       SQLITE_PRAGMAS={'journal_mode': 'wal; DROP'})
+    def test_bad_value_is_rejected(self):
+        """Значения PRAGMA не подставляются в SQL без проверки."""
+        with self.assertRaises(ImproperlyConfigured):
+            self.connection.ensure_connection()
+
+    def test_replaced_file_is_unhealthy(self):
+        """Соединение к подменённому файлу базы считается неисправным."""
+        self.connection.ensure_connection()
+        self.assertTrue(is_healthy(self.connection))
+        os.replace(self.path, self.path + '.old')
+        open(self.path, 'w').close()
+        self.assertFalse(is_healthy(self.connection))
+
+
+@override_settings(REPLICA_DATABASES=['replica'])
+class ReplicaRouterTest(SimpleTestCase):
+    def setUp(self):
+        self.router = ReplicaRouter()
+        self.request = RequestFactory().get('/')
+        self.request.session = {}
+
+    def read_db(self, request):
+        """База, куда пошло бы чтение из представления."""
+        return read_from_replica(
+            lambda request: self.router.db_for_read(Post))(request)
+
+    def test_views_read_from_replica(self):
+        """Чтения из read_from_replica уходят на реплику, записи нет."""
+        self.assertEqual(self.read_db(self.request), 'replica')
+        self.assertEqual(self.router.db_for_read(Post), 'default')
+        self.assertEqual(self.router.db_for_write(Post), 'default')
+
+    def test_recent_writer_reads_primary(self):
+        """После своей записи пользователь читает с default."""
+        self.request.session[LAST_WRITE_KEY] = time.time()
+        self.assertEqual(self.read_db(self.request), 'default')
+        with override_settings(REPLICA_STICKY_SECONDS=0):
+            self.assertEqual(self.read_db(self.request), 'replica')
+
+    def test_replicas_are_not_migrated(self):
+        self.assertFalse(self.router.allow_migrate('replica', 'posts'))
+        self.assertTrue(self.router.allow_migrate('default', 'posts'))
+
+
+@override_settings(REPLICA_DATABASES=['replica'])
+class ReplicaMiddlewareTest(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user(username='author')
+
+    def setUp(self):
+        self.client.force_login(self.user)
+
+    def test_write_marks_session(self):
+        """Запрос с записью в базу включает чтение с default."""
+        self.client.get(reverse('posts:index'))
+        self.assertNotIn(LAST_WRITE_KEY, self.client.session)
+        self.client.post(reverse('posts:post_create'), {'text': 'Пост'})
+        self.assertIn(LAST_WRITE_KEY, self.client.session)
+
+
+class SyncReplicaCommandTest(SimpleTestCase):
+    def test_database_is_copied(self):
+        """sync_replica копирует базу в файл реплики."""
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        source = DatabaseWrapper(
+            {**connection.settings_dict,
+             'NAME': os.path.join(directory.name, 'db.sqlite3')},
+            alias='source')
+        self.addCleanup(source.close)
+        with source.cursor() as cursor:
+            cursor.execute('CREATE TABLE post (text TEXT)')
+            cursor.execute("INSERT INTO post VALUES ('Пост')")
+        path = os.path.join(directory.name, 'replica.sqlite3')
+        SyncReplicaCommand().copy(source, path, pages=1)
+        with sqlite3.connect(path) as replica:
+            self.assertEqual(
+                replica.execute('SELECT text FROM post').fetchall(),
+                [('Пост',)])
+
+
+class StaticFilesTest(SimpleTestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.directory = tempfile.TemporaryDirectory()
+        cls.settings = override_settings(STATIC_ROOT=cls.directory.name)
+        cls.settings.enable()
+        call_command('collectstatic', interactive=False, verbosity=0)
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.settings.disable()
+        cls.directory.cleanup()
+        super().tearDownClass()
+
+    def test_large_images_are_replaced(self):
+        """Большая непрозрачная PNG отдаётся пережатой и меньшей."""
+        url = staticfiles_storage.url('img/background.png')
+        self.assertRegex(url, r'/img/background\.[0-9a-f]{12}\.(jpg|webp)$')
+        optimized = staticfiles_storage.path(
+            staticfiles_storage.stored_name('img/background.png'))
+        original = staticfiles_storage.path('img/background.png')
+        self.assertLess(os.path.getsize(optimized),
+                        os.path.getsize(original))
+
+    def test_hashed_files_are_immutable(self):
+        """Файл с хэшем отдаётся сжатым и с вечным кэшированием."""
+        url = staticfiles_storage.url('css/bootstrap.min.css')
+        response = self.client.get(url, HTTP_ACCEPT_ENCODING='gzip, br')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response['Content-Encoding'], 'gzip')
+        self.assertIn('immutable', response['Cache-Control'])
+        self.assertEqual(response['Content-Type'], 'text/css')
+        content = gzip.decompress(b''.join(response.streaming_content))
+        self.assertIn(b'bootstrap', content)
+
+    def test_plain_files_are_revalidated(self):
+        """Файл без хэша кэшируется ненадолго и без сжатия, если
+        клиент его не принимает.
+        """
+        response = self.client.get('/static/css/bootstrap.min.css')
+        self.assertEqual(response.status_code, 200)
+        self.assertNotIn('Content-Encoding', response)
+        self.assertNotIn('immutable', response['Cache-Control'])
+
+
+class MinifyTest(SimpleTestCase):
+    def test_indentation_is_removed(self):
+        """Отступы и пустые строки убираются, перевод строки остаётся."""
+        self.assertEqual(
+            minify('<ul>\n    <li>1</li>\n\n    <li>2</li>  \n</ul>'),
+            '<ul>\n<li>1</li>\n<li>2</li>\n</ul>')
+
+    def test_preformatted_text_is_kept(self):
+        """Содержимое pre и textarea не меняется."""
+        source = ('<div>\n  <pre>\n  a\n    b</pre>\n'
+                  '  <textarea>\n x</textarea>')
+        self.assertEqual(
+            minify(source),
+            '<div>\n<pre>\n  a\n    b</pre>\n<textarea>\n x</textarea>')
+
+    def test_loader_minifies_templates(self):
+        """Загрузчик отдаёт сжатый шаблон, и он рендерится как обычный."""
+        engine = Engine(dirs=[settings.TEMPLATES_DIR], loaders=[
+            ('core.template_loaders.Loader',
+             ['django.template.loaders.filesystem.Loader'])])
+        template = engine.get_template('includes/footer.html')
+        with open(os.path.join(settings.TEMPLATES_DIR,
+                               'includes', 'footer.html')) as source:
+            original = source.read()
+        self.assertEqual(template.source, minify(original))
+        self.assertIn('\n', template.render(Context({'year': 2024})))
+
+
+class StreamingPageTest(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user(username='reader')
+        Post.objects.create(author=cls.user, text='Тестовый пост')
+
+    def setUp(self):
+        cache.clear()
+        self.client.force_login(self.user)
+
+    def test_stream_matches_rendered_page(self):
+        """Потоковая страница совпадает с обычной, <head> идёт
+        отдельной первой частью.
+        """
+        url = reverse('posts:index')
+        expected = self.client.get(url).content
+        with override_settings(HTML_STREAM=True):
+            response = self.client.get(url)
+        self.assertTrue(response.streaming)
+        chunks = list(response.streaming_content)
+        self.assertGreater(len(chunks), 1)
+        self.assertIn(b'stylesheet', chunks[0])
+        self.assertNotIn('Тестовый пост'.encode(), chunks[0])
+        self.assertEqual(b''.join(chunks), expected)
+
+    @override_settings(HTML_COMPRESS=True)
+    def test_response_is_compressed(self):
+        """Ответ сжимается, если клиент принимает gzip."""
+        url = reverse('posts:index')
+        plain = self.client.get(url)
+        self.assertNotIn('Content-Encoding', plain)
+        response = self.client.get(url, HTTP_ACCEPT_ENCODING='gzip')
+        self.assertEqual(response['Content-Encoding'], 'gzip')
+        self.assertIn('Accept-Encoding', response['Vary'])
+        self.assertEqual(gzip.decompress(response.content), plain.content)
+        with override_settings(HTML_STREAM=True):
+            response = self.client.get(url, HTTP_ACCEPT_ENCODING='gzip')
+        self.assertEqual(
+            gzip.decompress(b''.join(response.streaming_content)),
+            plain.content)
@@ -0,0 +1,84 @@
+import threading
+import time
+from collections import Counter, defaultdict
+from contextlib import contextmanager
+from functools import wraps
+
+# Замеры текущего запроса; None, если запрос не попал в выборку.
+_local = threading.local()
+
+
+class RequestTimings:
+    """Время и счётчики по этапам одного запроса."""
+
+    def __init__(self):
+        self.durations = defaultdict(float)
+        self.counts = Counter()
+        self.depth = Counter()
+
+    def add(self, name, seconds, count=1):
+        self.durations[name] += seconds
+        self.counts[name] += count
+
+
+def current():
+    return getattr(_local, 'timings', None)
+
+
+@contextmanager
+def collect(timings=None):
+    """Собирает замеры всего, что выполняется внутри блока, в timings
+    или в новый RequestTimings.
+    """
+    _local.timings = timings = timings or RequestTimings()
+    try:
+        yield timings
+    finally:
+        _local.timings = None
+
+
+@contextmanager
+def measure(name):
+    """Добавляет время блока к этапу name. Вложенные замеры одного
+    этапа (шаблон внутри шаблона) не считаются дважды.
+    """
+    timings = current()
+    if timings is None or timings.depth[name]:
+        yield
+        return
+    timings.depth[name] += 1
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        timings.depth[name] -= 1
+        timings.add(name, time.perf_counter() - started)
+
+
+def count(name, value=1):
+    timings = current()
+    if timings is not None:
+        timings.counts[name] += value
+
+
+def timed(name):
+    """Декоратор: замер каждого вызова функции как этапа name."""
+    def decorator(func):
+        @wraps(func)
+        def wrapper(*args, **kwargs):
+            with measure(name):
+                return func(*args, **kwargs)
+        return wrapper
+    return decorator
+
+
+def time_query(execute, sql, params, many, context):
+    """execute_wrapper соединения: время и число запросов к базе."""
+    timings = current()
+    if timings is None:
+        return execute(sql, params, many, context)
+    started = time.perf_counter()
+    try:
+        return execute(sql, params, many, context)
+    finally:
+        timings.add('db', time.perf_counter() - started)
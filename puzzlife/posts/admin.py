@@ -1,12 +1,136 @@
+import hashlib
+
 from django.contrib import admin
+from django.contrib.admin.widgets import ForeignKeyRawIdWidget
+from django.core.cache import cache
+from django.core.paginator import Paginator
+from django.db import connection
+from django.urls import NoReverseMatch, reverse
+from django.utils.functional import cached_property
+from django.utils.text import Truncator
+
 from .models import Group, Post, Comment
+from .search import filter_matching, match_expression
+
+COUNT_TIMEOUT = 60 * 5
+
+
+class EstimatedCountPaginator(Paginator):
+    """Пагинатор changelist без COUNT(*) по всей таблице на каждый показ.
+
+    Без фильтров число строк берётся из статистики ANALYZE, иначе точное
+    число кэшируется на COUNT_TIMEOUT по тексту запроса.
+    """
+
+    def estimate(self):
+        table = self.object_list.model._meta.db_table
+        with connection.cursor() as cursor:
+            cursor.execute("SELECT 1 FROM sqlite_master "
+                           "WHERE type = 'table' AND name = 'sqlite_stat1'")
+            if cursor.fetchone() is None:
+                return None
+            cursor.execute(
+                'SELECT stat FROM sqlite_stat1 WHERE tbl = %s LIMIT 1',
+                [table])
+            row = cursor.fetchone()
+        return int(row[0].split()[0]) if row else None
+
+    @cached_property
+    def count(self):
+        query = self.object_list.query
+        if connection.vendor == 'sqlite' and not query.where:
+            estimate = self.estimate()
+            if estimate is not None:
+                return estimate
+        sql, params = query.sql_with_params()
+        key = 'admin_count:' + hashlib.md5(
+            f'{sql}{params}'.encode()).hexdigest()
+        count = cache.get(key)
+        if count is None:
+            count = self.object_list.count()
+            cache.set(key, count, COUNT_TIMEOUT)
+        return count
+
+
+class FastChangeListMixin:
+    """Changelist за постоянное число запросов: связанные объекты
+    подтягиваются join'ом, общее число строк не считается.
+    """
+
+    paginator = EstimatedCountPaginator
+    show_full_result_count = False
+
+
+class LoadedRawIdWidget(ForeignKeyRawIdWidget):
+    """Поле id связанного объекта, подпись которого берётся из объекта,
+    уже загруженного list_select_related, а не запросом на строку.
+    """
+
+    loaded = None
+
+    def label_and_url_for_value(self, value):
+        obj = self.loaded
+        if obj is None or str(obj.pk) != str(value):
+            return super().label_and_url_for_value(value)
+        meta = obj._meta
+        try:
+            url = reverse(
+                f'{self.admin_site.name}:{meta.app_label}_'
+                f'{meta.model_name}_change', args=(obj.pk,))
+        except NoReverseMatch:
+            url = ''
+        return Truncator(obj).words(14), url
+
+
+class RawIdListEditableMixin:
+    """list_editable для raw_id_fields за постоянное число запросов."""
+
+    def formfield_for_foreignkey(self, db_field, request, **kwargs):
+        if db_field.name in self.raw_id_fields:
+            kwargs['widget'] = LoadedRawIdWidget(
+                db_field.remote_field, self.admin_site,
+                using=kwargs.get('using'))
+        return super().formfield_for_foreignkey(db_field, request, **kwargs)
+
+    def get_changelist_form(self, request, **kwargs):
+        editable = [name for name in self.list_editable
+                    if name in self.raw_id_fields]
+
+        class ChangeListForm(super().get_changelist_form(request, **kwargs)):
+            def __init__(self, *args, **kwargs):
+                super().__init__(*args, **kwargs)
+                for name in editable:
+                    self.fields[name].widget.loaded = getattr(
+                        self.instance, name)
+
+        return ChangeListForm
+
+
+class FullTextSearchMixin:
+    """Поиск в админке по полнотекстовому индексу вместо LIKE '%...%'.
+
+    Текст ищется по индексу, автор — по точному совпадению имени.
+    """
+
+    search_fields = ('text', 'author__username')
+
+    def get_search_results(self, request, queryset, search_term):
+        if not search_term or connection.vendor != 'sqlite':
+            return super().get_search_results(
+                request, queryset, search_term)
+        found = queryset.filter(author__username=search_term)
+        if match_expression(search_term):
+            found |= filter_matching(queryset, search_term)
+        return found, False
 
 
 @admin.register(Post)
-class PostAdmin(admin.ModelAdmin):
+class PostAdmin(FastChangeListMixin, FullTextSearchMixin,
+                RawIdListEditableMixin, admin.ModelAdmin):
     list_display = ('pk', 'text', 'created', 'author', 'group',)
     list_editable = ('group',)
-    search_fields = ('text', 'author',)
+    list_select_related = ('author', 'group')
+    raw_id_fields = ('author', 'group')
     list_filter = ('created',)
     empty_value_display = '-пусто-'
 
@@ -17,7 +141,9 @@ class GroupAdmin(admin.ModelAdmin):
 
 
 @admin.register(Comment)
-class CommentAdmin(admin.ModelAdmin):
+class CommentAdmin(FastChangeListMixin, FullTextSearchMixin,
+                   admin.ModelAdmin):
     list_display = ('pk', 'text', 'created', 'author', 'post',)
-    search_fields = ('text', 'author',)
+    list_select_related = ('author', 'post')
+    raw_id_fields = ('author', 'post')
     list_filter = ('created',)
@@ -0,0 +1,188 @@
+import hashlib
+import uuid
+from collections import Counter
+from functools import wraps
+
+from django.core.cache import cache
+from django.db import transaction
+from django.http import HttpResponse
+from django.utils.safestring import mark_safe
+
+from core.routers import primary_reads, reading_from_replica
+
+from .cards import CardRenderer
+from .models import Group, Post
+
+CARD_TIMEOUT = 60 * 60 * 24
+PAGE_TIMEOUT = 60 * 60
+
+# Попадания и промахи кэша карточек в этом процессе.
+card_stats = Counter()
+
+
+def version_key(kind, pk):
+    return f'version:{kind}:{pk}'
+
+
+def fresh_version():
+    """Новое значение версии, которое не совпадёт ни с одним прежним,
+    даже если версия была вытеснена из кэша.
+    """
+    return uuid.uuid4().hex
+
+
+def bump_version(kind, pk):
+    """Меняет версию после коммита текущей транзакции.
+
+    До коммита читатель ещё видит старые строки и закэшировал бы их
+    под новой версией. Версия не увеличивается, а заменяется новой:
+    incr в файловом кэше — это get и set, и два одновременных сброса
+    дали бы одну и ту же версию.
+    """
+    key = version_key(kind, pk)
+    transaction.on_commit(lambda: cache.set(key, fresh_version(), None))
+
+
+def get_versions(keys):
+    """Текущие версии для keys; недостающие заводятся заново."""
+    versions = cache.get_many(keys)
+    missing = {key: fresh_version() for key in keys if key not in versions}
+    for key, value in missing.items():
+        if not cache.add(key, value, None):
+            value = cache.get(key, value)
+        versions[key] = value
+    return versions
+
+
+def card_dependencies(post):
+    keys = [version_key('post', post.pk),
+            version_key('author', post.author_id)]
+    if post.group_id:
+        keys.append(version_key('group', post.group_id))
+    return keys
+
+
+def attach_cards(posts, show_group=True):
+    """Кладёт в post.card готовую карточку поста.
+
+    Карточки берутся из кэша одним get_many, CardRenderer рендерит только
+    промахи. Ключ карточки включает версии поста, автора и группы.
+    Карточки, прочитанные с реплики, не кэшируются: реплика может
+    отставать от версий, и старая карточка легла бы под новый ключ.
+    """
+    posts = list(posts)
+    if not posts:
+        return
+    dependencies = {post.pk: card_dependencies(post) for post in posts}
+    versions = get_versions(list({
+        key for keys in dependencies.values() for key in keys}))
+    card_keys = {
+        post.pk: 'post_card:{}:{}:{}'.format(
+            post.pk,
+            int(show_group),
+            ':'.join(str(versions[key]) for key in dependencies[post.pk]),
+        )
+        for post in posts
+    }
+    cards = cache.get_many(card_keys.values())
+    missed_ids = [post.pk for post in posts if card_keys[post.pk] not in cards]
+    store = missed_ids and not reading_from_replica()
+    fresh = {}
+    if store:
+        # Строки страницы прочитаны до версий: правка между ними
+        # положила бы старую карточку под новую версию. Промахи
+        # рендерятся по строкам, прочитанным уже после версий.
+        fresh = Post.objects.feed().in_bulk(missed_ids)
+    missed = {}
+    renderer = None
+    for post in posts:
+        key = card_keys[post.pk]
+        if key not in cards:
+            renderer = renderer or CardRenderer(show_group)
+            cards[key] = missed[key] = renderer.render(
+                fresh.get(post.pk, post))
+        post.card = mark_safe(cards[key])
+    card_stats['hits'] += len(posts) - len(missed)
+    card_stats['misses'] += len(missed)
+    if store:
+        cache.set_many(missed, CARD_TIMEOUT)
+
+
+def feed_generations(*scopes):
+    """Ключи поколений лент. Общее поколение меняется при любой правке
+    ленты, поколение «meta» — при смене названий групп и имён авторов,
+    которые видны на страницах всех лент.
+    """
+    return [version_key('feed', scope) for scope in scopes]
+
+
+def group_id_key(slug):
+    # Слаг может быть не ASCII, а такие ключи memcached не принимает.
+    return 'group_id:' + hashlib.md5(slug.encode()).hexdigest()
+
+
+def group_scope(slug):
+    """Область ленты группы. Ключ строится по id группы; id по слагу
+    берётся из кэша, чтобы страница из кэша не стоила запроса.
+    Прочитанный с реплики id не кэшируется: слаг мог уже уйти к другой
+    группе.
+    """
+    key = group_id_key(slug)
+    pk = cache.get(key)
+    if pk is None:
+        pk = Group.objects.filter(slug=slug).values_list(
+            'pk', flat=True).first()
+        if pk is not None and not reading_from_replica():
+            cache.set(key, pk, None)
+    return f'group:{pk}'
+
+
+def forget_group_slugs(slugs):
+    """Сбрасывает id групп по слагам после коммита: слаг мог перейти
+    к другой группе.
+    """
+    keys = [group_id_key(slug) for slug in slugs]
+    transaction.on_commit(lambda: cache.delete_many(keys))
+
+
+def bump_feeds(group_ids=(), author_ids=(), meta=False):
+    bump_version('feed', 'all')
+    if meta:
+        bump_version('feed', 'meta')
+    for group_id in group_ids:
+        bump_version('feed', f'group:{group_id}')
+    for author_id in author_ids:
+        bump_version('feed', f'author:{author_id}')
+
+
+def cache_anonymous_page(scopes):
+    """Кэширует страницу ленты целиком для анонимных посетителей.
+
+    scopes(**kwargs) возвращает области, от которых зависит страница;
+    ключ включает их поколения, поэтому правка поста сразу даёт новый ключ.
+    Промах рендерится по default, а не по реплике, отстающей от поколений.
+    Авторизованные пользователи кэш не используют.
+    """
+    def decorator(view_func):
+        @wraps(view_func)
+        def wrapper(request, *args, **kwargs):
+            if request.method != 'GET' or request.user.is_authenticated:
+                return view_func(request, *args, **kwargs)
+            generations = get_versions(
+                feed_generations('meta', *scopes(**kwargs)))
+            path = hashlib.md5(
+                request.get_full_path().encode()).hexdigest()
+            key = 'feed_page:{}:{}'.format(path, ':'.join(
+                str(value) for _, value in sorted(generations.items())))
+            cached = cache.get(key)
+            if cached is not None:
+                content, content_type = cached
+                return HttpResponse(content, content_type=content_type)
+            with primary_reads():
+                response = view_func(request, *args, **kwargs)
+            if response.status_code == 200 and not response.streaming:
+                cache.set(key, (response.content, response['Content-Type']),
+                          PAGE_TIMEOUT)
+            return response
+        return wrapper
+    return decorator
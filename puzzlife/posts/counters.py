@@ -0,0 +1,52 @@
+from django.db.models import Count, F, OuterRef, Subquery
+from django.db.models.functions import Coalesce
+
+from .models import Follow, Post, Profile
+
+
+def related_count(model, field):
+    """Подзапрос числа строк model, ссылающихся на текущую через field."""
+    return Coalesce(Subquery(
+        model.objects.filter(**{field: OuterRef('pk')})
+        .order_by().values(field).annotate(total=Count('pk'))
+        .values('total')
+    ), 0)
+
+
+def profile_counts():
+    """Значения счётчиков профиля, посчитанные по исходным таблицам."""
+    return {
+        'posts_count': related_count(Post, 'author'),
+        'followers_count': related_count(Follow, 'author'),
+        'following_count': related_count(Follow, 'user'),
+    }
+
+
+def change_counter(queryset, field, delta):
+    """Атомарно меняет счётчик на delta прямо в базе.
+
+    Разошедшийся счётчик не уходит в минус: его чинит reconcile_counters.
+    Возвращает число изменённых строк.
+    """
+    if delta < 0:
+        queryset = queryset.filter(**{f'{field}__gte': -delta})
+    return queryset.update(**{field: F(field) + delta})
+
+
+def change_post_counter(post_id, field, delta):
+    change_counter(Post.objects.filter(pk=post_id), field, delta)
+
+
+def change_profile_counter(user_id, field, delta):
+    profiles = Profile.objects.filter(pk=user_id)
+    if not change_counter(profiles, field, delta) and not profiles.exists():
+        # У пользователей из bulk_create профиля нет: заводим его сразу
+        # с пересчитанными счётчиками, в которых это изменение уже есть.
+        Profile.objects.bulk_create([Profile(pk=user_id)],
+                                    ignore_conflicts=True)
+        profiles.update(**profile_counts())
+
+
+def change_follow_counters(user_id, author_id, delta):
+    change_profile_counter(user_id, 'following_count', delta)
+    change_profile_counter(author_id, 'followers_count', delta)
@@ -0,0 +1,145 @@
+import hashlib
+from functools import wraps
+
+from django.db.models import Exists, Max, OuterRef, Subquery
+from django.middleware.csrf import get_token
+from django.utils.cache import patch_cache_control
+from django.views.decorators.http import condition
+
+from core.routers import reading_from_replica
+
+from .cache import feed_generations, get_versions
+from .models import Comment, Follow, Like, Post, User
+from .utils import get_page
+
+
+def make_etag(*parts):
+    return hashlib.md5(':'.join(map(str, parts)).encode()).hexdigest()
+
+
+def viewer(request):
+    """Всё, что делает страницу своей для каждого посетителя: шапка
+    с именем пользователя, токен CSRF в формах и параметры страницы.
+
+    Формы есть только у авторизованных посетителей, поэтому гостю
+    токен не заводится: его ответы не ставят cookie CSRF и одинаковы
+    для всех гостей в кэше анонимных страниц.
+    """
+    if not request.user.is_authenticated:
+        return None, None, request.get_full_path()
+    # get_token() заводит cookie CSRF, если её нет, чтобы ETag
+    # совпал с токеном в отданной странице.
+    get_token(request)
+    return (request.user.pk, request.META['CSRF_COOKIE'],
+            request.get_full_path())
+
+
+def generations(*scopes):
+    versions = get_versions(feed_generations('meta', *scopes))
+    return [value for _, value in sorted(versions.items())]
+
+
+def viewer_scopes(request):
+    """Область своих лайков и подписок авторизованного посетителя."""
+    if not request.user.is_authenticated:
+        return []
+    return [f'viewer:{request.user.pk}']
+
+
+def page_likes(request, posts):
+    """Счётчики лайков постов страницы. Они видны авторизованным
+    в лентах, но поколений не меняют: лайк меняет ETag только тех
+    страниц, где есть его пост.
+    """
+    if not request.user.is_authenticated:
+        return []
+    page = get_page(posts.only('id', 'created', 'likes_count'), request.GET)
+    return [(post.pk, post.likes_count) for post in page]
+
+
+def conditional_page(etag_func):
+    """Отвечает 304 Not Modified, если ETag страницы не изменился,
+    не выполняя view. Браузер обязан перепроверять страницу
+    при каждом показе, общие кэши её не хранят.
+    """
+    def decorator(view_func):
+        conditional_view = condition(etag_func=etag_func)(view_func)
+
+        @wraps(view_func)
+        def wrapper(request, *args, **kwargs):
+            response = conditional_view(request, *args, **kwargs)
+            patch_cache_control(response, private=True, no_cache=True)
+            return response
+        return wrapper
+    return decorator
+
+
+def primary_only(etag_func):
+    """ETag только для страниц, прочитанных из default.
+
+    Поколения в кэше могут быть новее отстающей реплики: страница
+    с реплики под новым поколением подтверждалась бы 304 и после
+    того, как реплика догонит правку, до следующей записи.
+    """
+    @wraps(etag_func)
+    def etag(request, *args, **kwargs):
+        if reading_from_replica():
+            return None
+        return etag_func(request, *args, **kwargs)
+    return etag
+
+
+def feed_etag(scopes, posts):
+    """ETag ленты по поколениям её областей: любая правка поста,
+    группы или автора в ленте меняет поколение. posts(**kwargs) —
+    посты ленты, для счётчиков лайков её страницы.
+
+    Страница авторизованного, отрендеренная с реплики, ETag
+    не получает, см. primary_only. Анонимные страницы рендерятся
+    по default в cache_anonymous_page.
+    """
+    def etag(request, **kwargs):
+        if request.user.is_authenticated and reading_from_replica():
+            return None
+        return make_etag(*viewer(request), *generations(
+            *scopes(**kwargs), *viewer_scopes(request)),
+            *page_likes(request, posts(**kwargs)))
+    return etag
+
+
+@primary_only
+def profile_etag(request, username):
+    author = User.objects.filter(username=username).values_list(
+        'pk', 'profile__posts_count', 'profile__followers_count',
+        'profile__following_count').first()
+    if author is None:
+        return None
+    following = request.user.is_authenticated and Follow.objects.filter(
+        user=request.user, author=author[0]).exists()
+    return make_etag(*viewer(request),
+                     *generations(f'author:{author[0]}',
+                                  *viewer_scopes(request)),
+                     *author, following,
+                     *page_likes(request,
+                                 Post.objects.filter(author=author[0])))
+
+
+@primary_only
+def post_etag(request, post_id):
+    """ETag поста: время правки, счётчики, последний комментарий
+    и лайк посетителя, всё одним запросом.
+    """
+    posts = Post.objects.filter(pk=post_id).annotate(
+        last_comment=Subquery(
+            Comment.objects.filter(post=OuterRef('pk')).order_by()
+            .values('post').annotate(last=Max('modified')).values('last')))
+    fields = ['modified', 'likes_count', 'comments_count', 'last_comment',
+              'author__profile__posts_count']
+    if request.user.is_authenticated:
+        posts = posts.annotate(viewer_liked=Exists(Like.objects.filter(
+            post=OuterRef('pk'), user=request.user)))
+        fields.append('viewer_liked')
+    state = posts.values_list(*fields).first()
+    if state is None:
+        return None
+    return make_etag(*viewer(request), *generations(), *state)
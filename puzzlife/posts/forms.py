@@ -28,3 +28,7 @@ class CommentForm(forms.ModelForm):
         help_texts = {
             'text': 'Оставьте здесь свой комментарий'
         }
+
+
+class SearchForm(forms.Form):
+    q = forms.CharField(label='Поиск', max_length=200, strip=True)
@@ -0,0 +1,72 @@
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+from django.template import Context, Engine, engines
+
+from posts.cards import CardRenderer
+from posts.models import Post
+
+CARD_TEMPLATE = 'posts/includes/posts_list.html'
+FILE_LOADERS = [
+    'django.template.loaders.filesystem.Loader',
+    'django.template.loaders.app_directories.Loader',
+]
+
+
+class Command(BaseCommand):
+    help = ('Сравнивает время рендеринга страницы из 10 и 100 карточек '
+            'постов: шаблон без кэша загрузчика, шаблон с кэшем '
+            'и CardRenderer. Кэш карточек не используется.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--sizes', type=int, nargs='+',
+                            default=[10, 100])
+        parser.add_argument('--repeat', type=int, default=20,
+                            help='Рендерингов каждой страницы')
+
+    def handle(self, *args, **options):
+        posts = list(Post.objects.feed()[:max(options['sizes'])])
+        if not posts:
+            raise CommandError(
+                'Нет данных: сначала запустите generate_data.')
+        renderers = {
+            'шаблон': self.template_renderer(FILE_LOADERS),
+            'шаблон, кэш': self.template_renderer(
+                [('django.template.loaders.cached.Loader', FILE_LOADERS)]),
+            'CardRenderer': lambda: CardRenderer().render,
+        }
+        self.stdout.write(f'{"способ":<16}' + ''.join(
+            f'{f"{size} карточек, мс":>20}' for size in options['sizes']))
+        for name, render in renderers.items():
+            timings = [self.measure(render, posts[:size], options['repeat'])
+                       for size in options['sizes']]
+            self.stdout.write(f'{name:<16}' + ''.join(
+                f'{timing:>20.2f}' for timing in timings))
+
+    def template_renderer(self, loaders):
+        """Фабрика функций рендеринга карточки через отдельный Engine
+        с заданными загрузчиками.
+        """
+        configured = engines.all()[0].engine
+        engine = Engine(
+            dirs=configured.dirs, loaders=loaders,
+            libraries=configured.libraries,
+            autoescape=configured.autoescape)
+
+        def render(post):
+            template = engine.get_template(CARD_TEMPLATE)
+            return template.render(Context(
+                {'post': post, 'show_group': True},
+                autoescape=engine.autoescape))
+        return lambda: render
+
+    def measure(self, make_renderer, posts, repeat):
+        """Среднее время страницы в мс. Как в attach_cards, рендерер
+        создаётся заново для каждой страницы.
+        """
+        started = time.perf_counter()
+        for _ in range(repeat):
+            render = make_renderer()
+            for post in posts:
+                render(post)
+        return (time.perf_counter() - started) * 1000 / repeat
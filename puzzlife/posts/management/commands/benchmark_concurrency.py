@@ -0,0 +1,123 @@
+import random
+import threading
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import OperationalError, connection, connections
+from django.test import override_settings
+
+from posts.models import Like, Post, User
+from posts.toggles import set_like
+
+# Сколько последних постов читают и лайкают потоки.
+POST_POOL = 1000
+
+
+class Worker(threading.Thread):
+    """Поток, повторяющий операцию до истечения срока."""
+
+    def __init__(self, operation, deadline):
+        super().__init__()
+        self.operation = operation
+        self.deadline = deadline
+        self.done = 0
+        self.locked = 0
+
+    def run(self):
+        try:
+            while time.monotonic() < self.deadline:
+                try:
+                    self.done += self.operation()
+                except OperationalError:
+                    self.locked += 1
+        finally:
+            connections.close_all()
+
+
+class Command(BaseCommand):
+    help = ('Замеряет пропускную способность читателей ленты и писателей '
+            'лайков в параллельных потоках без настроек SQLite и с '
+            'SQLITE_PRAGMAS. Лайки снимаются сразу после постановки.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--readers', type=int, default=4)
+        parser.add_argument('--writers', type=int, default=2)
+        parser.add_argument('--seconds', type=float, default=5)
+
+    def handle(self, *args, **options):
+        if connection.vendor != 'sqlite':
+            raise CommandError('Замер рассчитан на SQLite.')
+        self.posts = list(Post.objects.order_by('-pk').values_list(
+            'pk', flat=True)[:POST_POOL])
+        if not self.posts:
+            raise CommandError(
+                'Нет данных: сначала запустите generate_data.')
+        journal_mode = self.pragma('journal_mode')
+        writers = [
+            User.objects.create_user(username=f'benchmark-writer-{number}')
+            for number in range(options['writers'])
+        ]
+        try:
+            results = {
+                'default': self.run(False, writers, options),
+                'tuned': self.run(True, writers, options),
+            }
+        finally:
+            # Лайки, снять которые помешала блокировка, снимаются
+            # через set_like, чтобы сошлись счётчики.
+            for like in Like.objects.filter(user__in=writers):
+                set_like(like.user, like.post_id, False)
+            User.objects.filter(
+                pk__in=[user.pk for user in writers]).delete()
+            self.pragma(f'journal_mode = {journal_mode}')
+        self.print_report(results)
+
+    def pragma(self, statement):
+        connections.close_all()
+        with connection.cursor() as cursor:
+            cursor.execute(f'PRAGMA {statement}')
+            return cursor.fetchone()[0]
+
+    def run(self, tuned, writers, options):
+        """Один прогон; без настроек журнал возвращается в DELETE."""
+        with override_settings(SQLITE_TUNING=tuned):
+            if not tuned:
+                self.pragma('journal_mode = delete')
+            connections.close_all()
+            deadline = time.monotonic() + options['seconds']
+            readers = [Worker(self.read, deadline)
+                       for _ in range(options['readers'])]
+            likers = [Worker(self.writer(user), deadline)
+                      for user in writers]
+            for worker in readers + likers:
+                worker.start()
+            for worker in readers + likers:
+                worker.join()
+        seconds = options['seconds']
+        return {
+            'reads': sum(worker.done for worker in readers) / seconds,
+            'writes': sum(worker.done for worker in likers) / seconds,
+            'locked': sum(worker.locked for worker in readers + likers),
+        }
+
+    def read(self):
+        list(Post.objects.feed().filter(
+            pk__lte=random.choice(self.posts))[:settings.POSTS_NUM])
+        return 1
+
+    def writer(self, user):
+        def write():
+            post_id = random.choice(self.posts)
+            set_like(user, post_id, True)
+            set_like(user, post_id, False)
+            return 2
+        return write
+
+    def print_report(self, results):
+        self.stdout.write(f'{"режим":<10}{"чтений/с":>12}{"записей/с":>12}'
+                          f'{"блокировок":>12}')
+        for mode, result in results.items():
+            self.stdout.write(
+                f'{mode:<10}{result["reads"]:>12.1f}'
+                f'{result["writes"]:>12.1f}{result["locked"]:>12}')
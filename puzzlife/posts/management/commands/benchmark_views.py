@@ -0,0 +1,201 @@
+import json
+import math
+import time
+from datetime import datetime
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
+from django.db.models import Count
+from django.test import Client, override_settings
+from django.urls import reverse
+
+from core.cache import in_memory_caches
+from posts.models import Comment, Group, Post, Profile, User
+from posts.urls import app_name, urlpatterns
+
+# Маршруты, которые вызываются не GET, и данные их запросов.
+REQUEST_METHODS = {
+    'add_comment': ('post', {'text': 'Комментарий для замера'}),
+    'like_api': ('post', None),
+    'follow_api': ('post', None),
+}
+
+
+def percentile(values, share):
+    """Перцентиль по ближайшему рангу."""
+    ordered = sorted(values)
+    rank = max(math.ceil(share * len(ordered)), 1)
+    return ordered[rank - 1]
+
+
+class QueryTimer:
+    """Считает запросы к базе и время их выполнения."""
+
+    def __init__(self):
+        self.count = 0
+        self.seconds = 0.0
+
+    def __call__(self, execute, sql, params, many, context):
+        started = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.seconds += time.perf_counter() - started
+            self.count += 1
+
+
+class Command(BaseCommand):
+    help = ('Замеряет время ответа и число запросов для каждого маршрута '
+            'posts.urls на текущей базе, пишет результат в JSON и сравнивает '
+            'с сохранённым эталоном. Изменения данных откатываются, '
+            'кэш на время замера свой, в памяти процесса.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--requests', type=int, default=50,
+                            help='Замеров на маршрут')
+        parser.add_argument('--warmup', type=int, default=3)
+        parser.add_argument('--routes', nargs='*',
+                            help='Имена маршрутов; по умолчанию все')
+        parser.add_argument('--anonymous', action='store_true',
+                            help='Запросы без входа на сайт')
+        parser.add_argument('--output', default='benchmark.json')
+        parser.add_argument('--baseline',
+                            help='JSON прошлого прогона для сравнения')
+        parser.add_argument('--threshold', type=float, default=0.2,
+                            help='Допустимый рост p95, доля от эталона')
+
+    def handle(self, *args, **options):
+        if not Post.objects.exists():
+            raise CommandError(
+                'Нет данных: сначала запустите generate_data.')
+        routes = self.routes(options['routes'])
+        hosts = [*settings.ALLOWED_HOSTS, 'testserver']
+        # Откат транзакции не откатывает кэш: версии, карточки
+        # и страницы из замера не должны попасть в общий кэш сервера.
+        with override_settings(DEBUG=False, ALLOWED_HOSTS=hosts,
+                               CACHES=in_memory_caches('benchmark')):
+            client = Client()
+            if not options['anonymous']:
+                client.force_login(self.reader())
+            results = {
+                name: self.measure(client, name, url, data, options)
+                for name, url, data in routes
+            }
+        report = {
+            'created': datetime.now().isoformat(timespec='seconds'),
+            'posts': Post.objects.count(),
+            'anonymous': options['anonymous'],
+            'routes': results,
+        }
+        with open(options['output'], 'w') as output:
+            json.dump(report, output, indent=2, ensure_ascii=False)
+        self.print_report(results)
+        if options['baseline']:
+            self.compare(report, options['baseline'], options['threshold'])
+
+    def reader(self):
+        """Самый активный читатель: у него самая длинная лента подписок."""
+        return User.objects.annotate(
+            follows=Count('follower')).order_by('-follows', 'pk').first()
+
+    def sample_kwargs(self):
+        """Значения параметров маршрутов: самые нагруженные объекты."""
+        post = Post.objects.order_by('-comments_count', '-pk').first()
+        author = User.objects.get(pk=Profile.objects.order_by(
+            '-followers_count', 'pk').values_list('pk', flat=True)[0])
+        group = Group.objects.annotate(
+            total=Count('posts')).order_by('-total', 'pk').first()
+        comment = Comment.objects.order_by('-pk').first()
+        return {
+            'query': post.text.split()[0] if post.text.split() else 'пост',
+            'post_id': post.pk,
+            'username': author.username,
+            'slug': group.slug if group else None,
+            'comment_id': comment.pk if comment else None,
+        }
+
+    def routes(self, names):
+        values = self.sample_kwargs()
+        routes = []
+        for pattern in urlpatterns:
+            if names and pattern.name not in names:
+                continue
+            kwargs = {key: values[key]
+                      for key in pattern.pattern.converters}
+            if None in kwargs.values():
+                self.stderr.write(f'{pattern.name}: нет данных, пропущен')
+                continue
+            url = reverse(f'{app_name}:{pattern.name}', kwargs=kwargs)
+            _, data = REQUEST_METHODS.get(pattern.name, ('get', None))
+            if pattern.name == 'search':
+                data = {'q': values['query']}
+            routes.append((pattern.name, url, data))
+        return routes
+
+    def request(self, client, name, url, data):
+        """Один запрос; всё, что он изменил в базе, откатывается."""
+        method, _ = REQUEST_METHODS.get(name, ('get', None))
+        timer = QueryTimer()
+        with transaction.atomic(), connection.execute_wrapper(timer):
+            started = time.perf_counter()
+            response = getattr(client, method)(url, data)
+            elapsed = time.perf_counter() - started
+            transaction.set_rollback(True)
+        if response.status_code == 404 or response.status_code >= 500:
+            raise CommandError(f'{name}: ответ {response.status_code}')
+        return elapsed, timer
+
+    def measure(self, client, name, url, data, options):
+        for _ in range(options['warmup']):
+            self.request(client, name, url, data)
+        times, queries, sql_times = [], [], []
+        for _ in range(options['requests']):
+            elapsed, timer = self.request(client, name, url, data)
+            times.append(elapsed * 1000)
+            queries.append(timer.count)
+            sql_times.append(timer.seconds * 1000)
+        return {
+            'url': url,
+            'p50_ms': round(percentile(times, 0.5), 3),
+            'p95_ms': round(percentile(times, 0.95), 3),
+            'p99_ms': round(percentile(times, 0.99), 3),
+            'queries': max(queries),
+            'sql_ms': round(sum(sql_times) / len(sql_times), 3),
+        }
+
+    def print_report(self, results):
+        self.stdout.write(f'{"маршрут":<20}{"p50":>9}{"p95":>9}{"p99":>9}'
+                          f'{"запросов":>10}{"SQL, мс":>9}')
+        for name, result in results.items():
+            self.stdout.write(
+                f'{name:<20}{result["p50_ms"]:>9.1f}{result["p95_ms"]:>9.1f}'
+                f'{result["p99_ms"]:>9.1f}{result["queries"]:>10}'
+                f'{result["sql_ms"]:>9.1f}')
+
+    def compare(self, report, path, threshold):
+        """Падает, если p95 вырос больше порога или запросов стало
+        больше, чем в эталоне.
+        """
+        with open(path) as source:
+            baseline = json.load(source)
+        if baseline['posts'] != report['posts']:
+            self.stderr.write(
+                f'Эталон снят на {baseline["posts"]} постах, '
+                f'а в базе {report["posts"]}: сравнение приблизительное')
+        regressions = []
+        for name, result in report['routes'].items():
+            expected = baseline['routes'].get(name)
+            if expected is None:
+                continue
+            limit = expected['p95_ms'] * (1 + threshold)
+            if result['p95_ms'] > limit:
+                regressions.append(
+                    f'{name}: p95 {result["p95_ms"]} мс > {limit:.3f} мс')
+            if result['queries'] > expected['queries']:
+                regressions.append(
+                    f'{name}: запросов {result["queries"]} > '
+                    f'{expected["queries"]}')
+        if regressions:
+            raise CommandError('Регрессии:\n' + '\n'.join(regressions))
+        self.stdout.write(self.style.SUCCESS('Регрессий нет'))
@@ -0,0 +1,31 @@
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+
+from posts import timeline
+from posts.models import User
+
+
+class Command(BaseCommand):
+    help = ('Сверяет материализованные ленты подписок с лентой, собранной '
+            'при чтении, и при --repair пересобирает разошедшиеся.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--repair', action='store_true')
+        parser.add_argument('--batch-size', type=int, default=1000)
+
+    def handle(self, *args, **options):
+        readers = User.objects.filter(
+            follower__isnull=False).distinct().order_by('pk')
+        broken = 0
+        for user in readers.iterator(chunk_size=options['batch_size']):
+            if timeline.is_consistent(user):
+                continue
+            broken += 1
+            if options['repair']:
+                with transaction.atomic():
+                    timeline.rebuild(user)
+        if broken and not options['repair']:
+            raise CommandError(f'Разошедшихся лент: {broken}')
+        self.stdout.write(self.style.SUCCESS(
+            f'Пересобрано лент: {broken}' if broken
+            else 'Все ленты согласованы'))
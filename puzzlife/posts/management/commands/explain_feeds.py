@@ -0,0 +1,57 @@
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+
+from posts.models import Comment, Group, Like, Post, User
+from posts.utils import KeysetPaginator
+
+
+class Command(BaseCommand):
+    help = 'Печатает EXPLAIN QUERY PLAN для всех запросов лент.'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--fail-on-scan', action='store_true',
+            help='Завершиться с ошибкой, если план содержит полный '
+                 'просмотр таблицы или сортировку во временном B-дереве.'
+        )
+
+    def feed_queries(self):
+        user = User.objects.order_by('pk').first() or User(pk=1)
+        group = Group.objects.order_by('pk').first() or Group(pk=1)
+        post = Post.objects.order_by('pk').first() or Post(
+            pk=1, created=timezone.now())
+        feeds = {
+            'index': Post.objects.feed(),
+            'group_posts': group.posts.feed(),
+            'profile': user.posts.feed(),
+            'follow_index': Post.objects.feed().filter(
+                author__following__user=user),
+        }
+        cursor = [post.created, post.pk]
+        for name, queryset in feeds.items():
+            paginator = KeysetPaginator(queryset)
+            yield f'{name}: первая страница', paginator.window()
+            yield f'{name}: следующая страница', paginator.window(cursor)
+            yield f'{name}: предыдущая страница', paginator.window(
+                cursor, forward=False)
+        yield 'post_detail: комментарии', Comment.objects.filter(post=post)
+        yield 'post_detail: лайк', Like.objects.filter(user=user, post=post)
+        yield 'profile: подписка', user.follower.filter(author=user)
+
+    @staticmethod
+    def is_slow(line):
+        if 'TEMP B-TREE' in line:
+            return True
+        return ' SCAN ' in f' {line} ' and 'USING' not in line
+
+    def handle(self, *args, **options):
+        problems = []
+        for title, queryset in self.feed_queries():
+            plan = queryset.explain()
+            self.stdout.write(self.style.MIGRATE_HEADING(title))
+            self.stdout.write(plan + '\n')
+            if any(self.is_slow(line) for line in plan.splitlines()):
+                problems.append(title)
+        if problems and options['fail_on_scan']:
+            raise CommandError(
+                'Запросы без подходящего индекса: ' + ', '.join(problems))
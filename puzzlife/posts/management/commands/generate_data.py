@@ -0,0 +1,259 @@
+import itertools
+import math
+import random
+import time
+from contextlib import contextmanager
+from datetime import timedelta
+from io import BytesIO
+
+from django.contrib.auth.hashers import make_password
+from django.core.cache import cache
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.core.management import call_command
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.db.models import Max
+from django.utils import timezone
+from faker import Faker
+from PIL import Image
+
+from posts import timeline
+from posts.models import (Comment, Follow, Group, Like, Post, Profile,
+                          TimelineEntry, User)
+
+# Показатель закона Ципфа: у автора с рангом k подписчиков
+# и у поста с рангом k лайков и комментариев примерно 1/k^s.
+ZIPF_EXPONENT = 1.1
+GROUP_SHARE = 0.7
+TEXT_POOL_SIZE = 2000
+IMAGE_POOL_SIZE = 20
+SCATTER_STEP = 1000003
+TIMELINE_CHUNK = 500
+
+
+def zipf_weights(count, exponent=ZIPF_EXPONENT):
+    """Накопленные веса для random.choices по закону Ципфа."""
+    return list(itertools.accumulate(
+        1 / rank ** exponent for rank in range(1, count + 1)))
+
+
+def chunks(iterable, size):
+    iterator = iter(iterable)
+    while True:
+        batch = list(itertools.islice(iterator, size))
+        if not batch:
+            return
+        yield batch
+
+
+@contextmanager
+def explicit_timestamps(*models):
+    """Отключает auto_now и auto_now_add, чтобы bulk_create сохранил
+    заданные даты вместо текущего времени.
+    """
+    fields = [field for model in models
+              for field in model._meta.concrete_fields
+              if getattr(field, 'auto_now', False)
+              or getattr(field, 'auto_now_add', False)]
+    saved = [(field, field.auto_now, field.auto_now_add) for field in fields]
+    for field in fields:
+        field.auto_now = field.auto_now_add = False
+    try:
+        yield
+    finally:
+        for field, auto_now, auto_now_add in saved:
+            field.auto_now, field.auto_now_add = auto_now, auto_now_add
+
+
+class Command(BaseCommand):
+    help = ('Заполняет базу синтетическими пользователями, группами, '
+            'постами, комментариями, подписками и лайками с реалистичными '
+            'перекосами. Одинаковый --seed даёт одинаковые данные.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--users', type=int, default=1000)
+        parser.add_argument('--groups', type=int, default=20)
+        parser.add_argument('--posts', type=int, default=10000)
+        parser.add_argument('--comments', type=int, default=20000)
+        parser.add_argument('--follows', type=int, default=20000)
+        parser.add_argument('--likes', type=int, default=50000)
+        parser.add_argument('--images', type=float, default=0.0,
+                            help='Доля постов с картинкой, от 0 до 1')
+        parser.add_argument('--days', type=int, default=365,
+                            help='За сколько последних дней создаются посты')
+        parser.add_argument('--seed', type=int, default=42)
+        parser.add_argument('--batch-size', type=int, default=5000)
+
+    def handle(self, *args, **options):
+        started = time.monotonic()
+        self.rng = random.Random(options['seed'])
+        self.fake = Faker('ru_RU')
+        self.fake.seed_instance(options['seed'])
+        self.batch_size = options['batch_size']
+        self.now = timezone.now()
+        self.span = timedelta(days=options['days'])
+        self.texts = [self.fake.sentence(nb_words=10)
+                      for _ in range(TEXT_POOL_SIZE)]
+        with explicit_timestamps(Post, Comment):
+            users = self.create_users(options['users'])
+            groups = self.create_groups(options['groups'])
+            posts = self.create_posts(options['posts'], users, groups,
+                                      options['images'])
+            self.create_comments(options['comments'], users, posts)
+            self.create_follows(options['follows'], users)
+            self.create_likes(options['likes'], users, posts)
+        call_command('reconcile_counters', batch_size=self.batch_size,
+                     stdout=self.stdout)
+        self.create_timelines(users)
+        # bulk_create не шлёт сигналов: версии и поколения кэша
+        # об этих данных не знают, поэтому кэш сбрасывается целиком.
+        cache.clear()
+        self.stdout.write(self.style.SUCCESS(
+            f'Данные созданы за {time.monotonic() - started:.1f} с'))
+
+    def create_timelines(self, users):
+        """Ленты подписок новых пользователей, порциями по id."""
+        if not users:
+            return
+        for low in range(min(users), max(users) + 1, TIMELINE_CHUNK):
+            with transaction.atomic():
+                timeline.rebuild_range(low, low + TIMELINE_CHUNK)
+        self.stdout.write(
+            f'Записей в лентах: {TimelineEntry.objects.count()}')
+
+    def next_ids(self, model, count):
+        last = model.objects.aggregate(last=Max('pk'))['last'] or 0
+        return range(last + 1, last + 1 + count)
+
+    def insert(self, model, objects, ignore_conflicts=False):
+        """Пишет объекты порциями, каждую в отдельной транзакции."""
+        written = 0
+        for batch in chunks(objects, self.batch_size):
+            with transaction.atomic():
+                model.objects.bulk_create(
+                    batch, ignore_conflicts=ignore_conflicts)
+            written += len(batch)
+        self.stdout.write(f'{model._meta.verbose_name_plural}: {written}')
+
+    def ranked(self, ids):
+        """Выбор из ids с перекосом: первые по порядку выпадают чаще."""
+        weights = zipf_weights(len(ids))
+        return lambda: self.rng.choices(ids, cum_weights=weights)[0]
+
+    def create_users(self, count):
+        ids = self.next_ids(User, count)
+        password = make_password(None)
+        fake = self.fake
+        self.insert(User, (
+            User(pk=pk, username=f'user{pk}', password=password,
+                 first_name=fake.first_name(), last_name=fake.last_name())
+            for pk in ids))
+        self.insert(Profile, (Profile(user_id=pk) for pk in ids))
+        # Популярность не связана с порядком регистрации.
+        popular = list(ids)
+        self.rng.shuffle(popular)
+        return popular
+
+    def create_groups(self, count):
+        ids = self.next_ids(Group, count)
+        self.insert(Group, (
+            Group(pk=pk, title=self.fake.catch_phrase()[:200],
+                  slug=f'group-{pk}', description=self.fake.paragraph())
+            for pk in ids))
+        return list(ids)
+
+    def image_pool(self):
+        names = []
+        for number in range(IMAGE_POOL_SIZE):
+            name = f'posts/generated-{number}.jpg'
+            if not default_storage.exists(name):
+                color = tuple(self.rng.randrange(256) for _ in range(3))
+                output = BytesIO()
+                Image.new('RGB', (1200, 800), color).save(output, 'JPEG')
+                name = default_storage.save(
+                    name, ContentFile(output.getvalue()))
+            names.append(name)
+        return names
+
+    def create_posts(self, count, users, groups, images):
+        ids = self.next_ids(Post, count)
+        author = self.ranked(users)
+        group = self.ranked(groups) if groups else None
+        pool = self.image_pool() if images > 0 else []
+        rng = self.rng
+
+        def build():
+            for index, pk in enumerate(ids):
+                yield Post(
+                    pk=pk,
+                    author_id=author(),
+                    group_id=(group() if group and rng.random() < GROUP_SHARE
+                              else None),
+                    text=' '.join(
+                        rng.choices(self.texts, k=rng.randint(1, 6))),
+                    image=(rng.choice(pool) if pool and rng.random() < images
+                           else ''),
+                    created=self.post_created(index, count),
+                    modified=self.post_created(index, count),
+                )
+        self.insert(Post, build())
+        return ids
+
+    def post_created(self, index, count):
+        """Посты равномерно распределены по последним --days дням,
+        и порядок id совпадает с порядком дат.
+        """
+        return self.now - self.span + self.span * (index / max(count, 1))
+
+    def hot_posts(self, posts):
+        """Выбор постов по закону Ципфа. Горячие посты разбросаны
+        по всему диапазону id шагом, взаимно простым с числом постов.
+        """
+        count = len(posts)
+        step = SCATTER_STEP
+        while math.gcd(step, count) != 1:
+            step += 2
+        rank = self.ranked(range(count))
+        return lambda: (rank() * step) % count
+
+    def create_comments(self, count, users, posts):
+        if not posts:
+            return
+        post_index = self.hot_posts(posts)
+        rng = self.rng
+
+        def build():
+            for _ in range(count):
+                index = post_index()
+                post_created = self.post_created(index, len(posts))
+                created = post_created + (
+                    self.now - post_created) * rng.random()
+                yield Comment(post_id=posts[index],
+                              author_id=rng.choice(users),
+                              text=rng.choice(self.texts),
+                              created=created, modified=created)
+        self.insert(Comment, build())
+
+    def create_follows(self, count, users):
+        if len(users) < 2:
+            return
+        author = self.ranked(users)
+        rng = self.rng
+
+        def build():
+            for _ in range(count):
+                user_id, author_id = rng.choice(users), author()
+                if user_id != author_id:
+                    yield Follow(user_id=user_id, author_id=author_id)
+        self.insert(Follow, build(), ignore_conflicts=True)
+
+    def create_likes(self, count, users, posts):
+        if not posts:
+            return
+        post_index = self.hot_posts(posts)
+        rng = self.rng
+        self.insert(Like, (
+            Like(user_id=rng.choice(users), post_id=posts[post_index()])
+            for _ in range(count)
+        ), ignore_conflicts=True)
@@ -0,0 +1,39 @@
+from concurrent.futures import ThreadPoolExecutor
+
+from django.core.management.base import BaseCommand
+from django.db import connection
+
+from core.images import thumbnails
+from posts.models import Post
+
+
+def generate(name):
+    try:
+        thumbnails(name)
+    finally:
+        connection.close()
+
+
+class Command(BaseCommand):
+    help = ('Заранее создаёт миниатюры всех размеров для картинок '
+            'существующих постов, параллельно в нескольких потоках.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--workers', type=int, default=4)
+        parser.add_argument('--batch-size', type=int, default=2000)
+
+    def handle(self, *args, **options):
+        images = Post.objects.exclude(image='').order_by().values_list(
+            'image', flat=True).distinct()
+        size = options['batch_size']
+        done = 0
+        with ThreadPoolExecutor(max_workers=options['workers']) as pool:
+            batch = []
+            for name in images.iterator(size):
+                batch.append(name)
+                if len(batch) == size:
+                    done += len(list(pool.map(generate, batch)))
+                    batch = []
+            done += len(list(pool.map(generate, batch)))
+        self.stdout.write(self.style.SUCCESS(
+            f'Миниатюры созданы для картинок: {done}'))
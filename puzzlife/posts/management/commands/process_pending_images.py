@@ -0,0 +1,29 @@
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+
+from posts.models import IMAGE_FAILED, IMAGE_PROCESSING, Post
+from posts.tasks import process_image
+
+
+class Command(BaseCommand):
+    help = ('Обрабатывает картинки постов, застрявшие в состоянии '
+            '«обрабатывается»: очередь живёт в памяти процесса и '
+            'теряется при перезапуске. Запускайте после старта сервера.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--older-than', type=int, default=10,
+                            help='Минут с последней правки поста')
+
+    def handle(self, *args, **options):
+        cutoff = timezone.now() - timedelta(minutes=options['older_than'])
+        pending = list(Post.objects.filter(
+            image_state=IMAGE_PROCESSING, modified__lt=cutoff
+        ).values_list('pk', flat=True))
+        for post_id in pending:
+            process_image(post_id)
+        failed = Post.objects.filter(
+            pk__in=pending, image_state=IMAGE_FAILED).count()
+        self.stdout.write(self.style.SUCCESS(
+            f'Обработано картинок: {len(pending)}, с ошибкой: {failed}'))
@@ -0,0 +1,40 @@
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
+
+from posts.models import Comment, Post
+from posts.search import SEARCH_INDEXES, install
+from posts.utils import pk_chunks
+
+
+class Command(BaseCommand):
+    help = ('Пересобирает полнотекстовые индексы постов и комментариев '
+            'порциями по диапазонам id, не загружая строки в память.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=10000)
+
+    def handle(self, *args, **options):
+        if connection.vendor != 'sqlite':
+            raise CommandError('Полнотекстовый индекс есть только в SQLite.')
+        install()
+        size = options['batch_size']
+        for model in (Post, Comment):
+            table = model._meta.db_table
+            index = SEARCH_INDEXES[table]
+            with connection.cursor() as cursor:
+                cursor.execute(
+                    f"INSERT INTO {index}({index}) VALUES ('delete-all')")
+            rows = 0
+            for low, high in pk_chunks(model.objects.all(), size):
+                with transaction.atomic(), connection.cursor() as cursor:
+                    cursor.execute(
+                        f'INSERT INTO {index}(rowid, text) '
+                        f'SELECT id, text FROM {table} '
+                        f'WHERE id >= %s AND id < %s',
+                        [low, high])
+                    rows += cursor.rowcount
+            with connection.cursor() as cursor:
+                cursor.execute(
+                    f"INSERT INTO {index}({index}) VALUES ('optimize')")
+            self.stdout.write(f'{index}: {rows}')
+        self.stdout.write(self.style.SUCCESS('Индексы пересобраны'))
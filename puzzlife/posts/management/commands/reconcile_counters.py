@@ -0,0 +1,39 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from posts.counters import profile_counts, related_count
+from posts.models import Comment, Like, Post, Profile, User
+from posts.utils import pk_chunks
+
+
+class Command(BaseCommand):
+    help = ('Пересчитывает счётчики постов и профилей по исходным таблицам '
+            'порциями, каждая порция в отдельной транзакции.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=5000)
+
+    def handle(self, *args, **options):
+        size = options['batch_size']
+        profiles = 0
+        for low, high in pk_chunks(User.objects.all(), size):
+            with transaction.atomic():
+                missing = User.objects.filter(
+                    pk__gte=low, pk__lt=high, profile__isnull=True
+                ).values_list('pk', flat=True)
+                Profile.objects.bulk_create(
+                    Profile(user_id=pk) for pk in missing)
+                profiles += Profile.objects.filter(
+                    pk__gte=low, pk__lt=high
+                ).update(**profile_counts())
+        posts = 0
+        for low, high in pk_chunks(Post.objects.all(), size):
+            with transaction.atomic():
+                posts += Post.objects.filter(
+                    pk__gte=low, pk__lt=high
+                ).update(
+                    likes_count=related_count(Like, 'post'),
+                    comments_count=related_count(Comment, 'post'),
+                )
+        self.stdout.write(self.style.SUCCESS(
+            f'Пересчитано профилей: {profiles}, постов: {posts}'))
@@ -0,0 +1,55 @@
+# Generated by Django 2.2.16 on 2026-10-17 12:45
+
+from django.conf import settings
+from django.db import migrations, models
+from django.db.models import Min
+
+
+def delete_duplicate_likes(apps, schema_editor):
+    """Оставляет по одному лайку на пару (user, post) перед тем,
+    как сделать её уникальной.
+    """
+    Like = apps.get_model('posts', 'Like')
+    duplicates = (Like.objects.values('user', 'post')
+                  .annotate(keep=Min('id'), total=models.Count('id'))
+                  .filter(total__gt=1))
+    for row in duplicates:
+        Like.objects.filter(user=row['user'], post=row['post']).exclude(
+            id=row['keep']).delete()
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('posts', '0009_like'),
+    ]
+
+    operations = [
+        migrations.AlterModelOptions(
+            name='comment',
+            options={'ordering': ['created']},
+        ),
+        migrations.RunPython(delete_duplicate_likes,
+                             migrations.RunPython.noop),
+        migrations.AlterUniqueTogether(
+            name='like',
+            unique_together={('user', 'post')},
+        ),
+        migrations.AddIndex(
+            model_name='comment',
+            index=models.Index(fields=['post', 'created'], name='comment_post_created_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='post',
+            index=models.Index(fields=['created'], name='post_created_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='post',
+            index=models.Index(fields=['author', 'created'], name='post_author_created_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='post',
+            index=models.Index(fields=['group', 'created'], name='post_group_created_idx'),
+        ),
+    ]
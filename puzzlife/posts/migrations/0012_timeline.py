@@ -0,0 +1,84 @@
+# Generated by Django 2.2.16 on 2026-10-17 12:48
+
+from django.conf import settings
+from django.db import migrations, models
+from django.db.models import Max, Min
+import django.db.models.deletion
+
+# Настройки читаются с прежними значениями по умолчанию: если настройку
+# позже уберут, миграция всё равно выполнится.
+FANOUT_MAX_FOLLOWERS = getattr(settings, 'FANOUT_MAX_FOLLOWERS', 1000)
+TIMELINE_LENGTH = getattr(settings, 'TIMELINE_LENGTH', 800)
+BATCH_SIZE = 1000
+
+# Копия posts.timeline.REBUILD_RANGE_SQL на момент миграции:
+# миграция не должна меняться вместе с кодом приложения.
+FILL_SQL = """
+INSERT INTO {entry} (user_id, post_id, author_id, created)
+SELECT user_id, post_id, author_id, created FROM (
+    SELECT follow.user_id, post.id AS post_id, post.author_id, post.created,
+           ROW_NUMBER() OVER (
+               PARTITION BY follow.user_id
+               ORDER BY post.created DESC, post.id DESC
+           ) AS position
+    FROM {follow} follow
+    JOIN {profile} profile ON profile.user_id = follow.author_id
+    JOIN {post} post ON post.author_id = follow.author_id
+    WHERE follow.user_id >= %s AND follow.user_id < %s
+      AND profile.followers_count <= %s
+) AS timeline
+WHERE position <= %s
+"""
+
+
+def fill_timelines(apps, schema_editor):
+    """Собирает ленты подписок уже существующих пользователей
+    по диапазонам id из BATCH_SIZE пользователей.
+    """
+    User = apps.get_model(settings.AUTH_USER_MODEL)
+    sql = FILL_SQL.format(**{
+        name: apps.get_model('posts', model)._meta.db_table
+        for name, model in (('entry', 'TimelineEntry'), ('follow', 'Follow'),
+                            ('profile', 'Profile'), ('post', 'Post'))
+    })
+    bounds = User.objects.aggregate(low=Min('pk'), high=Max('pk'))
+    if bounds['low'] is None:
+        return
+    with schema_editor.connection.cursor() as cursor:
+        for low in range(bounds['low'], bounds['high'] + 1, BATCH_SIZE):
+            cursor.execute(sql, [low, low + BATCH_SIZE,
+                                 FANOUT_MAX_FOLLOWERS, TIMELINE_LENGTH])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('posts', '0011_counters'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='TimelineEntry',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('created', models.DateTimeField(verbose_name='Дата создания поста')),
+                ('author', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to=settings.AUTH_USER_MODEL)),
+                ('post', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='timeline_entries', to='posts.Post')),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='timeline', to=settings.AUTH_USER_MODEL)),
+            ],
+        ),
+        migrations.AddIndex(
+            model_name='timelineentry',
+            index=models.Index(fields=['user', 'created', 'post'], name='timeline_user_created_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='timelineentry',
+            index=models.Index(fields=['user', 'author'], name='timeline_user_author_idx'),
+        ),
+        migrations.AlterUniqueTogether(
+            name='timelineentry',
+            unique_together={('user', 'post')},
+        ),
+        migrations.RunPython(fill_timelines, migrations.RunPython.noop),
+    ]
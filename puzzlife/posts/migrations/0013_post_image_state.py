@@ -0,0 +1,18 @@
+# Generated by Django 2.2.16 on 2026-10-17 12:52
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('posts', '0012_timeline'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='post',
+            name='image_state',
+            field=models.CharField(choices=[('processing', 'Обрабатывается'), ('ready', 'Готова'), ('failed', 'Ошибка обработки')], default='ready', max_length=16, verbose_name='Состояние картинки'),
+        ),
+    ]
@@ -0,0 +1,65 @@
+from django.db import migrations
+
+# Копии SQL из posts.search на момент миграции: миграция не должна
+# меняться вместе с кодом поиска.
+SEARCH_INDEXES = {
+    'Post': 'posts_post_fts',
+    'Comment': 'posts_comment_fts',
+}
+
+CREATE_INDEX = '''
+CREATE VIRTUAL TABLE IF NOT EXISTS {index} USING fts5(
+    text, content='{table}', content_rowid='id',
+    tokenize='unicode61 remove_diacritics 2'
+)'''
+
+CREATE_TRIGGERS = (
+    '''CREATE TRIGGER IF NOT EXISTS {index}_insert AFTER INSERT ON {table}
+    BEGIN
+        INSERT INTO {index}(rowid, text) VALUES (new.id, new.text);
+    END''',
+    '''CREATE TRIGGER IF NOT EXISTS {index}_delete AFTER DELETE ON {table}
+    BEGIN
+        INSERT INTO {index}({index}, rowid, text)
+        VALUES ('delete', old.id, old.text);
+    END''',
+    '''CREATE TRIGGER IF NOT EXISTS {index}_update
+    AFTER UPDATE OF text ON {table}
+    BEGIN
+        INSERT INTO {index}({index}, rowid, text)
+        VALUES ('delete', old.id, old.text);
+        INSERT INTO {index}(rowid, text) VALUES (new.id, new.text);
+    END''',
+)
+
+
+def create_indexes(apps, schema_editor):
+    if schema_editor.connection.vendor != 'sqlite':
+        return
+    for model, index in SEARCH_INDEXES.items():
+        table = apps.get_model('posts', model)._meta.db_table
+        schema_editor.execute(CREATE_INDEX.format(table=table, index=index))
+        for sql in CREATE_TRIGGERS:
+            schema_editor.execute(sql.format(table=table, index=index))
+        schema_editor.execute(
+            f"INSERT INTO {index}({index}) VALUES ('rebuild')")
+
+
+def drop_indexes(apps, schema_editor):
+    if schema_editor.connection.vendor != 'sqlite':
+        return
+    for index in SEARCH_INDEXES.values():
+        for suffix in ('insert', 'delete', 'update'):
+            schema_editor.execute(f'DROP TRIGGER IF EXISTS {index}_{suffix}')
+        schema_editor.execute(f'DROP TABLE IF EXISTS {index}')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('posts', '0013_post_image_state'),
+    ]
+
+    operations = [
+        migrations.RunPython(create_indexes, drop_indexes),
+    ]
@@ -14,6 +14,28 @@ class Group(models.Model):
         return self.title
 
 
+class PostQuerySet(models.QuerySet):
+    def feed(self):
+        """Посты для ленты: автор и группа подтягиваются одним запросом,
+        ненужные для карточки поста колонки не загружаются.
+        """
+        return self.select_related('author', 'group').only(
+            'id', 'text', 'created', 'image', 'image_state', 'likes_count',
+            'author', 'group', 'author__username', 'author__first_name',
+            'author__last_name', 'group__slug', 'group__title',
+        )
+
+
+IMAGE_PROCESSING = 'processing'
+IMAGE_READY = 'ready'
+IMAGE_FAILED = 'failed'
+IMAGE_STATES = (
+    (IMAGE_PROCESSING, 'Обрабатывается'),
+    (IMAGE_READY, 'Готова'),
+    (IMAGE_FAILED, 'Ошибка обработки'),
+)
+
+
 class Post(CreatedModel):
     text = models.TextField(
         'Текст поста',
@@ -38,9 +60,26 @@ class Post(CreatedModel):
         upload_to='posts/',
         blank=True
     )
+    image_state = models.CharField(
+        'Состояние картинки',
+        max_length=16,
+        choices=IMAGE_STATES,
+        default=IMAGE_READY
+    )
+    likes_count = models.PositiveIntegerField('Лайков', default=0)
+    comments_count = models.PositiveIntegerField('Комментариев', default=0)
+
+    objects = PostQuerySet.as_manager()
 
     class Meta:
         ordering = ['-created']
+        indexes = [
+            models.Index(fields=['created'], name='post_created_idx'),
+            models.Index(fields=['author', 'created'],
+                         name='post_author_created_idx'),
+            models.Index(fields=['group', 'created'],
+                         name='post_group_created_idx'),
+        ]
 
     def __str__(self):
         return self.text[:15]
@@ -62,6 +101,13 @@ class Comment(CreatedModel):
         help_text='Введите текст комментария'
     )
 
+    class Meta:
+        ordering = ['created']
+        indexes = [
+            models.Index(fields=['post', 'created'],
+                         name='comment_post_created_idx'),
+        ]
+
 
 class Follow(models.Model):
     user = models.ForeignKey(
@@ -92,3 +138,51 @@ class Like(models.Model):
         on_delete=models.CASCADE,
         related_name='liked'
     )
+
+    class Meta:
+        unique_together = ('user', 'post')
+
+
+class Profile(models.Model):
+    """Денормализованные счётчики пользователя."""
+    user = models.OneToOneField(
+        User,
+        primary_key=True,
+        on_delete=models.CASCADE,
+        related_name='profile'
+    )
+    posts_count = models.PositiveIntegerField('Постов', default=0)
+    followers_count = models.PositiveIntegerField('Подписчиков', default=0)
+    following_count = models.PositiveIntegerField('Подписок', default=0)
+
+    def __str__(self):
+        return str(self.user_id)
+
+
+class TimelineEntry(models.Model):
+    """Пост в материализованной ленте подписок пользователя."""
+    user = models.ForeignKey(
+        User,
+        on_delete=models.CASCADE,
+        related_name='timeline'
+    )
+    post = models.ForeignKey(
+        Post,
+        on_delete=models.CASCADE,
+        related_name='timeline_entries'
+    )
+    author = models.ForeignKey(
+        User,
+        on_delete=models.CASCADE,
+        related_name='+'
+    )
+    created = models.DateTimeField('Дата создания поста')
+
+    class Meta:
+        unique_together = ('user', 'post')
+        indexes = [
+            models.Index(fields=['user', 'created', 'post'],
+                         name='timeline_user_created_idx'),
+            models.Index(fields=['user', 'author'],
+                         name='timeline_user_author_idx'),
+        ]
@@ -0,0 +1,142 @@
+import json
+import re
+
+from django.db import connection, connections
+from django.utils.html import escape
+from django.utils.http import urlsafe_base64_decode
+from django.utils.safestring import mark_safe
+
+from puzzlife.settings import POSTS_NUM
+
+from .models import Post
+from .utils import KeysetPaginator
+
+# Полнотекстовые индексы FTS5 с внешним содержимым: текст хранится
+# только в исходной таблице, индекс держат в актуальном виде триггеры.
+SEARCH_INDEXES = {
+    'posts_post': 'posts_post_fts',
+    'posts_comment': 'posts_comment_fts',
+}
+
+CREATE_INDEX = '''
+CREATE VIRTUAL TABLE IF NOT EXISTS {index} USING fts5(
+    text, content='{table}', content_rowid='id',
+    tokenize='unicode61 remove_diacritics 2'
+)'''
+
+CREATE_TRIGGERS = (
+    '''CREATE TRIGGER IF NOT EXISTS {index}_insert AFTER INSERT ON {table}
+    BEGIN
+        INSERT INTO {index}(rowid, text) VALUES (new.id, new.text);
+    END''',
+    '''CREATE TRIGGER IF NOT EXISTS {index}_delete AFTER DELETE ON {table}
+    BEGIN
+        INSERT INTO {index}({index}, rowid, text)
+        VALUES ('delete', old.id, old.text);
+    END''',
+    '''CREATE TRIGGER IF NOT EXISTS {index}_update
+    AFTER UPDATE OF text ON {table}
+    BEGIN
+        INSERT INTO {index}({index}, rowid, text)
+        VALUES ('delete', old.id, old.text);
+        INSERT INTO {index}(rowid, text) VALUES (new.id, new.text);
+    END''',
+)
+
+# Границы совпадений в snippet(): управляющие символы, которых нет
+# в тексте после экранирования, заменяются на <mark>.
+MARK_START = '\x02'
+MARK_END = '\x03'
+SNIPPET_TOKENS = 16
+
+TOKEN_RE = re.compile(r'\w+')
+
+
+def install(using_connection=connection):
+    """Создаёт индексы и триггеры, если их нет.
+
+    Вызывается и после каждой миграции: SQLite пересоздаёт таблицу
+    при изменении её схемы, и триггеры старой таблицы пропадают.
+    """
+    if using_connection.vendor != 'sqlite':
+        return
+    with using_connection.cursor() as cursor:
+        for table, index in SEARCH_INDEXES.items():
+            cursor.execute(CREATE_INDEX.format(table=table, index=index))
+            for sql in CREATE_TRIGGERS:
+                cursor.execute(sql.format(table=table, index=index))
+
+
+def match_expression(query):
+    """Запрос пользователя в синтаксисе FTS5: все слова как префиксы.
+
+    Слова берутся в кавычки, поэтому операторы FTS5 из ввода
+    не интерпретируются. Пустая строка, если слов нет.
+    """
+    return ' '.join(f'"{token}"*' for token in TOKEN_RE.findall(query))
+
+
+def filter_matching(queryset, query):
+    """Оставляет в queryset строки, найденные по индексу."""
+    table = queryset.model._meta.db_table
+    index = SEARCH_INDEXES[table]
+    return queryset.extra(
+        where=[f'{table}.id IN '
+               f'(SELECT rowid FROM {index} WHERE {index} MATCH %s)'],
+        params=[match_expression(query)],
+    )
+
+
+def highlight(snippet):
+    return mark_safe(escape(snippet).replace(
+        MARK_START, '<mark>').replace(MARK_END, '</mark>'))
+
+
+class SearchPaginator(KeysetPaginator):
+    """Постраничная выдача поиска, упорядоченная по bm25.
+
+    Курсор — пара (rank, id) последней строки, как у KeysetPaginator,
+    только условие строится по виртуальной таблице индекса.
+    """
+
+    index = SEARCH_INDEXES['posts_post']
+
+    def __init__(self, query, per_page=POSTS_NUM):
+        super().__init__(Post.objects.feed(), per_page,
+                         ordering=('rank', 'id'))
+        self.expression = match_expression(query)
+
+    def decode_cursor(self, cursor):
+        try:
+            rank, pk = json.loads(urlsafe_base64_decode(cursor))
+            return [float(rank), int(pk)]
+        except (ValueError, TypeError):
+            return None
+
+    def rows(self, values=None, forward=True):
+        if not self.expression:
+            return []
+        index = self.index
+        sql = (f'SELECT rowid, rank, snippet({index}, 0, %s, %s, %s, %s) '
+               f'FROM {index} WHERE {index} MATCH %s')
+        params = [MARK_START, MARK_END, '…', SNIPPET_TOKENS, self.expression]
+        if values is not None:
+            sign = '>' if forward else '<'
+            sql += (f' AND (rank {sign} %s OR '
+                    f'(rank = %s AND rowid {sign} %s))')
+            params += [values[0], values[0], values[1]]
+        direction = '' if forward else ' DESC'
+        sql += f' ORDER BY rank{direction}, rowid{direction} LIMIT %s'
+        params.append(self.per_page + 1)
+        with connections[self.queryset.db].cursor() as cursor:
+            cursor.execute(sql, params)
+            matches = cursor.fetchall()
+        posts = self.queryset.in_bulk([pk for pk, _, _ in matches])
+        rows = []
+        for pk, rank, snippet in matches:
+            post = posts.get(pk)
+            if post is not None:
+                post.rank = rank
+                post.snippet = highlight(snippet)
+                rows.append(post)
+        return rows
@@ -0,0 +1,78 @@
+from django.db.models.signals import post_delete, post_save, pre_save
+from django.dispatch import receiver
+
+from . import timeline
+from .cache import bump_feeds, bump_version, forget_group_slugs
+from .models import Follow, Group, Post, Profile, User
+
+
+@receiver(post_save, sender=User)
+def create_profile(sender, instance, created, raw=False, **kwargs):
+    """Заводит строку счётчиков для нового пользователя."""
+    if created and not raw:
+        Profile.objects.get_or_create(user=instance)
+
+
+@receiver(post_save, sender=Post)
+def fan_out_post(sender, instance, created, raw=False, **kwargs):
+    if created and not raw:
+        timeline.fan_out(instance)
+
+
+@receiver(post_save, sender=Follow)
+def backfill_timeline(sender, instance, created, raw=False, **kwargs):
+    if created and not raw:
+        timeline.backfill(instance.user_id, instance.author_id)
+
+
+@receiver(post_delete, sender=Follow)
+def trim_timeline(sender, instance, **kwargs):
+    timeline.remove_author(instance.user_id, instance.author_id)
+
+
+@receiver(post_save, sender=Post)
+@receiver(post_delete, sender=Post)
+def bump_post_version(sender, instance, **kwargs):
+    bump_version('post', instance.pk)
+
+
+@receiver(pre_save, sender=Post)
+def remember_group(sender, instance, raw=False, **kwargs):
+    """Запоминает прежнюю группу поста, чтобы сбросить и её ленту."""
+    if instance.pk and not raw:
+        instance._previous_group_id = Post.objects.filter(
+            pk=instance.pk).values_list('group', flat=True).first()
+
+
+@receiver(post_save, sender=Post)
+@receiver(post_delete, sender=Post)
+def bump_post_feeds(sender, instance, **kwargs):
+    group_ids = {getattr(instance, '_previous_group_id', None),
+                 instance.group_id}
+    group_ids.discard(None)
+    bump_feeds(group_ids=group_ids, author_ids=[instance.author_id])
+
+
+@receiver(pre_save, sender=Group)
+def remember_slug(sender, instance, raw=False, **kwargs):
+    if instance.pk and not raw:
+        instance._previous_slug = Group.objects.filter(
+            pk=instance.pk).values_list('slug', flat=True).first()
+
+
+@receiver(post_save, sender=Group)
+@receiver(post_delete, sender=Group)
+def bump_group_version(sender, instance, **kwargs):
+    forget_group_slugs({instance.slug} | {
+        getattr(instance, '_previous_slug', None) or instance.slug})
+    bump_version('group', instance.pk)
+    bump_feeds(meta=True)
+
+
+@receiver(post_save, sender=User)
+def bump_author_version(sender, instance, created, update_fields=None,
+                        **kwargs):
+    if created or update_fields == frozenset({'last_login'}):
+        return
+    bump_version('author', instance.pk)
+    bump_feeds(meta=True)
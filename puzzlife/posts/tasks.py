@@ -0,0 +1,123 @@
+import logging
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from io import BytesIO
+
+from django.conf import settings
+from django.core.files.base import ContentFile
+from django.db import close_old_connections, connection, transaction
+from django.utils import timezone
+from PIL import Image, ImageOps
+
+from core.images import thumbnails
+from .cache import bump_feeds, bump_version
+from .models import IMAGE_FAILED, IMAGE_READY, Post
+
+logger = logging.getLogger(__name__)
+
+# Форматы, которые пересохраняются; анимированные GIF и прочее
+# остаются как есть, для них только создаются миниатюры.
+REENCODE_OPTIONS = {
+    'JPEG': {'quality': 85, 'optimize': True, 'progressive': True},
+    'MPO': {'quality': 85, 'optimize': True, 'progressive': True},
+    'PNG': {'optimize': True},
+}
+
+_pool = None
+_pool_lock = threading.Lock()
+_slots = None
+
+
+def get_pool():
+    """Пул фоновых потоков и семафор, ограничивающий длину очереди."""
+    global _pool, _slots
+    with _pool_lock:
+        if _pool is None:
+            _pool = ThreadPoolExecutor(
+                max_workers=settings.IMAGE_WORKERS,
+                thread_name_prefix='post-images',
+            )
+            _slots = threading.BoundedSemaphore(settings.IMAGE_QUEUE_SIZE)
+    return _pool, _slots
+
+
+def normalize(data):
+    """Поворачивает картинку по EXIF, уменьшает до IMAGE_MAX_SIZE
+    и пересохраняет. Возвращает новые байты или None, если формат
+    не пересохраняется.
+    """
+    image = Image.open(BytesIO(data))
+    options = REENCODE_OPTIONS.get(image.format)
+    if options is None:
+        return None
+    image_format = 'JPEG' if image.format == 'MPO' else image.format
+    image = ImageOps.exif_transpose(image)
+    image.thumbnail((settings.IMAGE_MAX_SIZE, settings.IMAGE_MAX_SIZE))
+    if image_format == 'JPEG' and image.mode not in ('RGB', 'L'):
+        image = image.convert('RGB')
+    output = BytesIO()
+    image.save(output, image_format, **options)
+    return output.getvalue()
+
+
+def process_image(post_id):
+    """Обрабатывает картинку поста и создаёт её миниатюры.
+
+    Результат сохраняется, только если картинку поста не заменили,
+    пока шла обработка: иначе он выбрасывается.
+    """
+    post = Post.objects.filter(pk=post_id).only(
+        'id', 'image', 'author', 'group').first()
+    if post is None or not post.image:
+        return
+    original = post.image.name
+    try:
+        with post.image.open('rb') as source:
+            data = normalize(source.read())
+        if data is not None:
+            post.image.save(os.path.basename(original), ContentFile(data),
+                            save=False)
+        thumbnails(post.image)
+        state = IMAGE_READY
+    except Exception:
+        logger.exception('Не удалось обработать картинку поста %s', post_id)
+        state = IMAGE_FAILED
+    updated = Post.objects.filter(pk=post_id, image=original).update(
+        image=post.image.name, image_state=state, modified=timezone.now())
+    if post.image.name != original:
+        # Лишним остаётся исходный файл или выброшенный результат.
+        post.image.storage.delete(original if updated else post.image.name)
+    if updated:
+        # update() не шлёт сигналов: сбрасываем карточку и ленты сами.
+        bump_version('post', post_id)
+        bump_feeds(group_ids=[post.group_id] if post.group_id else [],
+                   author_ids=[post.author_id])
+
+
+def run_in_background(post_id, slots):
+    close_old_connections()
+    try:
+        process_image(post_id)
+    finally:
+        slots.release()
+        connection.close()
+
+
+def enqueue(post_id):
+    """Ставит обработку в очередь; при полной очереди выполняет сразу."""
+    pool, slots = get_pool()
+    if not slots.acquire(blocking=False):
+        process_image(post_id)
+        return None
+    return pool.submit(run_in_background, post_id, slots)
+
+
+def schedule_image_processing(post):
+    """Отдаёт картинку поста в фоновую обработку после коммита
+    транзакции, чтобы поток увидел сохранённый пост.
+    """
+    if settings.IMAGE_WORKERS == 0:
+        process_image(post.pk)
+    else:
+        transaction.on_commit(lambda: enqueue(post.pk))
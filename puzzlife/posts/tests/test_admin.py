@@ -0,0 +1,95 @@
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.db import connection
+from django.test import Client, TestCase
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from posts.models import Comment, Group, Post
+
+User = get_user_model()
+
+
+class ChangeListTest(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.admin = User.objects.create_superuser(
+            username='admin', email='admin@example.com', password='pass')
+        cls.groups = [
+            Group.objects.create(
+                title=f'Группа {i}', slug=f'group-{i}', description='-')
+            for i in range(5)
+        ]
+
+    def setUp(self):
+        cache.clear()
+        self.client = Client()
+        self.client.force_login(self.admin)
+
+    def add_rows(self, count):
+        for i in range(count):
+            post = Post.objects.create(
+                author=self.admin, text=f'Пост {i}',
+                group=self.groups[i % len(self.groups)])
+            Comment.objects.create(
+                author=self.admin, post=post, text='Комментарий')
+
+    def count_queries(self, name):
+        cache.clear()
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(
+                reverse(f'admin:posts_{name}_changelist'))
+        self.assertEqual(response.status_code, 200)
+        return len(queries)
+
+    def test_queries_do_not_grow_with_rows(self):
+        """Число запросов changelist не зависит от числа строк."""
+        for name in ('post', 'comment'):
+            with self.subTest(model=name):
+                self.add_rows(2)
+                few = self.count_queries(name)
+                self.add_rows(20)
+                self.assertEqual(self.count_queries(name), few)
+
+    def test_count_uses_statistics(self):
+        """Без фильтров число строк берётся из статистики ANALYZE."""
+        self.add_rows(3)
+        with connection.cursor() as cursor:
+            cursor.execute('ANALYZE')
+        self.add_rows(1)
+        response = self.client.get(reverse('admin:posts_post_changelist'))
+        self.assertEqual(response.context['cl'].result_count, 3)
+        response = self.client.get(
+            reverse('admin:posts_post_changelist'), {'q': 'Пост'})
+        self.assertEqual(response.context['cl'].result_count, 4)
+
+    def test_group_is_edited_by_id(self):
+        """Группа в списке правится по id, без списка всех групп в строке."""
+        self.add_rows(3)
+        response = self.client.get(reverse('admin:posts_post_changelist'))
+        self.assertContains(response, 'vForeignKeyRawIdAdminField', count=3)
+        self.assertNotContains(response, self.groups[-1].title + '</option>')
+        for group in self.groups[:3]:
+            self.assertContains(response, f'>{group.title}</a></strong>')
+
+    def test_group_is_saved_from_list(self):
+        """Группа, изменённая в списке, сохраняется."""
+        self.add_rows(1)
+        post = Post.objects.get()
+        response = self.client.post(
+            reverse('admin:posts_post_changelist'), {
+                'form-TOTAL_FORMS': 1, 'form-INITIAL_FORMS': 1,
+                'form-0-id': post.pk, 'form-0-group': self.groups[1].pk,
+                '_save': 'Сохранить',
+            })
+        self.assertEqual(response.status_code, 302)
+        post.refresh_from_db()
+        self.assertEqual(post.group, self.groups[1])
+
+    def test_changelist_does_not_scan_dates(self):
+        """Список не строит навигацию по датам по всей таблице."""
+        self.add_rows(2)
+        with CaptureQueriesContext(connection) as queries:
+            self.client.get(reverse('admin:posts_post_changelist'))
+        self.assertFalse([query for query in queries
+                          if 'DISTINCT' in query['sql']])
@@ -0,0 +1,234 @@
+import warnings
+
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.core.cache.backends.base import CacheKeyWarning
+from django.test import Client, TestCase, override_settings
+from django.urls import reverse
+
+from posts.cache import (attach_cards, bump_version, card_stats,
+                         get_versions, version_key)
+from posts.models import Group, Post
+from posts.tests.utils import run_commit_callbacks
+
+User = get_user_model()
+
+
+class PostCardCacheTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create_user(username='auth')
+        cls.group = Group.objects.create(
+            title='Тестовая группа',
+            slug='test-slug',
+            description='Тестовое описание'
+        )
+        cls.post = Post.objects.create(
+            author=cls.user,
+            text='Тестовый пост',
+            group=cls.group
+        )
+
+    def setUp(self):
+        cache.clear()
+        self.client = Client()
+        self.client.force_login(self.user)
+
+    def get_index(self):
+        return self.client.get(reverse('posts:index')).content.decode()
+
+    def test_cards_are_served_from_cache(self):
+        """Повторный показ ленты берёт карточку из кэша."""
+        self.get_index()
+        hits = card_stats['hits']
+        self.get_index()
+        self.assertEqual(card_stats['hits'], hits + 1)
+
+    def test_edit_invalidates_card(self):
+        """Правка поста сразу видна в ленте."""
+        self.get_index()
+        self.client.post(
+            reverse('posts:post_edit', kwargs={'post_id': self.post.pk}),
+            data={'text': 'Исправленный пост', 'group': self.group.pk})
+        run_commit_callbacks()
+        self.assertIn('Исправленный пост', self.get_index())
+
+    def test_group_and_author_changes_invalidate_card(self):
+        """Смена названия группы и имени автора видна в карточке."""
+        self.get_index()
+        self.group.title = 'Новое название'
+        self.group.save()
+        self.user.first_name = 'Лина'
+        self.user.save()
+        run_commit_callbacks()
+        content = self.get_index()
+        self.assertIn('Новое название', content)
+        self.assertIn('Лина', content)
+
+    def test_edit_after_rows_are_read_is_not_cached_as_new(self):
+        """Правка между чтением строк и версий не кладёт старую
+        карточку под новую версию.
+        """
+        rows = list(Post.objects.feed())
+        Post.objects.filter(pk=self.post.pk).update(text='Свежий текст')
+        bump_version('post', self.post.pk)
+        run_commit_callbacks()
+        attach_cards(rows)
+        posts = list(Post.objects.feed())
+        attach_cards(posts)
+        self.assertIn('Свежий текст', posts[0].card)
+
+    def test_group_page_card_has_no_group_link(self):
+        """На странице группы карточка не ссылается на ту же группу."""
+        self.get_index()
+        content = self.client.get(reverse(
+            'posts:group_list', kwargs={'slug': self.group.slug}
+        )).content.decode()
+        self.assertNotIn('Все записи', content)
+
+
+class FeedPageCacheTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create_user(username='auth')
+        cls.group = Group.objects.create(
+            title='Тестовая группа',
+            slug='test-slug',
+            description='Тестовое описание'
+        )
+        cls.other_group = Group.objects.create(
+            title='Другая группа',
+            slug='other-slug',
+            description='Другое описание'
+        )
+
+    def setUp(self):
+        cache.clear()
+        self.guest_client = Client()
+        self.group_url = reverse('posts:group_list',
+                                 kwargs={'slug': self.group.slug})
+
+    def test_group_page_is_invalidated_by_its_posts(self):
+        """Новый пост в группе сразу виден анонимному посетителю."""
+        self.guest_client.get(self.group_url)
+        Post.objects.create(author=self.user, text='Новый пост',
+                            group=self.group)
+        run_commit_callbacks()
+        self.assertContains(self.guest_client.get(self.group_url),
+                            'Новый пост')
+
+    def test_moved_post_leaves_old_group_page(self):
+        """Пост, перенесённый в другую группу, пропадает со старой."""
+        post = Post.objects.create(author=self.user, text='Переезжающий пост',
+                                   group=self.group)
+        self.assertContains(self.guest_client.get(self.group_url),
+                            'Переезжающий пост')
+        post.group = self.other_group
+        post.save()
+        run_commit_callbacks()
+        self.assertNotContains(self.guest_client.get(self.group_url),
+                               'Переезжающий пост')
+
+    def test_other_group_posts_keep_page_cached(self):
+        """Посты других групп не сбрасывают кэш страницы группы."""
+        self.guest_client.get(self.group_url)
+        Post.objects.create(author=self.user, text='Чужой пост',
+                            group=self.other_group)
+        with self.assertNumQueries(0):
+            self.guest_client.get(self.group_url)
+
+    def test_non_ascii_slug_keys_are_safe(self):
+        """Ключи кэша группы не содержат слаг, даже не ASCII."""
+        group = Group.objects.create(title='Кириллица', slug='кириллица',
+                                     description='-')
+        with warnings.catch_warnings():
+            warnings.simplefilter('error', CacheKeyWarning)
+            Post.objects.create(author=self.user, text='Пост', group=group)
+            run_commit_callbacks()
+
+    def test_slug_moved_to_other_group(self):
+        """Слаг, перешедший к другой группе, показывает её посты."""
+        self.guest_client.get(self.group_url)
+        group = Group.objects.get(pk=self.group.pk)
+        group.slug = 'renamed'
+        group.save()
+        new_group = Group.objects.create(title='Новая группа',
+                                         slug=self.group.slug,
+                                         description='-')
+        Post.objects.create(author=self.user, text='Пост новой группы',
+                            group=new_group)
+        run_commit_callbacks()
+        self.assertContains(self.guest_client.get(self.group_url),
+                            'Пост новой группы')
+
+
+class VersionTest(TestCase):
+    def setUp(self):
+        cache.clear()
+
+    def current(self):
+        key = version_key('post', 1)
+        return get_versions([key])[key]
+
+    def test_version_changes_after_commit(self):
+        """Версия меняется только после коммита транзакции, и каждый
+        сброс даёт новое значение.
+        """
+        versions = [self.current()]
+        for _ in range(2):
+            bump_version('post', 1)
+            self.assertEqual(self.current(), versions[-1])
+            run_commit_callbacks()
+            versions.append(self.current())
+        self.assertEqual(len(set(versions)), 3)
+
+
+@override_settings(REPLICA_DATABASES=['replica'])
+class ReplicaCacheTest(TestCase):
+    """Внутри транзакции теста чтения остаются на default, но ленты
+    считают, что читают с реплики.
+    """
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user(username='auth')
+        Post.objects.create(author=cls.user, text='Тестовый пост')
+
+    def setUp(self):
+        cache.clear()
+        self.client = Client()
+        self.client.force_login(self.user)
+
+    def test_replica_cards_are_not_cached(self):
+        """Карточки, прочитанные с реплики, не ложатся в кэш, а лента
+        с реплики не получает ETag.
+        """
+        hits = card_stats['hits']
+        for _ in range(2):
+            response = self.client.get(reverse('posts:index'))
+            self.assertFalse(response.has_header('ETag'))
+        self.assertEqual(card_stats['hits'], hits)
+
+    def test_replica_pages_have_no_etag(self):
+        """Профиль и пост, прочитанные с реплики, не получают ETag."""
+        post = Post.objects.get()
+        for client in (self.client, Client()):
+            for url in (reverse('posts:profile', args=[self.user.username]),
+                        reverse('posts:post_detail', args=[post.pk])):
+                with self.subTest(url=url):
+                    response = client.get(url)
+                    self.assertEqual(response.status_code, 200)
+                    self.assertFalse(response.has_header('ETag'))
+
+    def test_anonymous_misses_render_from_default(self):
+        """Страница для анонимов рендерится по default и кэшируется."""
+        guest = Client()
+        response = guest.get(reverse('posts:index'))
+        self.assertTrue(response.has_header('ETag'))
+        hits = card_stats['hits']
+        self.client.get(reverse('posts:index'))
+        self.assertEqual(card_stats['hits'], hits + 1)
+        with self.assertNumQueries(0):
+            guest.get(reverse('posts:index'))
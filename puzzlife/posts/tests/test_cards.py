@@ -0,0 +1,37 @@
+from django.contrib.auth import get_user_model
+from django.template.loader import render_to_string
+from django.test import TestCase
+
+from core.template_loaders import minify
+from posts.cards import CardRenderer
+from posts.models import IMAGE_PROCESSING, Group, Post
+
+User = get_user_model()
+
+
+class CardRendererTest(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        author = User.objects.create_user(
+            username='a+b@c.d', first_name='Анна <b>', last_name='& Ко')
+        group = Group.objects.create(
+            title='Группа "кавычки" & <теги>', slug='test-slug',
+            description='-')
+        Post.objects.bulk_create([
+            Post(author=author, text='Короткий пост'),
+            Post(author=author, group=group, text='Длинный пост ' * 20),
+            Post(author=author, group=group, text='<script>&amp;</script>',
+                 image='posts/missing.jpg', image_state=IMAGE_PROCESSING),
+        ])
+
+    def test_cards_match_template(self):
+        """Карточка совпадает с posts_list.html после сжатия отступов."""
+        for show_group in (True, False):
+            renderer = CardRenderer(show_group)
+            for post in Post.objects.feed():
+                with self.subTest(post=post.pk, show_group=show_group):
+                    expected = render_to_string(
+                        'posts/includes/posts_list.html',
+                        {'post': post, 'show_group': show_group})
+                    self.assertEqual(renderer.render(post),
+                                     minify(expected).lstrip('\n'))
@@ -0,0 +1,179 @@
+import json
+import os
+import tempfile
+from io import StringIO
+
+from django.contrib.auth import get_user_model
+from django.core.cache import caches
+from django.core.management import call_command
+from django.core.management.base import CommandError
+from django.test import TestCase, TransactionTestCase
+
+from posts.models import Comment, Follow, Group, Like, Post, Profile
+
+User = get_user_model()
+
+
+class ExplainFeedsCommandTest(TestCase):
+    def test_feeds_use_indexes(self):
+        """Ленты читаются по индексам без сортировки всей таблицы."""
+        out = StringIO()
+        call_command('explain_feeds', stdout=out)
+        plans = out.getvalue()
+        for index in ('post_created_idx', 'post_author_created_idx',
+                      'post_group_created_idx', 'comment_post_created_idx'):
+            with self.subTest(index=index):
+                self.assertIn(index, plans)
+
+
+class ReconcileCountersCommandTest(TestCase):
+    def test_counters_are_recalculated(self):
+        """Команда чинит разошедшиеся счётчики и заводит профили."""
+        author = User.objects.create_user(username='author')
+        follower = User.objects.create_user(username='follower')
+        Profile.objects.filter(pk=follower.pk).delete()
+        post = Post.objects.create(author=author, text='Тестовый пост')
+        Comment.objects.create(post=post, author=follower, text='Коммент')
+        Like.objects.create(post=post, user=follower)
+        Follow.objects.create(user=follower, author=author)
+        call_command('reconcile_counters', batch_size=1, stdout=StringIO())
+        post.refresh_from_db()
+        self.assertEqual((post.likes_count, post.comments_count), (1, 1))
+        author_profile = Profile.objects.get(pk=author.pk)
+        self.assertEqual(author_profile.posts_count, 1)
+        self.assertEqual(author_profile.followers_count, 1)
+        self.assertEqual(
+            Profile.objects.get(pk=follower.pk).following_count, 1)
+
+
+class GenerateDataCommandTest(TestCase):
+    options = dict(users=30, groups=3, posts=200, comments=300, follows=150,
+                   likes=400, seed=7, batch_size=50)
+
+    def generate(self):
+        call_command('generate_data', stdout=StringIO(), **self.options)
+        return list(Post.objects.order_by('created').values_list(
+            'author__first_name', 'group__slug', 'text'))
+
+    def test_data_is_consistent(self):
+        """Счётчики и ленты сгенерированных данных согласованы."""
+        self.generate()
+        self.assertEqual(User.objects.count(), 30)
+        self.assertEqual(Post.objects.count(), 200)
+        self.assertEqual(Comment.objects.count(), 300)
+        self.assertEqual(Profile.objects.count(), 30)
+        out = StringIO()
+        call_command('check_timelines', stdout=out)
+        self.assertIn('согласованы', out.getvalue())
+        for post in Post.objects.order_by('?')[:20]:
+            with self.subTest(post=post.pk):
+                self.assertEqual(post.likes_count, post.liked.count())
+                self.assertEqual(post.comments_count, post.comments.count())
+                self.assertFalse(post.comments.filter(
+                    created__lt=post.created).exists())
+
+    def test_distribution_is_skewed(self):
+        """Подписчики и лайки сосредоточены у немногих."""
+        self.generate()
+        followers = sorted(Profile.objects.values_list(
+            'followers_count', flat=True), reverse=True)
+        self.assertGreater(followers[0], 5 * followers[len(followers) // 2])
+        likes = sorted(Post.objects.values_list(
+            'likes_count', flat=True), reverse=True)
+        self.assertGreater(likes[0], 10 * max(likes[len(likes) // 2], 1))
+
+    def test_same_seed_gives_same_data(self):
+        """Одинаковый --seed воспроизводит те же данные."""
+        first = self.generate()
+        User.objects.all().delete()
+        Group.objects.all().delete()
+        self.assertEqual(self.generate(), first)
+
+
+class BenchmarkViewsCommandTest(TestCase):
+    def setUp(self):
+        call_command('generate_data', users=10, groups=2, posts=30,
+                     comments=30, follows=20, likes=30, stdout=StringIO())
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.output = os.path.join(directory.name, 'benchmark.json')
+
+    def benchmark(self, **options):
+        call_command('benchmark_views', requests=2, warmup=1,
+                     output=self.output, stdout=StringIO(),
+                     stderr=StringIO(), **options)
+        with open(self.output) as source:
+            return json.load(source)
+
+    def test_every_route_is_measured(self):
+        """Замер есть для каждого маршрута, данные не меняются."""
+        posts = Post.objects.count()
+        report = self.benchmark()
+        self.assertEqual(report['posts'], posts)
+        self.assertEqual(Post.objects.count(), posts)
+        for name in ('index', 'group_list', 'profile', 'post_detail',
+                     'follow_index', 'post_delete', 'like_api'):
+            with self.subTest(route=name):
+                result = report['routes'][name]
+                self.assertGreater(result['queries'], 0)
+                self.assertLessEqual(result['p50_ms'], result['p99_ms'])
+
+    def test_shared_cache_is_not_touched(self):
+        """Замер не оставляет записей в общем кэше сервера."""
+        shared = caches['shared']
+        shared.clear()
+        self.benchmark(routes=['index', 'like_api', 'add_comment'])
+        self.assertEqual(shared._cache, {})
+
+    def test_regression_fails(self):
+        """Рост числа запросов относительно эталона — ошибка."""
+        report = self.benchmark(routes=['index'])
+        report['routes']['index']['queries'] -= 1
+        baseline = self.output + '.baseline'
+        with open(baseline, 'w') as output:
+            json.dump(report, output)
+        with self.assertRaisesMessage(CommandError, 'index: запросов'):
+            self.benchmark(routes=['index'], baseline=baseline,
+                           threshold=100)
+
+
+class BenchmarkCardsCommandTest(TestCase):
+    def test_every_renderer_is_measured(self):
+        """Замер есть для всех способов рендеринга карточек."""
+        call_command('generate_data', users=5, groups=2, posts=12,
+                     comments=0, follows=0, likes=0, stdout=StringIO())
+        output = StringIO()
+        call_command('benchmark_cards', sizes=[2, 10], repeat=1,
+                     stdout=output)
+        report = output.getvalue()
+        for name in ('шаблон ', 'шаблон, кэш', 'CardRenderer'):
+            with self.subTest(renderer=name):
+                self.assertIn(name, report)
+
+    def test_empty_database_fails(self):
+        """Без постов замерять нечего."""
+        with self.assertRaisesMessage(CommandError, 'generate_data'):
+            call_command('benchmark_cards', stdout=StringIO())
+
+
+class BenchmarkConcurrencyCommandTest(TransactionTestCase):
+    def setUp(self):
+        call_command('generate_data', users=10, groups=2, posts=30,
+                     comments=0, follows=0, likes=30, stdout=StringIO())
+
+    def test_both_modes_are_measured(self):
+        """Замер проходит без настроек и с ними, лайки не остаются."""
+        likes = Like.objects.count()
+        counters = list(Post.objects.order_by('pk').values_list(
+            'likes_count', flat=True))
+        output = StringIO()
+        call_command('benchmark_concurrency', readers=2, writers=1,
+                     seconds=0.2, stdout=output)
+        report = output.getvalue()
+        self.assertIn('default', report)
+        self.assertIn('tuned', report)
+        self.assertEqual(Like.objects.count(), likes)
+        self.assertEqual(list(Post.objects.order_by('pk').values_list(
+            'likes_count', flat=True)), counters)
+        self.assertFalse(
+            User.objects.filter(username__startswith='benchmark').exists())
@@ -0,0 +1,103 @@
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.test import Client, TestCase
+from django.urls import reverse
+
+from posts.models import Comment, Group, Post
+from posts.tests.utils import run_commit_callbacks
+
+User = get_user_model()
+
+
+class ConditionalGetTest(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.author = User.objects.create_user(username='author')
+        cls.reader = User.objects.create_user(username='reader')
+        cls.group = Group.objects.create(
+            title='Тестовая группа', slug='test-slug', description='-')
+        cls.post = Post.objects.create(
+            author=cls.author, text='Тестовый пост', group=cls.group)
+
+    def setUp(self):
+        cache.clear()
+        self.client = Client()
+        self.client.force_login(self.reader)
+        self.urls = (
+            reverse('posts:index'),
+            reverse('posts:group_list', args=[self.group.slug]),
+            reverse('posts:profile', args=[self.author.username]),
+            reverse('posts:post_detail', args=[self.post.pk]),
+        )
+
+    def revalidate(self, url, client=None):
+        client = client or self.client
+        etag = client.get(url)['ETag']
+        return client.get(url, HTTP_IF_NONE_MATCH=etag)
+
+    def test_unchanged_pages_are_not_modified(self):
+        """Неизменившиеся страницы отдают 304 без рендеринга."""
+        for client in (self.client, Client()):
+            for url in self.urls:
+                with self.subTest(url=url):
+                    response = self.revalidate(url, client)
+                    self.assertEqual(response.status_code, 304)
+                    self.assertFalse(response.templates)
+                    self.assertIn('no-cache', response['Cache-Control'])
+
+    def test_edit_changes_etag(self):
+        """Правка поста меняет ETag всех страниц с ним."""
+        etags = {url: self.client.get(url)['ETag'] for url in self.urls}
+        post = Post.objects.get(pk=self.post.pk)
+        post.text = 'Новый текст'
+        post.save()
+        run_commit_callbacks()
+        for url, etag in etags.items():
+            with self.subTest(url=url):
+                response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+                self.assertEqual(response.status_code, 200)
+
+    def test_counters_change_etag(self):
+        """Лайк, комментарий и подписка меняют ETag своих страниц."""
+        detail = reverse('posts:post_detail', args=[self.post.pk])
+        profile = reverse('posts:profile', args=[self.author.username])
+        actions = (
+            (detail, reverse('posts:add_like', args=[self.post.pk])),
+            (profile, reverse('posts:profile_follow',
+                              args=[self.author.username])),
+        )
+        for url, action in actions:
+            with self.subTest(url=url):
+                etag = self.client.get(url)['ETag']
+                self.client.get(action)
+                response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+                self.assertEqual(response.status_code, 200)
+        etag = self.client.get(detail)['ETag']
+        Comment.objects.create(
+            post=self.post, author=self.reader, text='Комментарий')
+        response = self.client.get(detail, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+
+    def test_etag_depends_on_viewer(self):
+        """Гость и пользователь получают разные ETag."""
+        url = reverse('posts:index')
+        etag = self.client.get(url)['ETag']
+        response = Client().get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+
+    def test_anonymous_pages_do_not_set_csrf_cookie(self):
+        """Гостю не заводится cookie CSRF, ни при рендеринге, ни из кэша."""
+        for url in self.urls:
+            with self.subTest(url=url):
+                for _ in range(2):
+                    response = Client().get(url)
+                    self.assertNotIn(settings.CSRF_COOKIE_NAME,
+                                     response.cookies)
+
+    def test_missing_post_is_not_found(self):
+        """Для несуществующего поста ETag не считается."""
+        response = self.client.get(
+            reverse('posts:post_detail', args=[self.post.pk + 100]))
+        self.assertEqual(response.status_code, 404)
+        self.assertFalse(response.has_header('ETag'))
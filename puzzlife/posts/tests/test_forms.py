@@ -1,3 +1,4 @@
+import os
 import shutil
 import tempfile
 
@@ -9,12 +10,13 @@ from django.urls import reverse
 
 from posts.models import Group, Post, Comment
 from posts.forms import PostForm
+from posts.tests.utils import run_commit_callbacks
 
 User = get_user_model()
 TEMP_MEDIA_ROOT = tempfile.mkdtemp(dir=settings.BASE_DIR)
 
 
-@override_settings(MEDIA_ROOT=TEMP_MEDIA_ROOT)
+@override_settings(MEDIA_ROOT=TEMP_MEDIA_ROOT, IMAGE_WORKERS=0)
 class PostFormTest(TestCase):
     @classmethod
     def setUpClass(cls):
@@ -69,6 +71,31 @@ class PostFormTest(TestCase):
         ).exists())
         self.assertRedirects(response, reverse(
             'posts:profile', kwargs={'username': self.user.username}))
+        thumbnails_dir = os.path.join(TEMP_MEDIA_ROOT, 'cache')
+        self.assertTrue(os.listdir(thumbnails_dir))
+
+    def test_feed_shows_thumbnail_instead_of_original(self):
+        """В ленте выводится миниатюра с размерами, а не оригинал."""
+        uploaded = SimpleUploadedFile(
+            name='feed.gif',
+            content=(
+                b'\x47\x49\x46\x38\x39\x61\x02\x00'
+                b'\x01\x00\x80\x00\x00\x00\x00\x00'
+                b'\xFF\xFF\xFF\x21\xF9\x04\x00\x00'
+                b'\x00\x00\x00\x2C\x00\x00\x00\x00'
+                b'\x02\x00\x01\x00\x00\x02\x02\x0C'
+                b'\x0A\x00\x3B'
+            ),
+            content_type='image/gif'
+        )
+        self.authorized_client.post(reverse('posts:post_create'),
+                                    data={'text': 'Пост', 'image': uploaded})
+        run_commit_callbacks()
+        content = self.authorized_client.get(
+            reverse('posts:index')).content.decode()
+        self.assertIn('width="2" height="1"', content)
+        self.assertIn('srcset=', content)
+        self.assertNotIn('posts/feed.gif', content)
 
     def test_create_post_form_field_error(self):
         response = self.authorized_client.get(reverse('posts:post_create'))
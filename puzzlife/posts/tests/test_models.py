@@ -1,7 +1,8 @@
 from django.contrib.auth import get_user_model
+from django.db import IntegrityError
 from django.test import TestCase
 
-from posts.models import Group, Post
+from posts.models import Group, Like, Post
 
 User = get_user_model()
 
@@ -58,3 +59,13 @@ class PostModelTest(TestCase):
             with self.subTest(value=value):
                 self.assertEqual(
                     post._meta.get_field(value).help_text, expected)
+
+
+class LikeModelTest(TestCase):
+    def test_like_is_unique_per_user_and_post(self):
+        """Один пользователь может лайкнуть пост только один раз."""
+        user = User.objects.create_user(username='auth')
+        post = Post.objects.create(author=user, text='Тестовый пост')
+        Like.objects.create(user=user, post=post)
+        with self.assertRaises(IntegrityError):
+            Like.objects.create(user=user, post=post)
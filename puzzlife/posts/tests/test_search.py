@@ -0,0 +1,119 @@
+from io import StringIO
+
+from django.contrib.auth import get_user_model
+from django.core.management import call_command
+from django.db import connection
+from django.test import Client, TestCase
+from django.urls import reverse
+
+from posts.models import Comment, Post
+from posts.search import SearchPaginator
+
+User = get_user_model()
+
+
+class SearchTest(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user(username='auth')
+        cls.post = Post.objects.create(
+            author=cls.user, text='Собираем пазл из тысячи деталей')
+        Post.objects.create(author=cls.user, text='Совсем другой текст')
+
+    def setUp(self):
+        self.client = Client()
+
+    def search(self, query, **params):
+        response = self.client.get(
+            reverse('posts:search'), {'q': query, **params})
+        return list(response.context['page_obj'])
+
+    def test_search_uses_index(self):
+        """Поиск находит пост по префиксу слова и без учёта регистра."""
+        self.assertEqual(self.search('ПАЗЛ тысяч'), [self.post])
+
+    def test_index_follows_edit_and_delete(self):
+        """Правка и удаление поста сразу видны в поиске."""
+        post = Post.objects.get(pk=self.post.pk)
+        post.text = 'Теперь про головоломки'
+        post.save()
+        self.assertEqual(self.search('пазл'), [])
+        self.assertEqual(self.search('головоломки'), [post])
+        post.delete()
+        self.assertEqual(self.search('головоломки'), [])
+
+    def test_snippet_is_highlighted_and_escaped(self):
+        """Совпадения подсвечиваются, остальной текст экранируется."""
+        Post.objects.create(author=self.user, text='<b>жирный</b> кролик')
+        post, = self.search('кролик')
+        self.assertEqual(
+            post.snippet, '&lt;b&gt;жирный&lt;/b&gt; <mark>кролик</mark>')
+
+    def test_query_syntax_is_not_interpreted(self):
+        """Операторы FTS5 во вводе не ломают запрос."""
+        for query in ('"пазл', 'пазл AND', 'NEAR(', '***'):
+            with self.subTest(query=query):
+                response = self.client.get(
+                    reverse('posts:search'), {'q': query})
+                self.assertEqual(response.status_code, 200)
+
+    def test_pages_cover_all_results(self):
+        """Курсоры проходят всю выдачу без повторов и пропусков."""
+        posts = Post.objects.bulk_create(
+            Post(author=self.user, text='кот ' * (i % 3 + 1))
+            for i in range(7))
+        ids = []
+        params = {}
+        while True:
+            page = SearchPaginator('кот', per_page=3).get_page(params)
+            ids.extend(post.pk for post in page)
+            if not page.has_next():
+                break
+            params = {'after': page.next_cursor}
+        self.assertCountEqual(ids, [post.pk for post in Post.objects.filter(
+            text__startswith='кот')])
+        self.assertEqual(len(ids), len(posts))
+
+
+class RebuildSearchIndexCommandTest(TestCase):
+    def test_index_is_rebuilt(self):
+        """Команда восстанавливает индекс, заполненный мимо триггеров."""
+        user = User.objects.create_user(username='auth')
+        post = Post.objects.create(author=user, text='Потерянный пост')
+        with connection.cursor() as cursor:
+            cursor.execute(
+                "INSERT INTO posts_post_fts(posts_post_fts) "
+                "VALUES ('delete-all')")
+        paginator = SearchPaginator('потерянный')
+        self.assertEqual(list(paginator.get_page({})), [])
+        call_command('rebuild_search_index', batch_size=1,
+                     stdout=StringIO())
+        self.assertEqual(list(paginator.get_page({})), [post])
+
+
+class AdminSearchTest(TestCase):
+    def setUp(self):
+        self.admin = User.objects.create_superuser(
+            username='admin', email='admin@example.com', password='pass')
+        self.client = Client()
+        self.client.force_login(self.admin)
+
+    def test_admin_search_uses_index(self):
+        """Поиск в админке находит посты и комментарии по индексу."""
+        post = Post.objects.create(author=self.admin, text='Редкое слово')
+        Comment.objects.create(post=post, author=self.admin,
+                               text='Ответ слово')
+        for name, query in (('post', 'редкое'), ('comment', 'ответ')):
+            with self.subTest(model=name):
+                response = self.client.get(
+                    reverse(f'admin:posts_{name}_changelist'), {'q': query})
+                self.assertEqual(response.context['cl'].result_count, 1)
+
+    def test_admin_search_finds_every_match(self):
+        """Поиск в админке отдаёт все найденные строки, а не первую."""
+        posts = {Post.objects.create(author=self.admin, text=f'Пазл {i}')
+                 for i in range(3)}
+        Post.objects.create(author=self.admin, text='Другой текст')
+        response = self.client.get(
+            reverse('admin:posts_post_changelist'), {'q': 'пазл'})
+        self.assertEqual(set(response.context['cl'].result_list), posts)
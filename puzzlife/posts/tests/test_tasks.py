@@ -0,0 +1,105 @@
+import shutil
+import tempfile
+from datetime import timedelta
+from io import BytesIO, StringIO
+from unittest import mock
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import call_command
+from django.test import Client, TestCase, override_settings
+from django.urls import reverse
+from django.utils import timezone
+from PIL import Image
+
+from posts.models import IMAGE_PROCESSING, IMAGE_READY, Post
+from posts.tasks import normalize, process_image
+
+User = get_user_model()
+TEMP_MEDIA_ROOT = tempfile.mkdtemp(dir=settings.BASE_DIR)
+EXIF_ORIENTATION = 0x0112
+
+
+def make_jpeg(size, orientation=None):
+    image = Image.new('RGB', size, 'red')
+    exif = Image.Exif()
+    if orientation:
+        exif[EXIF_ORIENTATION] = orientation
+    output = BytesIO()
+    image.save(output, 'JPEG', exif=exif.tobytes())
+    return output.getvalue()
+
+
+class NormalizeImageTest(TestCase):
+    @override_settings(IMAGE_MAX_SIZE=10)
+    def test_image_is_rotated_and_resized(self):
+        """Картинка поворачивается по EXIF и уменьшается."""
+        data = normalize(make_jpeg((40, 20), orientation=6))
+        self.assertEqual(Image.open(BytesIO(data)).size, (5, 10))
+
+
+@override_settings(MEDIA_ROOT=TEMP_MEDIA_ROOT)
+class ImageProcessingViewsTest(TestCase):
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        shutil.rmtree(TEMP_MEDIA_ROOT, ignore_errors=True)
+
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user(username='auth')
+        self.client = Client()
+        self.client.force_login(self.user)
+
+    def create_post(self):
+        uploaded = SimpleUploadedFile('photo.jpg', make_jpeg((40, 20)),
+                                      content_type='image/jpeg')
+        self.client.post(reverse('posts:post_create'),
+                         data={'text': 'Пост', 'image': uploaded})
+        return Post.objects.filter(author=self.user).latest('pk')
+
+    @override_settings(IMAGE_WORKERS=2)
+    def test_feed_shows_placeholder_while_processing(self):
+        """Пока картинка в очереди, в ленте показывается заглушка."""
+        post = self.create_post()
+        self.assertEqual(post.image_state, IMAGE_PROCESSING)
+        self.assertContains(self.client.get(reverse('posts:index')),
+                            'Картинка обрабатывается')
+
+    @override_settings(IMAGE_WORKERS=0)
+    def test_processed_image_is_ready(self):
+        """Обработанная картинка показывается миниатюрой."""
+        post = self.create_post()
+        self.assertEqual(post.image_state, IMAGE_READY)
+        self.assertContains(self.client.get(reverse('posts:index')),
+                            'srcset=')
+
+    @override_settings(IMAGE_WORKERS=2)
+    def test_replaced_image_is_not_overwritten(self):
+        """Обработка старой картинки не затирает новую, загруженную
+        во время обработки.
+        """
+        post = self.create_post()
+
+        def replace_image(image):
+            Post.objects.filter(pk=post.pk).update(image='posts/new.jpg')
+
+        with mock.patch('posts.tasks.thumbnails', side_effect=replace_image):
+            process_image(post.pk)
+        post.refresh_from_db()
+        self.assertEqual((post.image.name, post.image_state),
+                         ('posts/new.jpg', IMAGE_PROCESSING))
+
+    @override_settings(IMAGE_WORKERS=2)
+    def test_pending_images_are_processed(self):
+        """Картинки, потерянные очередью, обрабатывает команда."""
+        post = self.create_post()
+        fresh = self.create_post()
+        Post.objects.filter(pk=post.pk).update(
+            modified=timezone.now() - timedelta(hours=1))
+        call_command('process_pending_images', stdout=StringIO())
+        states = dict(Post.objects.values_list('pk', 'image_state'))
+        self.assertEqual(states, {post.pk: IMAGE_READY,
+                                  fresh.pk: IMAGE_PROCESSING})
@@ -0,0 +1,120 @@
+from importlib import import_module
+from io import StringIO
+from types import SimpleNamespace
+
+from django.apps import apps as django_apps
+from django.contrib.auth import get_user_model
+from django.core.management import call_command
+from django.core.management.base import CommandError
+from django.db import connection
+from django.test import Client, TestCase, override_settings
+from django.urls import reverse
+
+from posts import timeline
+from posts.models import Follow, Post, Profile, TimelineEntry
+from posts.toggles import set_follow
+
+User = get_user_model()
+
+
+class TimelineTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.author = User.objects.create_user(username='author')
+        cls.reader = User.objects.create_user(username='reader')
+
+    def setUp(self):
+        self.client = Client()
+        self.client.force_login(self.reader)
+
+    def follow_page(self):
+        return list(self.client.get(
+            reverse('posts:follow_index')).context['page_obj'])
+
+    def test_new_post_is_fanned_out_to_followers(self):
+        """Новый пост попадает в ленты подписчиков автора."""
+        Follow.objects.create(user=self.reader, author=self.author)
+        post = Post.objects.create(author=self.author, text='Пост')
+        self.assertTrue(TimelineEntry.objects.filter(
+            user=self.reader, post=post).exists())
+        self.assertEqual(self.follow_page(), [post])
+
+    def test_follow_backfills_and_unfollow_removes(self):
+        """Подписка добавляет старые посты автора, отписка убирает их."""
+        post = Post.objects.create(author=self.author, text='Пост')
+        self.client.get(reverse('posts:profile_follow',
+                                kwargs={'username': self.author.username}))
+        self.assertEqual(self.follow_page(), [post])
+        self.client.get(reverse('posts:profile_unfollow',
+                                kwargs={'username': self.author.username}))
+        self.assertFalse(TimelineEntry.objects.filter(
+            user=self.reader).exists())
+        self.assertEqual(self.follow_page(), [])
+
+    @override_settings(TIMELINE_LENGTH=3, TIMELINE_TRIM_EVERY=1)
+    def test_timeline_is_trimmed(self):
+        """Раскладка новых постов обрезает ленту до TIMELINE_LENGTH
+        последних записей.
+        """
+        Follow.objects.create(user=self.reader, author=self.author)
+        posts = [Post.objects.create(author=self.author, text=f'Пост {i}')
+                 for i in range(5)]
+        self.assertEqual(
+            list(TimelineEntry.objects.filter(user=self.reader).order_by(
+                '-created', '-post_id').values_list('post', flat=True)),
+            [post.pk for post in reversed(posts[2:])])
+
+    @override_settings(FANOUT_MAX_FOLLOWERS=1)
+    def test_former_celebrity_posts_are_fanned_out(self):
+        """Когда автор перестаёт быть «звездой», его старые посты
+        появляются в лентах подписчиков.
+        """
+        other = User.objects.create_user(username='other')
+        set_follow(self.reader, self.author.pk, True)
+        set_follow(other, self.author.pk, True)
+        post = Post.objects.create(author=self.author, text='Пост')
+        self.assertFalse(TimelineEntry.objects.exists())
+        set_follow(other, self.author.pk, False)
+        self.assertTrue(TimelineEntry.objects.filter(
+            user=self.reader, post=post).exists())
+        self.assertEqual(self.follow_page(), [post])
+
+    def test_migration_fills_timelines(self):
+        """Миграция собирает ленты уже существующих подписок."""
+        Follow.objects.create(user=self.reader, author=self.author)
+        post = Post.objects.create(author=self.author, text='Пост')
+        TimelineEntry.objects.all().delete()
+        migration = import_module('posts.migrations.0012_timeline')
+        migration.fill_timelines(
+            django_apps, SimpleNamespace(connection=connection))
+        self.assertEqual(self.follow_page(), [post])
+
+    @override_settings(FANOUT_MAX_FOLLOWERS=0)
+    def test_celebrity_posts_are_read_on_demand(self):
+        """Посты популярных авторов подмешиваются в ленту при чтении."""
+        Follow.objects.create(user=self.reader, author=self.author)
+        Profile.objects.filter(pk=self.author.pk).update(followers_count=1)
+        post = Post.objects.create(author=self.author, text='Пост')
+        self.assertFalse(TimelineEntry.objects.exists())
+        self.assertEqual(self.follow_page(), [post])
+
+    def test_timeline_matches_read_time_feed(self):
+        """Материализованная лента совпадает с собранной при чтении."""
+        Follow.objects.create(user=self.reader, author=self.author)
+        Post.objects.create(author=self.author, text='Пост')
+        paginator = timeline.follow_paginator(self.reader)
+        self.assertEqual(
+            [post.pk for post in paginator.rows()],
+            list(timeline.follow_feed(self.reader).values_list(
+                'pk', flat=True)))
+
+    def test_check_timelines_repairs_drift(self):
+        """check_timelines находит и пересобирает разошедшиеся ленты."""
+        Follow.objects.create(user=self.reader, author=self.author)
+        Post.objects.create(author=self.author, text='Пост')
+        TimelineEntry.objects.all().delete()
+        with self.assertRaises(CommandError):
+            call_command('check_timelines', stdout=StringIO())
+        call_command('check_timelines', repair=True, stdout=StringIO())
+        self.assertTrue(timeline.is_consistent(self.reader))
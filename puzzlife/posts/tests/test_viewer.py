@@ -0,0 +1,140 @@
+from unittest import mock
+
+from django.contrib.auth import get_user_model
+from django.contrib.auth.models import AnonymousUser
+from django.core.cache import cache
+from django.db import transaction
+from django.test import Client, TestCase
+from django.urls import reverse
+
+from posts.models import Follow, Group, Like, Post
+from posts.tests.utils import run_commit_callbacks
+from posts.toggles import set_like
+from posts.viewer import attach_viewer_state, cached_liked_ids
+
+User = get_user_model()
+
+
+class ViewerStateTest(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.author = User.objects.create_user(username='author')
+        cls.other = User.objects.create_user(username='other')
+        cls.reader = User.objects.create_user(username='reader')
+        cls.liked_post = Post.objects.create(author=cls.author, text='Лайк')
+        cls.post = Post.objects.create(author=cls.other, text='Пост')
+        Like.objects.create(user=cls.reader, post=cls.liked_post)
+        Follow.objects.create(user=cls.reader, author=cls.author)
+
+    def setUp(self):
+        cache.clear()
+        self.client = Client()
+        self.client.force_login(self.reader)
+
+    def state(self, user):
+        posts = list(Post.objects.feed().order_by('pk'))
+        attach_viewer_state(posts, user)
+        return [(post.viewer_liked, post.viewer_follows) for post in posts]
+
+    def test_state_is_attached(self):
+        """Лайки и подписки посетителя видны на постах страницы."""
+        self.assertEqual(self.state(self.reader),
+                         [(True, True), (False, False)])
+        self.assertEqual(self.state(AnonymousUser()),
+                         [(False, False), (False, False)])
+
+    def test_state_costs_one_query_per_kind(self):
+        """Лайки и подписки читаются одним запросом на всю страницу,
+        лайки при следующем показе берутся из кэша.
+        """
+        posts = list(Post.objects.feed())
+        with self.assertNumQueries(2):
+            attach_viewer_state(posts, self.reader)
+        with self.assertNumQueries(1):
+            attach_viewer_state(posts, self.reader)
+
+    def test_liked_set_follows_toggles(self):
+        """Лайк и его снятие меняют множество в кэше без запросов."""
+        cached_liked_ids(self.reader.pk)
+        set_like(self.reader, self.post.pk, True)
+        run_commit_callbacks()
+        with self.assertNumQueries(0):
+            self.assertEqual(cached_liked_ids(self.reader.pk),
+                             {self.liked_post.pk, self.post.pk})
+        set_like(self.reader, self.liked_post.pk, False)
+        run_commit_callbacks()
+        self.assertEqual(cached_liked_ids(self.reader.pk), {self.post.pk})
+
+    def test_rolled_back_like_keeps_liked_set(self):
+        """Откаченный лайк не попадает в множество лайков в кэше."""
+        cached_liked_ids(self.reader.pk)
+        with transaction.atomic():
+            set_like(self.reader, self.post.pk, True)
+            transaction.set_rollback(True)
+        run_commit_callbacks()
+        self.assertEqual(cached_liked_ids(self.reader.pk),
+                         {self.liked_post.pk})
+
+    def test_too_many_likes_are_read_per_page(self):
+        """Слишком длинный список лайков не кэшируется, лайки страницы
+        читаются из базы.
+        """
+        with mock.patch('posts.viewer.LIKED_CACHE_MAX', 0):
+            self.assertIsNone(cached_liked_ids(self.reader.pk))
+            self.assertEqual(self.state(self.reader),
+                             [(True, True), (False, False)])
+
+    def test_feed_shows_like_buttons(self):
+        """В ленте у постов есть кнопка лайка с состоянием и счётчиком."""
+        response = self.client.get(reverse('posts:index'))
+        self.assertContains(
+            response, reverse('posts:delete_like',
+                              kwargs={'post_id': self.liked_post.pk}))
+        self.assertContains(
+            response, reverse('posts:add_like',
+                              kwargs={'post_id': self.post.pk}))
+        self.assertContains(response, f'likes-count-{self.post.pk}')
+        self.assertContains(response, 'Вы подписаны на автора', count=1)
+
+    def test_like_changes_feed_etag(self):
+        """После чужого лайка лента отдаётся заново, а не 304."""
+        etag = self.client.get(reverse('posts:index'))['ETag']
+        set_like(self.other, self.post.pk, True)
+        run_commit_callbacks()
+        response = self.client.get(reverse('posts:index'),
+                                   HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertContains(response, f'likes-count-{self.post.pk}">1<')
+
+    def test_like_off_page_keeps_feed_etag(self):
+        """Лайк поста с другой страницы не сбрасывает 304 ленты."""
+        group = Group.objects.create(title='Группа', slug='group',
+                                     description='-')
+        Post.objects.create(author=self.author, text='В группе', group=group)
+        run_commit_callbacks()
+        url = reverse('posts:group_list', args=[group.slug])
+        etag = self.client.get(url)['ETag']
+        set_like(self.other, self.post.pk, True)
+        run_commit_callbacks()
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 304)
+
+    def test_own_like_changes_etag(self):
+        """Свой лайк меняет ETag страниц посетителя."""
+        url = reverse('posts:profile', args=[self.other.username])
+        etag = self.client.get(url)['ETag']
+        set_like(self.reader, self.post.pk, True)
+        run_commit_callbacks()
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertContains(response, reverse(
+            'posts:delete_like', kwargs={'post_id': self.post.pk}))
+
+    def test_post_page_skips_follows(self):
+        """Странице поста подписки не нужны и не читаются."""
+        posts = [self.post]
+        with self.assertNumQueries(1):
+            attach_viewer_state(posts, self.reader, follows=False)
+        with self.assertNumQueries(0):
+            attach_viewer_state(posts, self.reader, follows=False)
+        self.assertFalse(self.post.viewer_follows)
@@ -1,11 +1,14 @@
 from django.contrib.auth import get_user_model
 from django.core.cache import cache
+from django.db import connection
 from django.test import Client, TestCase
+from django.test.utils import CaptureQueriesContext
 from django.urls import reverse
 from django import forms
 
-from puzzlife.settings import POSTS_NUM
-from posts.models import Post, Group, Comment, Follow
+from puzzlife.settings import COMMENTS_NUM, POSTS_NUM
+from posts.models import Post, Group, Comment, Follow, Profile
+from posts.tests.utils import run_commit_callbacks
 
 User = get_user_model()
 TEST_POSTS_NUM = 16
@@ -134,11 +137,17 @@ class PostsPagesTests(TestCase):
         self.assertIn(comment, response)
 
     def test_post_in_cache(self):
-        """Проверка кэша."""
+        """Проверка кэша: страница берётся из кэша, пока посты не менялись,
+        и обновляется сразу после удаления поста.
+        """
         first_response = self.guest_client.get(reverse('posts:index')).content
-        Post.objects.get(id=1).delete()
+        Post.objects.filter(pk=self.post.pk).update(text='Тихая правка')
         second_response = self.guest_client.get(reverse('posts:index')).content
         self.assertEqual(first_response, second_response)
+        Post.objects.get(pk=self.post.pk).delete()
+        run_commit_callbacks()
+        third_response = self.guest_client.get(reverse('posts:index')).content
+        self.assertNotEqual(first_response, third_response)
 
 
 class PaginatorViewsTest(TestCase):
@@ -183,10 +192,34 @@ class PaginatorViewsTest(TestCase):
                 response_one = self.guest_client.get(reverse_url)
                 self.assertEqual(len(response_one.context['page_obj']),
                                  POSTS_NUM)
-                response_two = self.guest_client.get(reverse_url + '?page=2')
+                next_query = response_one.context['page_obj'].next_query
+                response_two = self.guest_client.get(
+                    f'{reverse_url}?{next_query}')
                 self.assertEqual(len(response_two.context['page_obj']),
                                  TEST_POSTS_NUM - POSTS_NUM)
 
+    def test_paginator_pages_do_not_overlap(self):
+        """Курсоры ведут на следующую и обратно на предыдущую страницу."""
+        url = reverse('posts:index')
+        first_page = self.guest_client.get(url).context['page_obj']
+        self.assertFalse(first_page.has_previous())
+        second_page = self.guest_client.get(
+            f'{url}?{first_page.next_query}').context['page_obj']
+        self.assertFalse(second_page.has_next())
+        self.assertEqual(
+            list(first_page) + list(second_page),
+            sorted(self.post, key=lambda post: post.pk, reverse=True))
+        back_page = self.guest_client.get(
+            f'{url}?{second_page.previous_query}').context['page_obj']
+        self.assertEqual(list(back_page), list(first_page))
+
+    def test_paginator_ignores_broken_cursor(self):
+        """Испорченный курсор открывает первую страницу."""
+        response = self.guest_client.get(
+            reverse('posts:index') + '?after=broken')
+        self.assertEqual(len(response.context['page_obj']), POSTS_NUM)
+        self.assertFalse(response.context['page_obj'].has_previous())
+
 
 class FollowViewsTest(TestCase):
     @classmethod
@@ -254,3 +287,268 @@ class FollowViewsTest(TestCase):
             reverse('posts:follow_index')).context['page_obj']
         self.assertIn(self.post, follower_response)
         self.assertNotIn(self.post, another_response)
+
+
+class FeedQueriesTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create_user(
+            username='Shershon', first_name='Лина', last_name='Иванова')
+        cls.group = Group.objects.create(
+            title='Тестовая группа',
+            slug='test-slug',
+            description='Тестовое описание'
+        )
+        cls.follower = User.objects.create_user(username='follower')
+        Follow.objects.create(user=cls.follower, author=cls.user)
+
+    def setUp(self):
+        cache.clear()
+        self.client = Client()
+        self.client.force_login(self.follower)
+
+    def count_queries(self, url):
+        cache.clear()
+        with CaptureQueriesContext(connection) as context:
+            response = self.client.get(url)
+        self.assertEqual(response.status_code, 200)
+        return len(context)
+
+    def test_feed_queries_do_not_depend_on_page_size(self):
+        """Число запросов ленты не зависит от количества постов."""
+        feeds = (
+            reverse('posts:index'),
+            reverse('posts:group_list', kwargs={'slug': self.group.slug}),
+            reverse('posts:profile',
+                    kwargs={'username': self.user.username}),
+            reverse('posts:follow_index'),
+        )
+        Post.objects.create(author=self.user, text='Пост', group=self.group)
+        single = {url: self.count_queries(url) for url in feeds}
+        Post.objects.bulk_create(
+            Post(author=self.user, text=f'Пост {i}', group=self.group)
+            for i in range(POSTS_NUM)
+        )
+        for url in feeds:
+            with self.subTest(url=url):
+                self.assertEqual(self.count_queries(url), single[url])
+
+
+class CommentsViewsTest(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.author = User.objects.create_user(username='author')
+        cls.post = Post.objects.create(author=cls.author, text='Пост')
+        cls.quiet_post = Post.objects.create(author=cls.author, text='Тихий')
+        Comment.objects.create(post=cls.quiet_post, author=cls.author,
+                               text='Единственный')
+        users = [User.objects.create_user(username=f'reader{i}')
+                 for i in range(COMMENTS_NUM + 5)]
+        for i, user in enumerate(users):
+            Comment.objects.create(post=cls.post, author=user,
+                                   text=f'Комментарий {i}')
+        Post.objects.filter(pk=cls.post.pk).update(
+            comments_count=len(users))
+
+    def setUp(self):
+        cache.clear()
+        self.client = Client()
+        self.client.force_login(self.author)
+
+    def detail_url(self, post):
+        return reverse('posts:post_detail', kwargs={'post_id': post.pk})
+
+    def test_first_page_is_inlined(self):
+        """На странице поста только первая страница комментариев
+        и ссылка на фрагмент со следующей.
+        """
+        response = self.client.get(self.detail_url(self.post))
+        comments = response.context['comments']
+        self.assertEqual([comment.text for comment in comments],
+                         [f'Комментарий {i}' for i in range(COMMENTS_NUM)])
+        fragment = reverse('posts:post_comments',
+                           kwargs={'post_id': self.post.pk})
+        self.assertContains(
+            response, f'{fragment}?{comments.next_query}')
+
+    def test_fragment_continues_the_list(self):
+        """Фрагмент отдаёт оставшиеся комментарии без страницы."""
+        first = self.client.get(self.detail_url(self.post))
+        response = self.client.get(
+            reverse('posts:post_comments', kwargs={'post_id': self.post.pk}),
+            {'after': first.context['comments'].next_cursor})
+        self.assertEqual(
+            [comment.text for comment in response.context['comments']],
+            [f'Комментарий {i}'
+             for i in range(COMMENTS_NUM, COMMENTS_NUM + 5)])
+        self.assertFalse(response.context['comments'].has_next())
+        self.assertNotContains(response, '<html')
+
+    def test_queries_do_not_depend_on_comments(self):
+        """Авторы комментариев не читаются по одному, а число
+        комментариев не считается через COUNT(*).
+        """
+        self.client.get(self.detail_url(self.quiet_post))
+        counts = []
+        for post in (self.quiet_post, self.post):
+            with CaptureQueriesContext(connection) as context:
+                response = self.client.get(self.detail_url(post))
+            self.assertEqual(response.status_code, 200)
+            counts.append(len(context))
+            self.assertFalse(any('COUNT(' in query['sql']
+                                 for query in context))
+        self.assertEqual(counts[0], counts[1])
+
+    def test_unknown_post_fragment(self):
+        """Фрагмент несуществующего поста — 404."""
+        response = self.client.get(
+            reverse('posts:post_comments', kwargs={'post_id': 0}))
+        self.assertEqual(response.status_code, 404)
+
+
+class CountersViewsTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.author = User.objects.create_user(username='author')
+        cls.reader = User.objects.create_user(username='reader')
+
+    def setUp(self):
+        self.author_client = Client()
+        self.author_client.force_login(self.author)
+        self.reader_client = Client()
+        self.reader_client.force_login(self.reader)
+
+    def test_post_counters_follow_views(self):
+        """Создание и удаление постов меняет счётчик автора."""
+        self.author_client.post(reverse('posts:post_create'),
+                                data={'text': 'Пост'})
+        self.assertEqual(Profile.objects.get(pk=self.author.pk).posts_count,
+                         1)
+        post = Post.objects.get(author=self.author)
+        self.author_client.get(
+            reverse('posts:post_delete', kwargs={'post_id': post.pk}))
+        self.assertEqual(Profile.objects.get(pk=self.author.pk).posts_count,
+                         0)
+
+    def test_like_and_comment_counters_follow_views(self):
+        """Лайки и комментарии считаются ровно один раз."""
+        post = Post.objects.create(author=self.author, text='Пост')
+        kwargs = {'post_id': post.pk}
+        for _ in range(2):
+            self.reader_client.get(reverse('posts:add_like', kwargs=kwargs))
+        self.reader_client.post(reverse('posts:add_comment', kwargs=kwargs),
+                                data={'text': 'Комментарий'})
+        post.refresh_from_db()
+        self.assertEqual((post.likes_count, post.comments_count), (1, 1))
+        for _ in range(2):
+            self.reader_client.get(
+                reverse('posts:delete_like', kwargs=kwargs))
+        self.reader_client.get(reverse(
+            'posts:delete_comment',
+            kwargs={'comment_id': post.comments.get().pk}))
+        post.refresh_from_db()
+        self.assertEqual((post.likes_count, post.comments_count), (0, 0))
+
+    def test_follow_counters_follow_views(self):
+        """Подписка меняет счётчики обоих пользователей."""
+        kwargs = {'username': self.author.username}
+        for _ in range(2):
+            self.reader_client.get(
+                reverse('posts:profile_follow', kwargs=kwargs))
+        self.assertEqual(
+            Profile.objects.get(pk=self.author.pk).followers_count, 1)
+        self.assertEqual(
+            Profile.objects.get(pk=self.reader.pk).following_count, 1)
+        self.reader_client.get(
+            reverse('posts:profile_unfollow', kwargs=kwargs))
+        self.assertEqual(
+            Profile.objects.get(pk=self.author.pk).followers_count, 0)
+        self.assertEqual(
+            Profile.objects.get(pk=self.reader.pk).following_count, 0)
+
+    def test_missing_profile_is_created(self):
+        """Пользователю без профиля (из bulk_create) профиль заводится
+        при первом изменении счётчика, со всеми счётчиками.
+        """
+        User.objects.bulk_create([User(username='bulk')])
+        bulk = User.objects.get(username='bulk')
+        Post.objects.create(author=bulk, text='Старый пост')
+        client = Client()
+        client.force_login(bulk)
+        client.get(reverse('posts:profile_follow',
+                           kwargs={'username': self.author.username}))
+        profile = Profile.objects.get(pk=bulk.pk)
+        self.assertEqual((profile.posts_count, profile.following_count),
+                         (1, 1))
+
+
+class ToggleApiTest(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.author = User.objects.create_user(username='author')
+        cls.reader = User.objects.create_user(username='reader')
+        cls.post = Post.objects.create(author=cls.author, text='Пост')
+
+    def setUp(self):
+        self.client = Client()
+        self.client.force_login(self.reader)
+        self.like_url = reverse('posts:like_api', args=[self.post.pk])
+        self.follow_url = reverse('posts:follow_api',
+                                  args=[self.author.username])
+
+    def test_like_is_idempotent(self):
+        """Повторный лайк и повторная отмена ничего не ломают."""
+        for method, expected in (('post', (True, 1)), ('post', (True, 1)),
+                                 ('delete', (False, 0)),
+                                 ('delete', (False, 0))):
+            with self.subTest(method=method):
+                data = getattr(self.client, method)(self.like_url).json()
+                self.assertEqual((data['liked'], data['likes_count']),
+                                 expected)
+        self.assertFalse(self.post.liked.exists())
+
+    def test_follow_is_idempotent(self):
+        """Подписка через API меняет счётчики и ленту ровно один раз."""
+        for _ in range(2):
+            data = self.client.post(self.follow_url).json()
+            self.assertEqual(data, {'following': True, 'followers_count': 1})
+        self.assertTrue(self.reader.timeline.filter(post=self.post).exists())
+        self.assertEqual(
+            Profile.objects.get(pk=self.reader.pk).following_count, 1)
+        for _ in range(2):
+            data = self.client.delete(self.follow_url).json()
+            self.assertEqual(data,
+                             {'following': False, 'followers_count': 0})
+        self.assertFalse(self.reader.timeline.exists())
+
+    def test_cannot_follow_self(self):
+        """На себя подписаться нельзя."""
+        url = reverse('posts:follow_api', args=[self.reader.username])
+        data = self.client.post(url).json()
+        self.assertEqual(data, {'following': False, 'followers_count': 0})
+        self.assertFalse(Follow.objects.exists())
+
+    def test_errors(self):
+        """Гость получает 401, несуществующая цель — 404, GET — 405."""
+        self.assertEqual(Client().post(self.like_url).status_code, 401)
+        missing = (
+            reverse('posts:like_api', args=[self.post.pk + 100]),
+            reverse('posts:follow_api', args=['nobody']),
+        )
+        for url in missing:
+            with self.subTest(url=url):
+                self.assertEqual(self.client.post(url).status_code, 404)
+                self.assertEqual(self.client.delete(url).status_code, 404)
+        self.assertEqual(self.client.get(self.like_url).status_code, 405)
+
+    def test_like_costs_few_queries(self):
+        """Лайк — вставка, счётчик и чтение счётчика в одной транзакции."""
+        self.client.get(reverse('posts:index'))
+        with CaptureQueriesContext(connection) as queries:
+            self.client.post(self.like_url)
+        statements = [query['sql'] for query in queries
+                      if not query['sql'].startswith(('SAVEPOINT',
+                                                      'RELEASE'))]
+        self.assertLessEqual(len(statements), 5)
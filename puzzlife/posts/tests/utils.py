@@ -0,0 +1,12 @@
+from django.db import connections
+
+
+def run_commit_callbacks(using='default'):
+    """Выполняет действия, отложенные через transaction.on_commit.
+
+    Транзакция TestCase не коммитится, и Django 2.2 сам их не запускает.
+    """
+    connection = connections[using]
+    callbacks, connection.run_on_commit = connection.run_on_commit, []
+    for _, func in callbacks:
+        func()
@@ -0,0 +1,204 @@
+from django.conf import settings
+from django.db import connection
+from django.db.models import Subquery
+
+from .models import Follow, Post, Profile, TimelineEntry
+from .utils import KeysetPaginator, MergedKeysetPaginator, insert_ignore
+
+FANOUT_BATCH_SIZE = 500
+
+
+class TimelinePaginator(KeysetPaginator):
+    """Читает ленту пользователя из TimelineEntry и отдаёт сами посты."""
+
+    def __init__(self, user, per_page=settings.POSTS_NUM):
+        entries = TimelineEntry.objects.filter(user=user).select_related(
+            'post__author', 'post__group'
+        ).only(
+            'created', 'post', 'post__id', 'post__text', 'post__created',
+            'post__image', 'post__image_state', 'post__likes_count',
+            'post__author', 'post__group',
+            'post__author__username', 'post__author__first_name',
+            'post__author__last_name', 'post__group__slug',
+            'post__group__title',
+        )
+        super().__init__(entries, per_page, ordering=('-created', '-post_id'))
+
+    def rows(self, values=None, forward=True):
+        return [entry.post for entry in self.window(values, forward)]
+
+
+def fanout_authors(user):
+    """Авторы из подписок user, чьи посты раскладываются по лентам."""
+    return Follow.objects.filter(
+        user=user,
+        author__profile__followers_count__lte=settings.FANOUT_MAX_FOLLOWERS,
+    ).values('author')
+
+
+def read_authors(user):
+    """Авторы из подписок user, чьи посты подмешиваются при чтении."""
+    return Follow.objects.filter(
+        user=user,
+        author__profile__followers_count__gt=settings.FANOUT_MAX_FOLLOWERS,
+    ).values_list('author', flat=True)
+
+
+def follow_paginator(user, per_page=settings.POSTS_NUM):
+    """Лента подписок: материализованная лента плюс посты «звёзд»."""
+    sources = [TimelinePaginator(user, per_page)]
+    celebrities = list(read_authors(user))
+    if celebrities:
+        sources.append(KeysetPaginator(
+            Post.objects.feed().filter(author__in=celebrities), per_page))
+    return MergedKeysetPaginator(Post.objects.all(), sources, per_page)
+
+
+def follow_feed(user):
+    """Лента подписок, собранная при чтении: эталон для проверки
+    материализованных лент.
+    """
+    return Post.objects.feed().filter(author__following__user=user)
+
+
+def entry(user_id, post):
+    return TimelineEntry(user_id=user_id, post_id=post.pk,
+                         author_id=post.author_id, created=post.created)
+
+
+def is_celebrity(author_id):
+    return Profile.objects.filter(
+        pk=author_id, followers_count__gt=settings.FANOUT_MAX_FOLLOWERS
+    ).exists()
+
+
+def newest_posts(**filters):
+    return Post.objects.filter(**filters).order_by(
+        '-created', '-id').only('id', 'created', 'author')
+
+
+def fan_out(post):
+    """Раскладывает новый пост по лентам подписчиков автора."""
+    if is_celebrity(post.author_id):
+        return
+    follower_ids = list(Follow.objects.filter(
+        author=post.author_id).values_list('user', flat=True))
+    TimelineEntry.objects.bulk_create(
+        (entry(user_id, post) for user_id in follower_ids),
+        batch_size=FANOUT_BATCH_SIZE,
+        ignore_conflicts=True,
+    )
+    if post.pk % settings.TIMELINE_TRIM_EVERY == 0:
+        for user_id in follower_ids:
+            trim(user_id)
+
+
+def backfill(user_id, author_id):
+    """Добавляет в ленту пользователя последние посты нового автора
+    из подписок.
+    """
+    if is_celebrity(author_id):
+        return
+    posts = newest_posts(author=author_id)[:settings.TIMELINE_LENGTH]
+    TimelineEntry.objects.bulk_create(
+        (entry(user_id, post) for post in posts),
+        batch_size=FANOUT_BATCH_SIZE,
+        ignore_conflicts=True,
+    )
+    trim(user_id)
+
+
+AUTHOR_POSTS_SQL = """
+SELECT follow.user_id, post.id, post.author_id, post.created
+FROM {follow} follow
+CROSS JOIN (
+    SELECT id, author_id, created FROM {post}
+    WHERE author_id = %s
+    ORDER BY created DESC, id DESC
+    LIMIT %s
+) AS post
+WHERE follow.author_id = %s
+"""
+
+
+def fan_out_author(author_id):
+    """Раскладывает последние посты автора по лентам всех подписчиков.
+
+    Нужна, когда автор перестаёт быть «звездой»: его посты больше
+    не подмешиваются при чтении. Лишние записи срежет следующий trim().
+    """
+    source = AUTHOR_POSTS_SQL.format(
+        follow=Follow._meta.db_table, post=Post._meta.db_table)
+    insert_ignore(TimelineEntry, ('user', 'post', 'author', 'created'),
+                  source,
+                  [author_id, settings.TIMELINE_LENGTH, author_id])
+
+
+def remove_author(user, author):
+    TimelineEntry.objects.filter(user=user, author=author).delete()
+
+
+def trim(user_id):
+    """Оставляет в ленте только TIMELINE_LENGTH последних записей."""
+    length = settings.TIMELINE_LENGTH
+    cutoff = TimelineEntry.objects.filter(user_id=user_id).order_by(
+        '-created', '-post_id').values('created')[length:length + 1]
+    TimelineEntry.objects.filter(
+        user_id=user_id, created__lte=Subquery(cutoff)).delete()
+
+
+def rebuild(user):
+    """Пересобирает ленту user из подписок."""
+    TimelineEntry.objects.filter(user=user).delete()
+    posts = newest_posts(
+        author__in=fanout_authors(user))[:settings.TIMELINE_LENGTH]
+    TimelineEntry.objects.bulk_create(
+        (entry(user.pk, post) for post in posts),
+        batch_size=FANOUT_BATCH_SIZE,
+    )
+
+
+REBUILD_RANGE_SQL = """
+INSERT INTO {entry} (user_id, post_id, author_id, created)
+SELECT user_id, post_id, author_id, created FROM (
+    SELECT follow.user_id, post.id AS post_id, post.author_id, post.created,
+           ROW_NUMBER() OVER (
+               PARTITION BY follow.user_id
+               ORDER BY post.created DESC, post.id DESC
+           ) AS position
+    FROM {follow} follow
+    JOIN {profile} profile ON profile.user_id = follow.author_id
+    JOIN {post} post ON post.author_id = follow.author_id
+    WHERE follow.user_id >= %s AND follow.user_id < %s
+      AND profile.followers_count <= %s
+) AS timeline
+WHERE position <= %s
+"""
+
+
+def rebuild_range(low, high):
+    """Пересобирает ленты пользователей с id из [low, high) одним
+    INSERT ... SELECT. Для массовой загрузки: rebuild() по одному
+    пользователю на больших объёмах слишком медленный.
+    """
+    TimelineEntry.objects.filter(user_id__gte=low, user_id__lt=high).delete()
+    sql = REBUILD_RANGE_SQL.format(**{
+        name: model._meta.db_table for name, model in (
+            ('entry', TimelineEntry), ('follow', Follow),
+            ('profile', Profile), ('post', Post))
+    })
+    with connection.cursor() as cursor:
+        cursor.execute(sql, [low, high, settings.FANOUT_MAX_FOLLOWERS,
+                             settings.TIMELINE_LENGTH])
+
+
+def is_consistent(user):
+    """Совпадает ли материализованная лента с собранной при чтении."""
+    expected = follow_feed(user).exclude(
+        author__in=read_authors(user)
+    ).order_by('-created', '-id').values_list('id', flat=True)
+    actual = TimelineEntry.objects.filter(
+        user=user, author__in=fanout_authors(user)
+    ).order_by('-created', '-post_id').values_list('post', flat=True)
+    length = settings.TIMELINE_LENGTH
+    return list(expected[:length]) == list(actual[:length])
@@ -0,0 +1,77 @@
+from django.conf import settings
+from django.db import connection, transaction
+
+from . import timeline
+from .cache import bump_version
+from .counters import change_follow_counters, change_post_counter
+from .models import Follow, Like, Post, Profile, User
+from .utils import insert_ignore
+from .viewer import update_liked_ids
+
+
+def select_existing(model):
+    """SELECT пары (%s, id) для одной строки model, если она есть."""
+    return 'SELECT %s, id FROM {} WHERE id = %s'.format(
+        connection.ops.quote_name(model._meta.db_table))
+
+
+def set_like(user, post_id, liked):
+    """Ставит или снимает лайк. Повторный вызов ничего не меняет.
+
+    Возвращает (liked, likes_count) или None, если поста нет.
+    """
+    with transaction.atomic():
+        if liked:
+            changed = insert_ignore(Like, ('user', 'post'),
+                                    select_existing(Post), [user.pk, post_id])
+        else:
+            changed, _ = Like.objects.filter(
+                user=user, post=post_id).delete()
+        if changed:
+            change_post_counter(post_id, 'likes_count', 1 if liked else -1)
+        count = Post.objects.filter(pk=post_id).values_list(
+            'likes_count', flat=True).first()
+    if changed:
+        update_liked_ids(user.pk, post_id, liked)
+        # Свой лайк виден посетителю на всех страницах; счётчики
+        # в ETag лент берутся со страницы, см. posts.etags.page_likes.
+        bump_version('feed', f'viewer:{user.pk}')
+    if count is None:
+        return None
+    return liked, count
+
+
+def set_follow(user, author_id, following):
+    """Подписывает user на автора или отписывает.
+
+    Возвращает (following, followers_count) или None, если автора нет.
+    На себя подписаться нельзя: состояние останется прежним.
+    """
+    with transaction.atomic():
+        changed = False
+        if user.pk == author_id:
+            following = False
+        elif following:
+            changed = insert_ignore(Follow, ('user', 'author'),
+                                    select_existing(User),
+                                    [user.pk, author_id])
+            if changed:
+                change_follow_counters(user.pk, author_id, 1)
+                timeline.backfill(user.pk, author_id)
+        else:
+            changed, _ = Follow.objects.filter(
+                user=user, author=author_id).delete()
+            if changed:
+                change_follow_counters(user.pk, author_id, -1)
+        count = Profile.objects.filter(pk=author_id).values_list(
+            'followers_count', flat=True).first()
+        if (changed and not following
+                and count == settings.FANOUT_MAX_FOLLOWERS):
+            # Автор перестал быть «звездой»: его посты теперь читаются
+            # только из материализованных лент.
+            timeline.fan_out_author(author_id)
+    if changed:
+        bump_version('feed', f'viewer:{user.pk}')
+    if count is None:
+        return None
+    return following, count
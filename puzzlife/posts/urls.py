@@ -6,10 +6,14 @@ app_name = 'posts'
 urlpatterns = [
     path('', views.index, name='index'),
     path('group/<slug:slug>/', views.group_posts, name='group_list'),
+    path('search/', views.search, name='search'),
     path('profile/<str:username>/', views.profile, name='profile'),
     path('posts/<int:post_id>/', views.post_detail, name='post_detail'),
     path('create/', views.post_create, name='post_create'),
     path('posts/<int:post_id>/edit/', views.post_edit, name='post_edit'),
+    path('posts/<int:post_id>/comments/',
+         views.post_comments,
+         name='post_comments'),
     path('posts/<int:post_id>/comment/',
          views.add_comment,
          name='add_comment'),
@@ -28,4 +32,8 @@ urlpatterns = [
          ),
     path('posts/<int:post_id>/like/', views.add_like, name='add_like'),
     path('posts/<int:post_id>/unlike/', views.delete_like, name='delete_like'),
+    path('api/posts/<int:post_id>/like/', views.like_api, name='like_api'),
+    path('api/profile/<str:username>/follow/',
+         views.follow_api,
+         name='follow_api'),
 ]
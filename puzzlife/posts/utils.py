@@ -1,7 +1,224 @@
-from django.core.paginator import Paginator
+import binascii
+import json
+
+from django.core.exceptions import ValidationError
+from django.db import connection
+from django.db.models import Max, Min, Q
+from django.utils.http import urlsafe_base64_decode, urlsafe_base64_encode
+
 from puzzlife.settings import POSTS_NUM
 
+AFTER = 'after'
+BEFORE = 'before'
+
+
+class KeysetPage:
+    """Страница курсорной пагинации.
+
+    Повторяет интерфейс django.core.paginator.Page, который нужен шаблонам,
+    но вместо номеров страниц хранит непрозрачные курсоры соседних страниц.
+    """
+
+    def __init__(self, object_list, params, next_cursor=None,
+                 previous_cursor=None):
+        self.object_list = object_list
+        self.params = params
+        self.next_cursor = next_cursor
+        self.previous_cursor = previous_cursor
+
+    def __repr__(self):
+        return f'<KeysetPage of {len(self)} objects>'
+
+    def __len__(self):
+        return len(self.object_list)
+
+    def __getitem__(self, index):
+        return self.object_list[index]
+
+    def __iter__(self):
+        return iter(self.object_list)
+
+    def has_next(self):
+        return self.next_cursor is not None
+
+    def has_previous(self):
+        return self.previous_cursor is not None
+
+    def has_other_pages(self):
+        return self.has_next() or self.has_previous()
+
+    def _query(self, direction=None, cursor=None):
+        params = self.params.copy()
+        params.pop(AFTER, None)
+        params.pop(BEFORE, None)
+        if direction:
+            params[direction] = cursor
+        return params.urlencode()
+
+    @property
+    def first_query(self):
+        return self._query()
+
+    @property
+    def next_query(self):
+        return self._query(AFTER, self.next_cursor)
+
+    @property
+    def previous_query(self):
+        return self._query(BEFORE, self.previous_cursor)
+
+
+class KeysetPaginator:
+    """Пагинация по ключу сортировки без OFFSET и COUNT(*).
+
+    Страница выбирается условием «строго после (или до) курсора» по полям
+    ordering, поэтому любая страница стоит столько же, сколько первая.
+    Последнее поле ordering должно быть уникальным.
+    """
+
+    def __init__(self, queryset, per_page=POSTS_NUM,
+                 ordering=('-created', '-id')):
+        self.queryset = queryset
+        self.per_page = per_page
+        self.ordering = ordering
+        self.fields = [name.lstrip('-') for name in ordering]
+
+    def encode_cursor(self, obj):
+        values = []
+        for name in self.fields:
+            value = getattr(obj, name)
+            # isoformat без усечения микросекунд: ключ должен быть точным.
+            if hasattr(value, 'isoformat'):
+                value = value.isoformat()
+            values.append(value)
+        return urlsafe_base64_encode(json.dumps(values).encode())
+
+    def decode_cursor(self, cursor):
+        """Возвращает значения ключа или None, если курсор испорчен."""
+        try:
+            values = json.loads(urlsafe_base64_decode(cursor))
+            if len(values) != len(self.fields):
+                return None
+            opts = self.queryset.model._meta
+            return [opts.get_field(name).to_python(value)
+                    for name, value in zip(self.fields, values)]
+        except (ValueError, TypeError, binascii.Error, ValidationError):
+            return None
+
+    def _seek(self, values, forward):
+        """Условие «строка идёт после ключа» в порядке ordering
+        (или до него, если forward=False).
+        """
+        condition = Q()
+        equal = {}
+        for order, name, value in zip(self.ordering, self.fields, values):
+            descending = order.startswith('-')
+            lookup = 'lt' if descending == forward else 'gt'
+            condition |= Q(**equal, **{f'{name}__{lookup}': value})
+            equal[name] = value
+        return condition
+
+    @staticmethod
+    def _reverse(order):
+        return order[1:] if order.startswith('-') else f'-{order}'
+
+    def window(self, values=None, forward=True):
+        """Запрос одной страницы (плюс строка-признак следующей)
+        от ключа values в сторону forward.
+        """
+        queryset = self.queryset.order_by(*self.ordering)
+        if values is not None:
+            queryset = queryset.filter(self._seek(values, forward))
+        if not forward:
+            queryset = queryset.order_by(*map(self._reverse, self.ordering))
+        return queryset[:self.per_page + 1]
+
+    def rows(self, values=None, forward=True):
+        return list(self.window(values, forward))
+
+    def get_page(self, params):
+        after = params.get(AFTER)
+        before = params.get(BEFORE)
+        values = self.decode_cursor(after or before or '')
+        forward = values is None or bool(after)
+        rows = self.rows(values, forward)
+        has_more = len(rows) > self.per_page
+        rows = rows[:self.per_page]
+        if values is None:
+            has_next, has_previous = has_more, False
+        elif forward:
+            has_next, has_previous = has_more, True
+        else:
+            rows.reverse()
+            has_next, has_previous = True, has_more
+        if not rows:
+            return KeysetPage(rows, params)
+        return KeysetPage(
+            rows,
+            params,
+            next_cursor=self.encode_cursor(rows[-1]) if has_next else None,
+            previous_cursor=(self.encode_cursor(rows[0])
+                             if has_previous else None),
+        )
+
+
+class MergedKeysetPaginator(KeysetPaginator):
+    """Склеивает несколько источников с общим ключом сортировки.
+
+    Каждый источник отдаёт не больше страницы строк от курсора, так что
+    слияние стоит столько же, сколько чтение одной страницы из каждого.
+    """
+
+    def __init__(self, queryset, sources, per_page=POSTS_NUM,
+                 ordering=('-created', '-id')):
+        super().__init__(queryset, per_page, ordering)
+        self.sources = sources
+
+    def key(self, obj):
+        return tuple(getattr(obj, name) for name in self.fields)
+
+    def rows(self, values=None, forward=True):
+        merged = {}
+        for source in self.sources:
+            for row in source.rows(values, forward):
+                merged[row.pk] = row
+        descending = self.ordering[0].startswith('-')
+        rows = sorted(merged.values(), key=self.key,
+                      reverse=descending == forward)
+        return rows[:self.per_page + 1]
+
+
+def insert_ignore(model, fields, source, params):
+    """INSERT ... SELECT, пропускающий уже существующие строки.
+
+    source — запрос SELECT со значениями fields. Возвращает True,
+    если строка добавлена: повтор и отсутствие цели дают False.
+    """
+    ops = connection.ops
+    columns = ', '.join(
+        ops.quote_name(model._meta.get_field(name).column)
+        for name in fields)
+    sql = '{} {} ({}) {}{}'.format(
+        ops.insert_statement(ignore_conflicts=True),
+        ops.quote_name(model._meta.db_table),
+        columns,
+        source,
+        ops.ignore_conflicts_suffix_sql(ignore_conflicts=True),
+    )
+    with connection.cursor() as cursor:
+        cursor.execute(sql, params)
+        return cursor.rowcount > 0
+
+
+def pk_chunks(queryset, size):
+    """Диапазоны первичных ключей по size штук, без загрузки строк."""
+    bounds = queryset.aggregate(low=Min('pk'), high=Max('pk'))
+    if bounds['low'] is None:
+        return
+    for low in range(bounds['low'], bounds['high'] + 1, size):
+        yield low, low + size
+
 
-def get_page(queryset, page: int = 1):
-    paginator = Paginator(queryset, POSTS_NUM)
-    return paginator.get_page(page)
+def get_page(queryset, params):
+    paginator = KeysetPaginator(queryset, POSTS_NUM)
+    return paginator.get_page(params)
@@ -0,0 +1,84 @@
+from django.core.cache import cache
+from django.db import transaction
+
+from .models import Follow, Like
+
+LIKED_TIMEOUT = 60 * 60 * 24
+# Лайки пользователей, у которых их больше, в кэш не кладутся:
+# для них лайки страницы читаются из базы одним запросом.
+LIKED_CACHE_MAX = 5000
+# Метка в кэше вместо множества: лайков больше LIKED_CACHE_MAX.
+TOO_MANY = 'too_many'
+
+
+def liked_key(user_id):
+    return f'liked_posts:{user_id}'
+
+
+def cached_liked_ids(user_id):
+    """Множество id постов, лайкнутых пользователем, из кэша.
+
+    None, если лайков слишком много, чтобы держать их в кэше.
+    """
+    key = liked_key(user_id)
+    liked = cache.get(key)
+    if liked is None:
+        ids = list(Like.objects.filter(user=user_id).values_list(
+            'post_id', flat=True)[:LIKED_CACHE_MAX + 1])
+        liked = TOO_MANY if len(ids) > LIKED_CACHE_MAX else set(ids)
+        cache.set(key, liked, LIKED_TIMEOUT)
+    return None if liked == TOO_MANY else liked
+
+
+def update_liked_ids(user_id, post_id, liked):
+    """Добавляет пост в закэшированные лайки пользователя или убирает
+    его оттуда после коммита текущей транзакции: откаченный лайк
+    не должен остаться в кэше. Если множества в кэше нет, оно
+    не заводится.
+
+    Одновременные лайки одного пользователя могут потерять обновление:
+    тогда множество исправится через LIKED_TIMEOUT.
+    """
+    transaction.on_commit(
+        lambda: _update_liked_ids(liked_key(user_id), post_id, liked))
+
+
+def _update_liked_ids(key, post_id, liked):
+    ids = cache.get(key)
+    if not isinstance(ids, set):
+        return
+    if liked:
+        ids.add(post_id)
+    else:
+        ids.discard(post_id)
+    if len(ids) > LIKED_CACHE_MAX:
+        ids = TOO_MANY
+    cache.set(key, ids, LIKED_TIMEOUT)
+
+
+def attach_viewer_state(posts, user, follows=True):
+    """Кладёт в post.viewer_liked и post.viewer_follows состояние постов
+    для посетителя.
+
+    Лайки берутся из кэша (или одним запросом на страницу), подписки
+    на авторов страницы — одним запросом, сколько бы ни было постов.
+    С follows=False подписки не читаются и viewer_follows ложно.
+    """
+    posts = list(posts)
+    if not posts or not user.is_authenticated:
+        for post in posts:
+            post.viewer_liked = post.viewer_follows = False
+        return
+    liked = cached_liked_ids(user.pk)
+    if liked is None:
+        liked = set(Like.objects.filter(
+            user=user, post__in=[post.pk for post in posts]
+        ).values_list('post_id', flat=True))
+    followed = set()
+    if follows:
+        followed = set(Follow.objects.filter(
+            user=user, author__in={post.author_id for post in posts}
+        ).values_list('author_id', flat=True))
+    for post in posts:
+        post.viewer_liked = post.pk in liked
+        post.viewer_follows = post.author_id in followed
@@ -1,33 +1,104 @@
+from functools import wraps
+
+from django.conf import settings
 from django.contrib.auth.decorators import login_required
+from django.db import transaction
+from django.http import Http404, JsonResponse
 from django.shortcuts import render, get_object_or_404, redirect
-from django.views.decorators.cache import cache_page
-from .models import Post, Group, User, Follow, Comment, Like
-from .forms import PostForm, CommentForm
-from .utils import get_page
+from django.views.decorators.http import require_http_methods
+
+from core.routers import read_from_replica
+from core.streaming import render_streaming
+
+from .models import IMAGE_PROCESSING, Post, Group, User, Follow, Comment
+from .cache import attach_cards, cache_anonymous_page, group_scope
+from .etags import conditional_page, feed_etag, post_etag, profile_etag
+from .forms import PostForm, CommentForm, SearchForm
+from .counters import change_post_counter, change_profile_counter
+from .search import SearchPaginator
+from .tasks import schedule_image_processing
+from .timeline import follow_paginator
+from .toggles import set_follow, set_like
+from .utils import KeysetPaginator, get_page
+from .viewer import attach_viewer_state
+
+
+def login_required_json(view_func):
+    """login_required для JSON API: 401 вместо перенаправления."""
+    @wraps(view_func)
+    def wrapper(request, *args, **kwargs):
+        if not request.user.is_authenticated:
+            return JsonResponse({'error': 'Нужно войти'}, status=401)
+        return view_func(request, *args, **kwargs)
+    return wrapper
+
+
+def get_comments(post_id, params):
+    """Страница комментариев поста с авторами, по курсору из params."""
+    comments = Comment.objects.filter(post_id=post_id).select_related(
+        'author').only('created', 'text', 'post', 'author__username')
+    paginator = KeysetPaginator(
+        comments, settings.COMMENTS_NUM, ordering=('created', 'id'))
+    return paginator.get_page(params)
 
 
+def get_author_id(username):
+    return get_object_or_404(
+        User.objects.values_list('pk', flat=True), username=username)
 
+
+@read_from_replica
+@conditional_page(feed_etag(lambda: ['all'], Post.objects.all))
+@cache_anonymous_page(lambda: ['all'])
 def index(request):
-    page_obj = get_page(Post.objects.all(), page=request.GET.get('page'))
+    page_obj = get_page(Post.objects.feed(), request.GET)
+    attach_cards(page_obj)
+    attach_viewer_state(page_obj, request.user)
     context = {
         'page_obj': page_obj
     }
-    return render(request, 'posts/index.html', context)
+    return render_streaming(request, 'posts/index.html', context)
 
 
+@read_from_replica
+@conditional_page(feed_etag(
+    lambda slug: [group_scope(slug)],
+    lambda slug: Post.objects.filter(group__slug=slug)))
+@cache_anonymous_page(lambda slug: [group_scope(slug)])
 def group_posts(request, slug):
     group = get_object_or_404(Group, slug=slug)
-    page_obj = get_page(group.posts.all(), page=request.GET.get('page'))
+    page_obj = get_page(group.posts.feed(), request.GET)
+    attach_cards(page_obj, show_group=False)
+    attach_viewer_state(page_obj, request.user)
     context = {
         'group': group,
         'page_obj': page_obj,
     }
-    return render(request, 'posts/group_list.html', context)
+    return render_streaming(request, 'posts/group_list.html', context)
 
 
+@read_from_replica
+def search(request):
+    form = SearchForm(request.GET or None)
+    page_obj = None
+    if form.is_valid():
+        page_obj = SearchPaginator(
+            form.cleaned_data['q']).get_page(request.GET)
+    context = {
+        'form': form,
+        'page_obj': page_obj,
+    }
+    return render(request, 'posts/search.html', context)
+
+
+@read_from_replica
+@conditional_page(profile_etag)
 def profile(request, username):
-    author = get_object_or_404(User, username=username)
-    page_obj = get_page(author.posts.all(), page=request.GET.get('page'))
+    author = get_object_or_404(
+        User.objects.select_related('profile'), username=username)
+    page_obj = get_page(author.posts.feed(), request.GET)
+    attach_cards(page_obj)
+    attach_viewer_state(page_obj, request.user)
     following = request.user.is_authenticated and Follow.objects.filter(
         user=request.user, author=author).exists()
     context = {
@@ -35,31 +106,52 @@ def profile(request, username):
         'page_obj': page_obj,
         'following': following,
     }
-    return render(request, 'posts/profile.html', context)
+    return render_streaming(request, 'posts/profile.html', context)
 
 
+@read_from_replica
+@conditional_page(post_etag)
 def post_detail(request, post_id):
-    post = get_object_or_404(Post, pk=post_id)
-    comments = post.comments.all()
+    post = get_object_or_404(
+        Post.objects.select_related('author__profile', 'group'), pk=post_id)
+    comments = get_comments(post.pk, request.GET)
     comment_form = CommentForm(request.POST or None)
-    liked = request.user.is_authenticated and Like.objects.filter(
-        user=request.user, post=post).exists()
+    attach_viewer_state([post], request.user, follows=False)
     context = {
         'post': post,
         'form': comment_form,
         'comments': comments,
-        'liked': liked
+        'liked': post.viewer_liked
     }
     return render(request, 'posts/post_detail.html', context)
 
 
+@read_from_replica
+def post_comments(request, post_id):
+    """Следующая страница комментариев фрагментом HTML."""
+    comments = get_comments(post_id, request.GET)
+    if not comments and not Post.objects.filter(pk=post_id).exists():
+        raise Http404
+    context = {
+        'post_id': post_id,
+        'comments': comments,
+    }
+    return render(request, 'posts/includes/comment_list.html', context)
+
+
 @login_required
 def post_create(request):
     create_form = PostForm(request.POST or None, files=request.FILES or None)
     if create_form.is_valid():
         create_post = create_form.save(commit=False)
         create_post.author = request.user
-        create_post.save()
+        if create_post.image:
+            create_post.image_state = IMAGE_PROCESSING
+        with transaction.atomic():
+            create_post.save()
+            change_profile_counter(request.user.pk, 'posts_count', 1)
+            if create_post.image:
+                schedule_image_processing(create_post)
         return redirect('posts:profile', request.user)
     return render(request, 'posts/create_post.html', {'form': create_form})
 
@@ -75,7 +167,14 @@ def post_edit(request, post_id):
         instance=post
     )
     if update_form.is_valid():
-        update_form.save()
+        post = update_form.save(commit=False)
+        new_image = 'image' in update_form.changed_data and post.image
+        if new_image:
+            post.image_state = IMAGE_PROCESSING
+        with transaction.atomic():
+            post.save()
+            if new_image:
+                schedule_image_processing(post)
         return redirect('posts:post_detail', post_id)
     context = {
         'post': post,
@@ -89,7 +188,9 @@ def post_delete(request, post_id):
     post = get_object_or_404(Post, pk=post_id)
     if request.user != post.author:
         return redirect('posts:post_detail', post_id)
-    post.delete()
+    with transaction.atomic():
+        post.delete()
+        change_profile_counter(post.author_id, 'posts_count', -1)
     return redirect('posts:profile', post.author.username)
 
 
@@ -101,7 +202,9 @@ def add_comment(request, post_id):
         comment = comment_form.save(commit=False)
         comment.author = request.user
         comment.post = post
-        comment.save()
+        with transaction.atomic():
+            comment.save()
+            change_post_counter(post.pk, 'comments_count', 1)
     return redirect('posts:post_detail', post_id)
 
 
@@ -109,59 +212,72 @@ def add_comment(request, post_id):
 def delete_comment(request, comment_id):
     comment = get_object_or_404(Comment, pk=comment_id)
     if comment.author != request.user:
-        return redirect('posts:post_detail', comment.post.id)
-    comment.delete()
-    return redirect('posts:post_detail', comment.post.id)
+        return redirect('posts:post_detail', comment.post_id)
+    with transaction.atomic():
+        comment.delete()
+        change_post_counter(comment.post_id, 'comments_count', -1)
+    return redirect('posts:post_detail', comment.post_id)
 
 
 @login_required
+@read_from_replica
 def follow_index(request):
-    follow_posts = Post.objects.filter(author__following__user=request.user)
-    page_obj = get_page(follow_posts, page=request.GET.get('page'))
+    page_obj = follow_paginator(request.user).get_page(request.GET)
+    attach_cards(page_obj)
+    attach_viewer_state(page_obj, request.user)
     context = {
         'page_obj': page_obj
     }
-    return render(request, 'posts/follow.html', context)
+    return render_streaming(request, 'posts/follow.html', context)
 
 
 @login_required
 def profile_follow(request, username):
-    author = get_object_or_404(User, username=username)
-    if author != request.user:
-        Follow.objects.get_or_create(
-            user=request.user,
-            author=author,
-        )
+    set_follow(request.user, get_author_id(username), True)
     return redirect('posts:profile', username)
 
 
 @login_required
 def profile_unfollow(request, username):
-    author = get_object_or_404(User, username=username)
-    follow = Follow.objects.get(
-        user=request.user,
-        author=author,
-    )
-    follow.delete()
+    set_follow(request.user, get_author_id(username), False)
     return redirect('posts:profile', username)
 
 
 @login_required
 def add_like(request, post_id):
-    post = get_object_or_404(Post, pk=post_id)
-    Like.objects.get_or_create(
-        user=request.user,
-        post=post
-    )
+    if set_like(request.user, post_id, True) is None:
+        raise Http404
     return redirect('posts:post_detail', post_id)
 
 
 @login_required
 def delete_like(request, post_id):
-    post = get_object_or_404(Post, pk=post_id)
-    like = Like.objects.get(
-        user=request.user,
-        post=post
-    )
-    like.delete()
+    if set_like(request.user, post_id, False) is None:
+        raise Http404
     return redirect('posts:post_detail', post_id)
+
+
+@login_required_json
+@require_http_methods(['POST', 'DELETE'])
+def like_api(request, post_id):
+    """POST ставит лайк, DELETE снимает; повтор запроса безопасен."""
+    state = set_like(request.user, post_id, request.method == 'POST')
+    if state is None:
+        return JsonResponse({'error': 'Пост не найден'}, status=404)
+    liked, count = state
+    return JsonResponse({'liked': liked, 'likes_count': count})
+
+
+@login_required_json
+@require_http_methods(['POST', 'DELETE'])
+def follow_api(request, username):
+    """POST подписывает на автора, DELETE отписывает."""
+    author_id = User.objects.filter(username=username).values_list(
+        'pk', flat=True).first()
+    state = None
+    if author_id is not None:
+        state = set_follow(request.user, author_id, request.method == 'POST')
+    if state is None:
+        return JsonResponse({'error': 'Автор не найден'}, status=404)
+    following, count = state
+    return JsonResponse({'following': following, 'followers_count': count})
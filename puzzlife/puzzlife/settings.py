@@ -4,6 +4,15 @@ from dotenv import load_dotenv
 BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
 
 POSTS_NUM = 10
+COMMENTS_NUM = 20
+
+# Сколько последних записей хранится в ленте подписок пользователя.
+TIMELINE_LENGTH = 800
+# Посты авторов с большим числом подписчиков не раскладываются по лентам,
+# а подмешиваются в ленту при чтении.
+FANOUT_MAX_FOLLOWERS = 1000
+# Ленты подписчиков обрезаются до TIMELINE_LENGTH раз в столько постов.
+TIMELINE_TRIM_EVERY = 50
 
 load_dotenv()
 SECRET_KEY = os.getenv('SECRET_KEY', default='your_secret_key')
@@ -33,11 +42,15 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    'core.middleware.ServerTimingMiddleware',
     'django.middleware.security.SecurityMiddleware',
+    'core.middleware.StaticFilesMiddleware',
+    'core.middleware.CompressionMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
+    'core.middleware.ReplicaMiddleware',
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
-    'django.contrib.auth.middleware.AuthenticationMiddleware',
+    'users.middleware.AuthenticationMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
 ]
@@ -45,12 +58,31 @@ MIDDLEWARE = [
 ROOT_URLCONF = 'puzzlife.urls'
 
 TEMPLATES_DIR = os.path.join(BASE_DIR, 'templates')
+# Необязательная обработка HTML: HTML_MINIFY убирает отступы шаблонов
+# при компиляции, HTML_COMPRESS сжимает ответы brotli или gzip,
+# HTML_STREAM отдаёт ленты по частям, начиная с <head>.
+HTML_MINIFY = os.getenv('HTML_MINIFY') == '1'
+HTML_COMPRESS = os.getenv('HTML_COMPRESS') == '1'
+HTML_STREAM = os.getenv('HTML_STREAM') == '1'
+TEMPLATE_LOADERS = [
+    'django.template.loaders.filesystem.Loader',
+    'django.template.loaders.app_directories.Loader',
+]
+if HTML_MINIFY:
+    TEMPLATE_LOADERS = [('core.template_loaders.Loader', TEMPLATE_LOADERS)]
+# Скомпилированные шаблоны хранятся в памяти процесса; при DEBUG
+# по умолчанию выключено, чтобы правки шаблонов были видны сразу.
+CACHE_TEMPLATES = os.getenv(
+    'CACHE_TEMPLATES', default='0' if DEBUG else '1') == '1'
+if CACHE_TEMPLATES:
+    TEMPLATE_LOADERS = [
+        ('django.template.loaders.cached.Loader', TEMPLATE_LOADERS)]
 TEMPLATES = [
     {
-        'BACKEND': 'django.template.backends.django.DjangoTemplates',
+        'BACKEND': 'core.template_backends.TimedDjangoTemplates',
         'DIRS': [TEMPLATES_DIR],
-        'APP_DIRS': True,
         'OPTIONS': {
+            'loaders': TEMPLATE_LOADERS,
             'context_processors': [
                 'django.template.context_processors.debug',
                 'django.template.context_processors.request',
@@ -69,9 +101,43 @@ DATABASES = {
     'default': {
         'ENGINE': 'django.db.backends.sqlite3',
         'NAME': os.path.join(BASE_DIR, 'db.sqlite3'),
+        # Секунды жизни соединения между запросами; перед каждым
+        # запросом core.db проверяет, что соединение исправно.
+        'CONN_MAX_AGE': int(os.getenv('CONN_MAX_AGE', default=0)),
     }
 }
 
+# PRAGMA для каждого нового соединения SQLite (core.db), включаются
+# SQLITE_TUNING=1. WAL позволяет читать во время записи, busy_timeout
+# (мс) заставляет писателей ждать блокировку, а не падать сразу.
+SQLITE_PRAGMAS = {
+    'journal_mode': os.getenv('SQLITE_JOURNAL_MODE', default='wal'),
+    'synchronous': os.getenv('SQLITE_SYNCHRONOUS', default='normal'),
+    'mmap_size': int(os.getenv('SQLITE_MMAP_SIZE', default=256 * 2 ** 20)),
+    'cache_size': int(os.getenv('SQLITE_CACHE_SIZE', default=-64000)),
+    'temp_store': 'memory',
+    'busy_timeout': int(os.getenv('SQLITE_BUSY_TIMEOUT', default=5000)),
+}
+SQLITE_TUNING = os.getenv('SQLITE_TUNING') == '1'
+
+# Реплики только для чтения: пути к копиям базы через запятую
+# в DATABASE_REPLICAS, копии обновляет команда sync_replica.
+# Представления с read_from_replica читают с реплик, а пользователь,
+# писавший в базу, REPLICA_STICKY_SECONDS читает с default.
+REPLICA_DATABASES = []
+for number, name in enumerate(
+        filter(None, os.getenv('DATABASE_REPLICAS', default='').split(',')),
+        start=1):
+    REPLICA_DATABASES.append(f'replica{number}')
+    DATABASES[f'replica{number}'] = {
+        **DATABASES['default'],
+        'NAME': name.strip(),
+        'TEST': {'MIRROR': 'default'},
+    }
+DATABASE_ROUTERS = ['core.routers.ReplicaRouter']
+REPLICA_STICKY_SECONDS = int(
+    os.getenv('REPLICA_STICKY_SECONDS', default=10))
+
 
 AUTH_PASSWORD_VALIDATORS = [
     {
@@ -102,10 +168,44 @@ USE_TZ = True
 
 STATIC_URL = '/static/'
 STATICFILES_DIRS = [os.path.join(BASE_DIR, 'static')]
+STATIC_ROOT = os.getenv('STATIC_ROOT',
+                        default=os.path.join(BASE_DIR, 'staticfiles'))
+# collectstatic добавляет хэш содержимого к именам файлов, сжимает
+# текстовые файлы и пережимает картинки больше STATIC_IMAGE_MIN_SIZE
+# байт, уменьшая их до STATIC_IMAGE_MAX_SIZE пикселей по большей стороне.
+STATICFILES_STORAGE = 'core.storage.OptimizedStaticFilesStorage'
+STATIC_IMAGE_MIN_SIZE = 50 * 1024
+STATIC_IMAGE_MAX_SIZE = 1600
 
 MEDIA_URL = '/media/'
 MEDIA_ROOT = os.path.join(BASE_DIR, 'media')
 
+# Ширины миниатюр картинок постов: карточка в ленте, страница поста
+# и вариант для экранов с высокой плотностью пикселей.
+THUMBNAIL_SIZES = {
+    'card': '600',
+    'detail': '960',
+    'retina': '1200',
+}
+THUMBNAIL_UPSCALE = False
+THUMBNAIL_QUALITY = 85
+THUMBNAIL_PROGRESSIVE = True
+
+# Картинки постов обрабатываются в фоне пулом из IMAGE_WORKERS потоков
+# (0 — прямо в запросе). Если в очереди уже IMAGE_QUEUE_SIZE задач,
+# следующая выполняется в запросе.
+IMAGE_WORKERS = int(os.getenv('IMAGE_WORKERS', default=2))
+IMAGE_QUEUE_SIZE = int(os.getenv('IMAGE_QUEUE_SIZE', default=32))
+# Большая сторона сохраняемого оригинала.
+IMAGE_MAX_SIZE = 2400
+
+# Сессии и пользователь сессии читаются из кэша: обычный запрос
+# вошедшего пользователя не обращается к django_session и auth_user.
+# Сессии, открытые до CachedModelBackend, переводит на него
+# users.middleware.AuthenticationMiddleware.
+SESSION_ENGINE = 'django.contrib.sessions.backends.cached_db'
+AUTHENTICATION_BACKENDS = ['users.backends.CachedModelBackend']
+
 LOGIN_URL = 'users:login'
 LOGIN_REDIRECT_URL = 'posts:index'
 # LOGOUT_REDIRECT_URL = 'posts:index'
@@ -115,8 +215,47 @@ EMAIL_FILE_PATH = os.path.join(BASE_DIR, 'sent_emails')
 
 CSRF_FAILURE_VIEW = 'core.views.csrf_failure'
 
+# Доля запросов, для которых ServerTimingMiddleware замеряет базу,
+# шаблоны и кэш: заголовок Server-Timing и строка уровня INFO в логгер
+# core.timing (чтобы её видеть, настройте логгер в LOGGING).
+SERVER_TIMING_SAMPLE_RATE = float(
+    os.getenv('SERVER_TIMING_SAMPLE_RATE', default=0.05))
+
+# Локальный LRU процесса перед общим для всех воркеров кэшем.
+# Общий кэш по умолчанию файловый, только для разработки: в бою нужен
+# кэш, который сам ограничивает свой размер, например memcached:
+# SHARED_CACHE_BACKEND=django.core.cache.backends.memcached.MemcachedCache
+# и SHARED_CACHE_LOCATION=127.0.0.1:11211.
+SHARED_CACHE_BACKEND = os.getenv('SHARED_CACHE_BACKEND',
+                                 default='core.cache.FileCache')
 CACHES = {
     'default': {
-        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
-    }
+        'BACKEND': 'core.cache.TwoTierCache',
+        'OPTIONS': {
+            'SHARED': 'shared',
+            'MAX_ENTRIES': 1000,
+            'LOCAL_TIMEOUT': 5,
+            # Сессия и пользователь после выхода или смены пароля,
+            # как и лайки пользователя, должны меняться сразу во всех
+            # процессах.
+            'SHARED_ONLY_PREFIXES': [
+                'version:', 'auth_user:', 'django.contrib.sessions',
+                'liked_posts:', 'group_id:',
+            ],
+        },
+    },
+    'shared': {
+        # Тесты подменяют общий кэш на кэш в памяти: core.test_runner.
+        'BACKEND': SHARED_CACHE_BACKEND,
+        'LOCATION': os.getenv(
+            'SHARED_CACHE_LOCATION',
+            default=os.path.join(BASE_DIR, 'cache')
+        ),
+        # Параметры файлового кэша; клиенту memcached они не нужны.
+        'OPTIONS': {
+            'MAX_ENTRIES': 10000,
+            'CULL_EVERY': 1000,
+        } if SHARED_CACHE_BACKEND == 'core.cache.FileCache' else {},
+    },
 }
+TEST_RUNNER = 'core.test_runner.TestRunner'
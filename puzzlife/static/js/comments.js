@@ -0,0 +1,28 @@
+// Подгрузка следующих страниц комментариев без перезагрузки страницы.
+// «Показать ещё» — обычная ссылка на страницу поста с курсором; если
+// фрагмент загрузить не удалось, браузер просто переходит по ней.
+(function () {
+  'use strict';
+
+  document.addEventListener('click', function (event) {
+    var link = event.target.closest('[data-fragment]');
+    if (!link || link.dataset.busy) {
+      return;
+    }
+    event.preventDefault();
+    link.dataset.busy = '1';
+    fetch(link.dataset.fragment, {credentials: 'same-origin'})
+      .then(function (response) {
+        if (!response.ok) {
+          throw new Error(response.status);
+        }
+        return response.text();
+      }).then(function (html) {
+        var more = link.closest('[data-more]');
+        more.insertAdjacentHTML('afterend', html);
+        more.remove();
+      }).catch(function () {
+        window.location = link.href;
+      });
+  });
+}());
@@ -0,0 +1,56 @@
+// Кнопки лайка и подписки без перезагрузки страницы.
+// Кнопка — обычная ссылка на view с перенаправлением; если запрос
+// к API не удался, браузер просто переходит по этой ссылке.
+(function () {
+  'use strict';
+
+  function csrfToken() {
+    var match = document.cookie.match(/(?:^|;\s*)csrftoken=([^;]+)/);
+    return match ? decodeURIComponent(match[1]) : '';
+  }
+
+  function render(button, active, count) {
+    var state = active ? 'on' : 'off';
+    var data = button.dataset;
+    data.active = String(active);
+    button.href = data[state + 'Href'];
+    button.className = data[state + 'Class'] || button.className;
+    var label = button.querySelector('[data-label]');
+    if (label) {
+      label.textContent = data[state + 'Label'];
+    }
+    var icon = button.querySelector('img');
+    if (icon && data[state + 'Icon']) {
+      icon.src = data[state + 'Icon'];
+    }
+    var counter = document.getElementById(data.counter);
+    if (counter) {
+      counter.textContent = count;
+    }
+  }
+
+  document.addEventListener('click', function (event) {
+    var button = event.target.closest('[data-toggle-api]');
+    if (!button || button.dataset.busy) {
+      return;
+    }
+    event.preventDefault();
+    button.dataset.busy = '1';
+    var data = button.dataset;
+    fetch(data.toggleApi, {
+      method: data.active === 'true' ? 'DELETE' : 'POST',
+      credentials: 'same-origin',
+      headers: {'X-CSRFToken': csrfToken()}
+    }).then(function (response) {
+      if (!response.ok) {
+        throw new Error(response.status);
+      }
+      return response.json();
+    }).then(function (result) {
+      render(button, result[data.stateKey], result[data.countKey]);
+      delete button.dataset.busy;
+    }).catch(function () {
+      window.location = button.href;
+    });
+  });
+}());
@@ -0,0 +1,33 @@
+from django.contrib.auth.backends import ModelBackend
+from django.core.cache import cache
+
+USER_TIMEOUT = 60 * 60
+# Бэкенды, через которые входили раньше, и их замена: сессия хранит
+# путь бэкенда, и без замены такие сессии разлогинились бы.
+LEGACY_BACKENDS = {
+    'django.contrib.auth.backends.ModelBackend':
+        'users.backends.CachedModelBackend',
+}
+
+
+def user_cache_key(user_id):
+    return f'auth_user:{user_id}'
+
+
+class CachedModelBackend(ModelBackend):
+    """ModelBackend, который берёт пользователя сессии из кэша.
+
+    Запись удаляется при сохранении пользователя (смена пароля,
+    last_login), удалении и выходе: см. users.signals.
+    """
+
+    def get_user(self, user_id):
+        key = user_cache_key(user_id)
+        user = cache.get(key)
+        if user is None:
+            user = super().get_user(user_id)
+            if user is not None:
+                cache.set(key, user, USER_TIMEOUT)
+        elif not self.user_can_authenticate(user):
+            return None
+        return user
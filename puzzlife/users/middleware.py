@@ -0,0 +1,31 @@
+from django.contrib.auth import BACKEND_SESSION_KEY
+from django.contrib.auth.middleware import (
+    AuthenticationMiddleware as BaseAuthenticationMiddleware, get_user)
+from django.utils.functional import SimpleLazyObject
+
+from users.backends import LEGACY_BACKENDS
+
+
+def upgrade_session_backend(request):
+    """Переводит сессию, открытую через бэкенд из LEGACY_BACKENDS,
+    на CachedModelBackend. Django не загружает пользователя сессии,
+    если её бэкенда нет в AUTHENTICATION_BACKENDS.
+    """
+    backend = request.session.get(BACKEND_SESSION_KEY)
+    if backend in LEGACY_BACKENDS:
+        request.session[BACKEND_SESSION_KEY] = LEGACY_BACKENDS[backend]
+
+
+class AuthenticationMiddleware(BaseAuthenticationMiddleware):
+    """AuthenticationMiddleware, который при первом обращении
+    к request.user переводит сессию на текущий бэкенд.
+    """
+
+    def process_request(self, request):
+        super().process_request(request)
+        request.user = SimpleLazyObject(lambda: self.get_user(request))
+
+    def get_user(self, request):
+        if not hasattr(request, '_cached_user'):
+            upgrade_session_backend(request)
+        return get_user(request)
@@ -0,0 +1,84 @@
+from django.contrib.auth import BACKEND_SESSION_KEY, get_user_model
+from django.core.cache import cache
+from django.db import connection
+from django.test import Client, TestCase
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from users.backends import user_cache_key
+
+User = get_user_model()
+
+PASSWORD = 'Secret-password-1'
+
+
+class CachedAuthTest(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user(
+            username='reader', password=PASSWORD)
+        self.client = Client()
+        self.client.login(username='reader', password=PASSWORD)
+
+    def auth_queries(self, url):
+        """Запросы страницы к таблицам сессий и пользователей."""
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(url)
+        self.assertEqual(response.status_code, 200)
+        return [query['sql'] for query in queries
+                if 'django_session' in query['sql']
+                or 'FROM "auth_user"' in query['sql']]
+
+    def test_page_view_costs_no_auth_queries(self):
+        """Вошедший пользователь не читает сессию и себя из базы."""
+        url = reverse('about:author')
+        self.client.get(url)
+        self.assertEqual(self.auth_queries(url), [])
+
+    def test_password_change_invalidates_user(self):
+        """После смены пароля старый пароль из кэша не действует."""
+        self.client.get(reverse('about:author'))
+        self.assertIsNotNone(cache.get(user_cache_key(self.user.pk)))
+        self.client.post(reverse('users:password_change'), {
+            'old_password': PASSWORD,
+            'new_password1': 'Another-password-2',
+            'new_password2': 'Another-password-2',
+        })
+        self.assertIsNone(cache.get(user_cache_key(self.user.pk)))
+        other = Client()
+        self.assertFalse(other.login(username='reader', password=PASSWORD))
+        response = self.client.get(reverse('posts:follow_index'))
+        self.assertEqual(response.status_code, 200)
+
+    def test_logout_forgets_user(self):
+        """Выход удаляет пользователя из кэша и завершает сессию."""
+        self.client.get(reverse('about:author'))
+        self.client.get(reverse('users:logout'))
+        self.assertIsNone(cache.get(user_cache_key(self.user.pk)))
+        response = self.client.get(reverse('posts:follow_index'))
+        self.assertEqual(response.status_code, 302)
+
+    def test_inactive_user_is_rejected(self):
+        """Отключённый пользователь не входит даже из кэша."""
+        self.client.get(reverse('about:author'))
+        User.objects.filter(pk=self.user.pk).update(is_active=False)
+        cached = cache.get(user_cache_key(self.user.pk))
+        cached.is_active = False
+        cache.set(user_cache_key(self.user.pk), cached)
+        response = self.client.get(reverse('posts:follow_index'))
+        self.assertEqual(response.status_code, 302)
+
+    def test_old_sessions_move_to_cached_backend(self):
+        """Сессия, открытая через ModelBackend, не разлогинивается
+        и дальше читает пользователя из кэша.
+        """
+        client = Client()
+        with self.settings(AUTHENTICATION_BACKENDS=[
+                'django.contrib.auth.backends.ModelBackend']):
+            client.force_login(self.user)
+        response = client.get(reverse('posts:follow_index'))
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(client.session[BACKEND_SESSION_KEY],
+                         'users.backends.CachedModelBackend')
+        self.client = client
+        self.assertEqual(self.auth_queries(reverse('about:author')), [])